@@ -0,0 +1,4 @@
+# .env is read once, before any module looks at os.environ
+from dotenv import load_dotenv
+
+load_dotenv()
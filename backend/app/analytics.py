@@ -0,0 +1,52 @@
+# backend/app/analytics.py
+"""
+Recount the dashboard aggregates (analytics_counts) from scratch.
+
+    python -m app.analytics            # rebuild, then show the top skills
+    python -m app.analytics --top 0    # rebuild only
+
+The counts are normally kept up to date incrementally as CVs are stored,
+re-analysed and deleted; this is for after a bulk change outside those
+paths or if they are ever suspected to have drifted.
+"""
+
+import sys
+import time
+import logging
+import argparse
+
+from .db import SessionLocal
+from . import models
+from .crud import rebuild_analytics, ALL_DOMAINS
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rebuild skill and domain analytics")
+    parser.add_argument("--batch-size", type=int, default=1000,
+                        help="CVs per query")
+    parser.add_argument("--top", type=int, default=10,
+                        help="print this many top skills, missing skills and domains afterwards")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger().setLevel(logging.WARNING)
+
+    db = SessionLocal()
+    start = time.perf_counter()
+    try:
+        count = rebuild_analytics(db, args.batch_size)
+        print(f"counted {count} CVs in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+        for kind in ("skill", "missing", "domain") if args.top > 0 else ():
+            rows = (
+                db.query(models.AnalyticsCount.name, models.AnalyticsCount.count)
+                  .filter(models.AnalyticsCount.kind == kind, models.AnalyticsCount.domain == ALL_DOMAINS)
+                  .order_by(models.AnalyticsCount.count.desc())
+                  .limit(args.top)
+            )
+            print(f"{kind}: " + ", ".join(f"{name} ({n})" for name, n in rows))
+    finally:
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,49 @@
+# backend/app/courses.py
+"""
+Maintenance for the shared course catalog.
+
+    python -m app.courses               # move legacy per-CV course rows, then show stats
+    python -m app.courses --batch-size 200
+
+Recommended courses used to be copied onto every CV (the `courses` table).
+They now live once per URL in course_catalog, with cv_courses linking a CV
+to them for a skill and level. Legacy rows are moved over in committed
+batches, so an interrupted run can simply be started again; the API does
+the same at startup.
+"""
+
+import sys
+import time
+import logging
+import argparse
+
+from sqlalchemy import func
+
+from .db import SessionLocal
+from . import models
+from .crud import migrate_legacy_courses
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Move legacy course rows into the shared catalog")
+    parser.add_argument("--batch-size", type=int, default=1000,
+                        help="legacy rows moved per transaction")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger().setLevel(logging.WARNING)
+
+    db = SessionLocal()
+    start = time.perf_counter()
+    try:
+        moved = migrate_legacy_courses(db, args.batch_size)
+        catalog = db.query(func.count(models.CourseCatalog.id)).scalar()
+        links = db.query(func.count(models.CVCourse.id)).scalar()
+    finally:
+        db.close()
+    print(f"moved {moved} legacy rows in {time.perf_counter() - start:.1f}s; "
+          f"catalog has {catalog} courses for {links} CV links", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
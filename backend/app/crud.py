@@ -1,45 +1,216 @@
-import json
-from typing import List
-from sqlalchemy.orm import Session
+import os
+import copy
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import List, Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
+from starlette.concurrency import run_in_threadpool
 from . import models
+from .db import SessionLocal
 from .utils.security import hash_password, verify_password
-from .models import Course
+from .models import Course, CourseCatalog, CVCourse
 from .utils.coursera_searcher import CourseraSearcher
-from .utils.cv_parser import call_mistral
+from .utils.course_ranking import rank_courses
+from .utils.cv_parser import call_mistral_json
 from .models import ChatMessage, SuggestedProject
 from .utils.ollama import chat_with_deepseek
+from .utils.skills import canonicalize_skills, normalize_key, skill_key
+from .utils import minhash
+from .utils.metrics import SUGGESTION_POOL
+from .utils.llm_scheduler import llm_priority
+from .utils.skill_gap import SkillGapEngine, get_engine
+from .utils.similarity import cv_vector, get_index
+from collections import Counter, defaultdict
+from sqlalchemy import func
+import numpy as np
 import logging
 logger = logging.getLogger(__name__)
 
 
-def get_user_by_email(db: Session, email: str):
-    return db.query(models.User).filter(models.User.email == email).first()
+async def get_user_by_email(db: AsyncSession, email: str):
+    return (await db.execute(select(models.User).where(models.User.email == email))).scalars().first()
 
-def create_user(db: Session, email: str, password: str):
-    hashed = hash_password(password)
+async def create_user(db: AsyncSession, email: str, password: str):
+    # bcrypt is deliberately slow; keep it off the event loop
+    hashed = await run_in_threadpool(hash_password, password)
     user = models.User(email=email, hashed_password=hashed)
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
     return user
 
-def authenticate_user(db: Session, email: str, password: str):
-    user = get_user_by_email(db, email)
-    if user and verify_password(password, user.hashed_password):
+async def authenticate_user(db: AsyncSession, email: str, password: str):
+    user = await get_user_by_email(db, email)
+    if user and await run_in_threadpool(verify_password, password, user.hashed_password):
         return user
     return None
 
-def create_cv(db: Session, user_id: int, filename: str, parsed: dict, images: list):
+# every relationship a CV response needs, loaded eagerly
+CV_PARTS = [
+    selectinload(getattr(models.CV, rel)) for rel in
+    ("meta", "edus", "exps", "skills", "projects", "missing_skills", "suggested_projects")
+] + [selectinload(models.CV.courses).selectinload(models.CVCourse.course)]
+
+async def get_latest_cv(db: AsyncSession, user_id: int, full: bool = False):
+    """
+    The user's most recent CV. With full=True every part of it is loaded
+    up front (one SELECT per relationship), since lazy loads can't run
+    under an AsyncSession.
+    """
+    stmt = (
+        select(models.CV)
+          .where(models.CV.user_id == user_id)
+          .order_by(models.CV.created_at.desc(), models.CV.id.desc())
+          .limit(1)
+    )
+    if full:
+        stmt = stmt.options(*CV_PARTS).execution_options(populate_existing=True)
+    return (await db.execute(stmt)).scalars().first()
+
+async def get_cv(db: AsyncSession, cv_id: int):
+    """A CV with every part loaded, refreshed from the database."""
+    stmt = (
+        select(models.CV).where(models.CV.id == cv_id)
+          .options(*CV_PARTS).execution_options(populate_existing=True)
+    )
+    return (await db.execute(stmt)).scalars().first()
+
+async def user_cv_ids(db: AsyncSession, user_id: int) -> List[int]:
+    return list((await db.execute(select(models.CV.id).where(models.CV.user_id == user_id))).scalars())
+
+def cv_to_dict(cv: models.CV) -> dict:
+    """
+    A stored CV in the /cv/me response shape. Every relationship must
+    already be loaded (see CV_PARTS); shared by /cv/me and the export.
+    """
+    education = [
+        {
+          "degree":      e.degree,
+          "university":  e.university,
+          "location":    e.location,
+          "gpa":         e.gpa,
+          "description": e.description,
+          "start_date":  e.start_date,
+          "end_date":    e.end_date,
+        }
+        for e in cv.edus
+    ]
+    # assemble the “parsed” blob just like in your upload handler
+    meta = {
+        "name":     cv.meta.name,
+        "email":    cv.meta.email,
+        "phone":    cv.meta.phone,
+        "bio":      cv.meta.bio,
+        "linkedin": cv.meta.linkedin,
+        "github":   cv.meta.github,
+        "domain":   cv.meta.domain,
+    }
+    experience = [
+        {
+          "role":        x.role,
+          "company":     x.company,
+          "location":    x.location,
+          "date":        x.date,
+          "description": x.description,
+        }
+        for x in cv.exps
+    ]
+    skills = [s.name for s in cv.skills]
+    projects = []
+    for p in cv.projects:
+        # 1) tools must be a list
+        raw_tools = p.tools or ""
+        if isinstance(raw_tools, str):
+            tools = [t.strip() for t in raw_tools.split(",") if t.strip()]
+        else:
+            tools = raw_tools
+
+        # 2) link must be a list of valid URL(s)
+        raw_link = p.link
+        links: list[str] = []
+        if raw_link:
+            if isinstance(raw_link, str):
+                cleaned = raw_link.strip().strip('"')
+                if cleaned and cleaned.lower() != "null":
+                    links = [cleaned]
+            elif isinstance(raw_link, list):
+                # drop any falsy or "null" strings
+                links = [
+                    l.strip().strip('"')
+                    for l in raw_link
+                    if isinstance(l, str) and l.strip().lower() != "null"
+                ]
+
+        projects.append({
+            "name":        p.name,
+            "tools":       tools,
+            "description": p.description,
+            "link":        links,
+        })
+    
+
+    # pull missing skills for this CV
+    missing_skills = [ms.name for ms in cv.missing_skills]
+
+    # pull courses from DB
+    courses = [
+        {
+          "skill":       c.skill,
+          "level":       c.level,
+          "title":       c.title,
+          "url":         c.url,
+          "description": c.description,
+          "rating":      c.rating,
+          "duration":    c.duration,
+        }
+        for c in cv.courses
+    ]
+    
+    suggested = [
+      {
+        "id":          sp.id,
+        "name":        sp.name,
+        "description": sp.description,
+        "tools":       sp.tools or [],
+        "difficulty":  sp.difficulty,
+        "tasks":       sp.tasks or [],
+      }
+      for sp in cv.suggested_projects
+    ]
+    
+    return {
+      "id":         cv.id,
+      "filename":   cv.filename,
+      "created_at": cv.created_at,
+      "parsed": {
+        "meta":      meta,
+        "education": education,
+        "experience": experience,
+        "skills":    skills,
+        "missing_skills": missing_skills,
+        "projects":  projects,
+        "courses":   courses,
+        "suggested_projects": suggested,
+      },
+    }
+
+def create_cv(db: Session, user_id: int, filename: str, parsed: dict, images: list, commit: bool = True):
     """
     Persist a new CV and all its parts into the relational tables.
+    With commit=False the rows are only flushed, for callers batching commits.
     """
     # 1) Core CV record
     cv = models.CV(user_id=user_id, filename=filename)
     db.add(cv)
     db.flush()  # so cv.id is populated
 
-    # 2) Meta
-    m = parsed
+    # 2) Meta (normalized parses keep it under "meta")
+    m = parsed.get("meta", parsed)
     meta = models.CVMeta(
         cv_id=cv.id,
         name=m.get("name"),
@@ -47,7 +218,8 @@ def create_cv(db: Session, user_id: int, filename: str, parsed: dict, images: li
         phone=m.get("phone"),
         bio=m.get("bio"),
         linkedin=m.get("linkedin"),
-        github=m.get("github")
+        github=m.get("github"),
+        domain=m.get("domain"),
     )
     db.add(meta)
 
@@ -59,14 +231,10 @@ def create_cv(db: Session, user_id: int, filename: str, parsed: dict, images: li
     for exp in parsed["experience"]:
         db.add(models.Experience(cv_id=cv.id, **exp))
 
-    # 5) Skills
-    for sk in parsed["skills"]:
-        # if skills is a list of strings:
-        if isinstance(sk, str):
-            db.add(models.Skill(cv_id=cv.id, name=sk))
-        # or if it’s a list of dicts:
-        elif isinstance(sk, dict) and "name" in sk:
-            db.add(models.Skill(cv_id=cv.id, name=sk["name"]))
+    # 5) Skills (strings or {"name": …} dicts), canonicalized and de-duplicated
+    names = [sk["name"] if isinstance(sk, dict) and "name" in sk else sk for sk in parsed["skills"]]
+    for name in canonicalize_skills(names):
+        db.add(models.Skill(cv_id=cv.id, name=name))
 
     # 6) Projects
     for pr in parsed["projects"]:
@@ -82,45 +250,409 @@ def create_cv(db: Session, user_id: int, filename: str, parsed: dict, images: li
             link=pr.get("link"),
         ))
 
-    # 7) Commit all at once
-    db.commit()
-    db.refresh(cv)
+    # 7) The new CV replaces the owner's previous one in the analytics
+    db.flush()
+    previous = db.query(func.max(models.CV.id)).filter(
+        models.CV.user_id == user_id, models.CV.id < cv.id
+    ).scalar()
+    delta = cv_analytics(db, [cv.id])
+    delta.subtract(cv_analytics(db, [previous]))
+    apply_analytics(db, delta)
+
+    # 8) Commit all at once
+    if commit:
+        db.commit()
+        db.refresh(cv)
     return cv
 
-def create_courses_for_cv(db: Session, cv_id: int, courses_data: List[dict]):
-    """
-    Wipe out any existing courses for this CV and insert fresh ones.
-    Only the fields you declared on your Course model:
-      skill, level, title, url, description, rating, duration
-    """
-    db.query(Course).filter(Course.cv_id == cv_id).delete()
-    for c in courses_data:
-        db.add(Course(
-            cv_id      = cv_id,
-            skill      = c["skill"],
-            level      = c["level"],
-            title      = c["title"],
-            description= c.get("description", ""),
-            url        = c["url"],
-            rating     = c.get("rating", 0.0),
-            duration   = c.get("duration", ""),
+def replace_missing_skills(db: Session, cv_id: int, missing_skills: List[str]):
+    """
+    Delete old, then bulk insert fresh missing skills for a CV (no commit).
+    """
+    fresh = canonicalize_skills(missing_skills)
+    user_id = db.query(models.CV.user_id).filter(models.CV.id == cv_id).scalar()
+    if latest_cv_ids(db, [user_id]).get(user_id) == cv_id:
+        domain = db.query(models.CVMeta.domain).filter(models.CVMeta.cv_id == cv_id).scalar()
+        old = db.query(models.MissingSkill.cv_id, models.MissingSkill.name).filter_by(cv_id=cv_id).all()
+        delta = _analytics_rows({cv_id: domain}, [], [(cv_id, s) for s in fresh])
+        delta.subtract(_analytics_rows({cv_id: domain}, [], old))
+        apply_analytics(db, delta)
+    db.query(models.MissingSkill).filter_by(cv_id=cv_id).delete()
+    for skill in fresh:
+        db.add(models.MissingSkill(cv_id=cv_id, name=skill))
+
+GAP_SIGNATURE_KEY = "domain_skills_sha256"
+
+def recompute_missing_skills(db: Session, engine: SkillGapEngine = None, batch_size: int = 1000) -> int:
+    """
+    Recompute the missing skills of every stored CV with the skill-gap
+    engine, `batch_size` CVs per query/commit. No LLM calls; a CV whose
+    domain the engine has no requirements for keeps its stored gaps.
+    Returns the number of CVs processed.
+    """
+    engine = engine or get_engine()
+    done, last_id = 0, 0
+    while True:
+        rows = (
+            db.query(models.CVMeta.cv_id, models.CVMeta.domain)
+              .filter(models.CVMeta.cv_id > last_id)
+              .order_by(models.CVMeta.cv_id)
+              .limit(batch_size)
+              .all()
+        )
+        if not rows:
+            break
+        ids = [cv_id for cv_id, _ in rows]
+        skills = defaultdict(list)
+        for cv_id, name in (
+            db.query(models.Skill.cv_id, models.Skill.name)
+              .filter(models.Skill.cv_id.in_(ids))
+        ):
+            skills[cv_id].append(name)
+
+        results = engine.missing_many([d for _, d in rows], [skills[i] for i in ids])
+        # CVs outside the known domains keep the gaps they were stored with
+        resolved = {cv_id: missing for cv_id, (_, missing) in zip(ids, results) if missing is not None}
+        db.query(models.MissingSkill).filter(
+            models.MissingSkill.cv_id.in_(list(resolved))
+        ).delete(synchronize_session=False)
+        fresh = [
+            {"cv_id": cv_id, "name": name}
+            for cv_id, missing in resolved.items()
+            for name in missing
+        ]
+        if fresh:
+            db.bulk_insert_mappings(models.MissingSkill, fresh)
+        db.commit()
+        done += len(ids)
+        last_id = ids[-1]
+    # missing skills changed wholesale; recount rather than diff every CV
+    rebuild_analytics(db, batch_size)
+    return done
+
+def recompute_if_changed(db: Session, batch_size: int = 1000) -> bool:
+    """
+    Recompute all gaps if the domain requirements file changed since the
+    last recompute (its hash is kept in app_state). Returns whether it ran.
+    """
+    engine = get_engine()
+    if not engine.domains:
+        return False
+    state = db.get(models.AppState, GAP_SIGNATURE_KEY)
+    if state is not None and state.value == engine.signature:
+        return False
+    count = recompute_missing_skills(db, engine, batch_size)
+    state = db.get(models.AppState, GAP_SIGNATURE_KEY) or models.AppState(key=GAP_SIGNATURE_KEY)
+    state.value = engine.signature
+    db.add(state)
+    db.commit()
+    logger.info("Domain requirements changed: recomputed missing skills for %d CVs", count)
+    return True
+
+# ─── claims ────────────────────────────────────────────────────────
+# Jobs every worker would otherwise start at once (the startup refresh of
+# derived data) claim an app_state row first; the value is
+# "<claimed at> <token>", and a claim older than `stale_after` is taken
+# over, so a worker that died mid-job doesn't block the next start.
+
+def claim_job(db: Session, key: str, stale_after: float) -> Optional[str]:
+    """Claim `key` for this process. Returns the claim token, or None if another holds it."""
+    token = uuid.uuid4().hex
+    value = f"{time.time():.0f} {token}"
+    table = models.AppState.__table__
+    inserted = db.execute(
+        _dialect_insert(db)(table).values(key=key, value=value).on_conflict_do_nothing(index_elements=[table.c.key])
+    ).rowcount
+    if not inserted:
+        held = db.execute(select(table.c.value).where(table.c.key == key)).scalar()
+        try:
+            claimed_at = float((held or "0").split()[0])
+        except ValueError:
+            claimed_at = 0.0
+        # compare-and-set: of several workers finding it stale, one wins
+        if time.time() - claimed_at < stale_after or not db.execute(
+            table.update().where(table.c.key == key, table.c.value == held).values(value=value)
+        ).rowcount:
+            db.rollback()
+            return None
+    db.commit()
+    return token
+
+def release_job(db: Session, key: str, token: str):
+    """Give up a claim taken with claim_job(); a claim taken over since is left alone."""
+    table = models.AppState.__table__
+    db.execute(table.delete().where(table.c.key == key, table.c.value.like(f"% {token}")))
+    db.commit()
+
+# ─── analytics ─────────────────────────────────────────────────────
+# Dashboard counts are kept in analytics_counts and moved by deltas as CVs
+# come and go; each user counts once, with their latest CV.
+
+ALL_DOMAINS = ""
+
+def _dialect_insert(db: Session):
+    """The dialect's insert(), which has on_conflict_do_update for upserts."""
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise NotImplementedError(f"upserts are not implemented for {dialect}")
+    return insert
+
+def latest_cv_ids(db: Session, user_ids) -> dict:
+    """user_id -> id of their latest CV."""
+    if not user_ids:
+        return {}
+    return dict(
+        db.query(models.CV.user_id, func.max(models.CV.id))
+          .filter(models.CV.user_id.in_(user_ids))
+          .group_by(models.CV.user_id)
+    )
+
+def _analytics_rows(domains: dict, skills, missing) -> Counter:
+    """Counts contributed by CVs given their domains and (cv_id, name) pairs."""
+    counts = Counter()
+    for domain in domains.values():
+        if domain:
+            counts[("domain", ALL_DOMAINS, domain)] += 1
+    for kind, pairs in (("skill", skills), ("missing", missing)):
+        for cv_id, name in pairs:
+            counts[(kind, ALL_DOMAINS, name)] += 1
+            if domains.get(cv_id):
+                counts[(kind, domains[cv_id], name)] += 1
+    return counts
+
+def cv_analytics(db: Session, cv_ids) -> Counter:
+    """What the given (flushed) CVs contribute to analytics_counts."""
+    cv_ids = [i for i in cv_ids if i is not None]
+    if not cv_ids:
+        return Counter()
+    domains = dict(db.query(models.CVMeta.cv_id, models.CVMeta.domain).filter(models.CVMeta.cv_id.in_(cv_ids)))
+    skills = db.query(models.Skill.cv_id, models.Skill.name).filter(models.Skill.cv_id.in_(cv_ids)).all()
+    missing = db.query(models.MissingSkill.cv_id, models.MissingSkill.name).filter(
+        models.MissingSkill.cv_id.in_(cv_ids)
+    ).all()
+    return _analytics_rows(domains, skills, missing)
+
+def apply_analytics(db: Session, delta: Counter):
+    """Add `delta` to analytics_counts with one bulk upsert (no commit)."""
+    rows = [
+        {"kind": kind, "domain": domain, "name": name, "count": n}
+        for (kind, domain, name), n in sorted(delta.items()) if n
+    ]
+    if not rows:
+        return
+    insert = _dialect_insert(db)
+    table = models.AnalyticsCount.__table__
+    # sorted keys: concurrent writers lock rows in the same order
+    for start in range(0, len(rows), 500):
+        stmt = insert(table).values(rows[start:start + 500])
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=[table.c.kind, table.c.domain, table.c.name],
+            set_={"count": table.c.count + stmt.excluded.count},
         ))
+    if any(row["count"] < 0 for row in rows):
+        db.query(models.AnalyticsCount).filter(models.AnalyticsCount.count <= 0).delete(synchronize_session=False)
+
+def rebuild_analytics(db: Session, batch_size: int = 1000) -> int:
+    """Recompute analytics_counts from scratch over each user's latest CV. Returns the CVs counted."""
+    ids = sorted(cv_id for (cv_id,) in db.query(func.max(models.CV.id)).group_by(models.CV.user_id))
+    db.query(models.AnalyticsCount).delete(synchronize_session=False)
+    total = Counter()
+    for start in range(0, len(ids), batch_size):
+        total.update(cv_analytics(db, ids[start:start + batch_size]))
+    apply_analytics(db, total)
     db.commit()
+    return len(ids)
+
+async def top_counts(db: AsyncSession, kind: str, domain: str = ALL_DOMAINS, k: int = 20) -> List[dict]:
+    """The k largest counts of one kind, overall or within a domain (an index range scan)."""
+    rows = await db.execute(
+        select(models.AnalyticsCount.name, models.AnalyticsCount.count)
+          .where(models.AnalyticsCount.kind == kind, models.AnalyticsCount.domain == domain)
+          .order_by(models.AnalyticsCount.count.desc(), models.AnalyticsCount.name)
+          .limit(k)
+    )
+    return [{"name": name, "count": count} for name, count in rows]
+
+async def domain_users(db: AsyncSession, domain: str) -> int:
+    return (await db.execute(
+        select(models.AnalyticsCount.count).where(
+            models.AnalyticsCount.kind == "domain",
+            models.AnalyticsCount.domain == ALL_DOMAINS,
+            models.AnalyticsCount.name == domain,
+        )
+    )).scalar() or 0
+
+def similarity_vectors(db: Session, cv_ids: List[int]) -> list:
+    """(cv_id, vector) for each CV, from its skills, project tools and domain."""
+    skills, tools = defaultdict(list), defaultdict(list)
+    for cv_id, name in db.query(models.Skill.cv_id, models.Skill.name).filter(models.Skill.cv_id.in_(cv_ids)):
+        skills[cv_id].append(name)
+    for cv_id, raw in db.query(models.Project.cv_id, models.Project.tools).filter(models.Project.cv_id.in_(cv_ids)):
+        if isinstance(raw, str):
+            raw = raw.split(",")
+        tools[cv_id].extend(raw or [])
+    domains = dict(
+        db.query(models.CVMeta.cv_id, models.CVMeta.domain).filter(models.CVMeta.cv_id.in_(cv_ids))
+    )
+    return [(i, cv_vector(skills[i], tools[i], domains.get(i))) for i in cv_ids]
 
-def save_recommended_courses(db: Session, cv_id: int, missing_skills: List[str]):
+def index_cvs(db: Session, cv_ids: List[int]):
     """
-    Use your CourseraSearcher to scrape + pick top 3 courses per skill/level,
-    then dump them into the DB for that CV.
+    Add freshly stored CVs to the similarity index. Like the analytics, the
+    index holds one CV per person (their latest), so their owners' older
+    CVs are dropped from it; bulk ingest stores a cohort as one user per CV
+    for that reason.
+    """
+    latest = {}
+    for cv_id, user_id in db.query(models.CV.id, models.CV.user_id).filter(models.CV.id.in_(cv_ids)):
+        latest[user_id] = max(cv_id, latest.get(user_id, cv_id))
+    older = [
+        cv_id for (cv_id,) in db.query(models.CV.id)
+                                .filter(models.CV.user_id.in_(latest), ~models.CV.id.in_(latest.values()))
+    ]
+    get_index().update(similarity_vectors(db, sorted(latest.values())), remove=older)
+
+def rebuild_similarity_index(db: Session, batch_size: int = 1000) -> int:
+    """Rebuild the similarity index from each user's latest CV. Returns its size."""
+    index = get_index()
+    ids = sorted(cv_id for (cv_id,) in db.query(func.max(models.CV.id)).group_by(models.CV.user_id))
+    matrix = np.zeros((len(ids), index.dim), dtype=np.float32)
+    for start in range(0, len(ids), batch_size):
+        for offset, (_, vec) in enumerate(similarity_vectors(db, ids[start:start + batch_size])):
+            matrix[start + offset] = vec
+    index.replace_all(np.array(ids, dtype=np.int64), matrix)
+    return len(ids)
+
+async def find_similar_cvs(db: AsyncSession, query: np.ndarray, k: int = 10, exclude: List[int] = ()) -> List[dict]:
+    """
+    Top-k stored CVs by cosine similarity to `query`, with domain and
+    skills. Any signed-in user can search, so nothing identifying (name,
+    contact details) is returned.
+    """
+    hits = get_index().search(query, k, exclude)
+    ids = [cv_id for cv_id, _ in hits]
+    domains = dict((await db.execute(
+        select(models.CVMeta.cv_id, models.CVMeta.domain).where(models.CVMeta.cv_id.in_(ids))
+    )).all())
+    skills = defaultdict(list)
+    for cv_id, name in await db.execute(
+        select(models.Skill.cv_id, models.Skill.name).where(models.Skill.cv_id.in_(ids))
+    ):
+        skills[cv_id].append(name)
+    return [
+        {
+            "cv_id":  cv_id,
+            "score":  round(score, 4),
+            "domain": domains.get(cv_id),
+            "skills": skills[cv_id],
+        }
+        for cv_id, score in hits
+    ]
+
+def upsert_catalog(db: Session, courses: List[dict]) -> dict:
+    """
+    Insert or refresh course_catalog entries (keyed by URL) in bulk, no
+    commit. Returns {url: catalog id}. A course seen again updates the
+    shared entry; no CV row is touched.
+    """
+    entries = {}
+    for c in courses:
+        if c.get("url"):
+            # one row per URL per statement (ON CONFLICT can't hit a row twice)
+            entries[c["url"]] = {
+                "url":         c["url"],
+                "title":       c["title"],
+                "description": c.get("description", ""),
+                "rating":      c.get("rating", 0.0),
+                "duration":    c.get("duration", ""),
+                "updated_at":  datetime.utcnow(),
+            }
+    if not entries:
+        return {}
+    insert = _dialect_insert(db)
+    table = CourseCatalog.__table__
+    rows = [entries[url] for url in sorted(entries)]
+    for start in range(0, len(rows), 500):
+        stmt = insert(table).values(rows[start:start + 500])
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=[table.c.url],
+            set_={col: stmt.excluded[col] for col in ("title", "description", "rating", "duration", "updated_at")},
+        ))
+    ids = {}
+    urls = list(entries)
+    for start in range(0, len(urls), 500):
+        ids.update(db.query(CourseCatalog.url, CourseCatalog.id).filter(
+            CourseCatalog.url.in_(urls[start:start + 500])
+        ))
+    return ids
+
+def create_courses_for_cv(db: Session, cv_id: int, courses_data: List[dict], commit: bool = True):
+    """
+    Replace this CV's recommended courses: the courses themselves go into
+    the shared catalog, the CV only gets (skill, level, course) links.
+    """
+    ids = upsert_catalog(db, courses_data)
+    db.query(CVCourse).filter(CVCourse.cv_id == cv_id).delete(synchronize_session=False)
+    links = [
+        {"cv_id": cv_id, "course_id": ids[c["url"]], "skill": c["skill"], "level": c["level"]}
+        for c in courses_data if c.get("url") in ids
+    ]
+    if links:
+        db.bulk_insert_mappings(CVCourse, links)
+    if commit:
+        db.commit()
+
+def migrate_legacy_courses(db: Session, batch_size: int = 1000) -> int:
+    """
+    Move rows of the legacy per-CV `courses` table into the catalog and
+    cv_courses, one committed batch at a time; safe to re-run after an
+    interruption. Returns the number of legacy rows moved.
+    """
+    moved = 0
+    while True:
+        rows = db.query(Course).order_by(Course.id).limit(batch_size).all()
+        if not rows:
+            break
+        ids = upsert_catalog(db, [
+            {"url": r.url, "title": r.title, "description": r.description,
+             "rating": r.rating, "duration": r.duration}
+            for r in rows
+        ])
+        links = [
+            {"cv_id": r.cv_id, "course_id": ids[r.url], "skill": r.skill, "level": r.level}
+            for r in rows if r.url in ids
+        ]
+        if links:
+            db.bulk_insert_mappings(CVCourse, links)
+        if len(links) < len(rows):
+            logger.warning("Dropped %d legacy course rows without a URL", len(rows) - len(links))
+        db.query(Course).filter(Course.id.in_([r.id for r in rows])).delete(synchronize_session=False)
+        db.commit()
+        db.expunge_all()
+        moved += len(rows)
+    return moved
+
+def fetch_recommended_courses(missing_skills: List[str], skills: List[str] = (), domain: str = None) -> List[dict]:
+    """
+    Scrape candidate courses for every missing skill and level, then rank
+    them all in one pass against the CV (see course_ranking) and keep the
+    best few per skill/level.
+    No database access, so it can run off the request's session.
     """
     searcher = CourseraSearcher()
-    results = searcher.search_multiple_skills(missing_skills)
+    # one search per canonical skill, not per spelling variant
+    results = searcher.search_multiple_skills(canonicalize_skills(missing_skills))
 
     # flatten into a list of dicts
-    courses_to_save = []
+    candidates = []
     for skill, by_level in results.items():
         for level, courses in by_level.items():
             for course in courses:
-                courses_to_save.append({
+                candidates.append({
                     "skill":      skill,
                     "level":      level,
                     "title":      course["title"],
@@ -129,35 +661,288 @@ def save_recommended_courses(db: Session, cv_id: int, missing_skills: List[str])
                     "rating":     course.get("rating", 0.0),
                     "duration":   course.get("duration", ""),
                 })
+    return rank_courses(candidates, skills, domain)
 
-    create_courses_for_cv(db, cv_id, courses_to_save)
-    
-def generate_and_save_suggestions(
-    db: Session,
-    cv_id: int,
-    domain: str,
-    skills: list[str],
-):
-    # 1) Prompt the LLM
-    prompt = f"""
+def save_recommended_courses(db: Session, cv_id: int, missing_skills: List[str], skills: List[str] = (), domain: str = None):
+    """
+    Scrape courses for the missing skills and dump them into the DB for that CV.
+    """
+    create_courses_for_cv(db, cv_id, fetch_recommended_courses(missing_skills, skills, domain))
+
+SUGGESTION_MIX = {"easy": 1, "medium": 2, "hard": 1}
+
+def _suggestion_prompt(domain: str, skills: list[str], mix: dict) -> str:
+    wanted = ", ".join(f"{n} {level}" for level, n in mix.items() if n)
+    total = sum(mix.values())
+    return f"""
     You are a career coach. The user’s domain is {domain}, and these are their core skills: {', '.join(skills)}.
-    Propose exactly 4 project ideas: 1 easy, 2 medium, 1 hard.
+    Propose exactly {total} project ideas: {wanted}.
     For each project, return a JSON object with:
       - name
       - description
       - tools (a list of 3–5 tech/tools)
       - difficulty ("easy"|"medium"|"hard")
       - tasks (exactly 6 bullet-point strings: the steps to complete it)
-    Respond with a top‐level JSON array.
+    Respond with a JSON object {{"projects": [...]}}.
+    """
+
+def _valid_suggestion(proj) -> bool:
+    return (
+        isinstance(proj, dict)
+        and isinstance(proj.get("name"), str) and proj["name"].strip() != ""
+        and isinstance(proj.get("description"), str)
+        and isinstance(proj.get("tools"), list)
+        and proj.get("difficulty") in SUGGESTION_MIX
+        and isinstance(proj.get("tasks"), list)
+    )
+
+def _request_suggestions(domain: str, skills: list[str], mix: dict) -> list[dict]:
+    try:
+        data = call_mistral_json(_suggestion_prompt(domain, skills, mix))
+    except ValueError:
+        logger.warning("Suggestion reply could not be parsed")
+        return []
+    if isinstance(data, dict):
+        data = data.get("projects", [])
+    return [p for p in data if _valid_suggestion(p)] if isinstance(data, list) else []
+
+def generate_suggestions(domain: str, skills: list[str]) -> list[dict]:
+    """
+    Ask the LLM for the project mix in SUGGESTION_MIX. Broken or missing
+    entries don't throw the reply away: only the difficulty slots still
+    unfilled are requested again, once.
+    """
+    projects = _request_suggestions(domain, skills, SUGGESTION_MIX)
+
+    kept, have = [], {level: 0 for level in SUGGESTION_MIX}
+    for proj in projects:
+        if have[proj["difficulty"]] < SUGGESTION_MIX[proj["difficulty"]]:
+            have[proj["difficulty"]] += 1
+            kept.append(proj)
+
+    short = {level: n - have[level] for level, n in SUGGESTION_MIX.items() if n > have[level]}
+    if short:
+        logger.info("Re-requesting %s suggested projects", short)
+        for proj in _request_suggestions(domain, skills, short):
+            if short.get(proj["difficulty"], 0) > 0:
+                short[proj["difficulty"]] -= 1
+                kept.append(proj)
+    return kept
+
+# pooled suggestion sets are reused for CVs in the same domain whose skills
+# overlap at least this much (estimated Jaccard)
+SUGGESTION_REUSE_THRESHOLD = float(os.getenv("SUGGESTION_REUSE_THRESHOLD", "0.6"))
+SUGGESTION_POOL_PER_DOMAIN = int(os.getenv("SUGGESTION_POOL_PER_DOMAIN", "200"))
+# every this many reuses of a set, a fresh one is generated in the background
+SUGGESTION_REFRESH_HITS = int(os.getenv("SUGGESTION_REFRESH_HITS", "10"))
+
+_refresh_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="suggestion-refresh")
+_refreshing: set = set()
+_refreshing_lock = threading.Lock()
+
+def _skill_signature(skills: list[str]) -> list[int]:
+    keys = {normalize_key(s) for s in skills} - {""}
+    return [int(v) for v in minhash.signature(keys)]
+
+def _pool_lookup(db: Session, domain_key: str, signature: list[int]):
+    """The pooled set closest to `signature` in this domain, with its similarity."""
+    rows = (
+        db.query(models.SuggestionSet)
+          .filter(models.SuggestionSet.domain_key == domain_key)
+          .order_by(models.SuggestionSet.last_used_at.desc())
+          .limit(SUGGESTION_POOL_PER_DOMAIN)
+          .all()
+    )
+    if not rows:
+        return None, 0.0
+    sims = minhash.similarity(
+        np.array(signature, dtype=np.uint64),
+        np.array([r.signature for r in rows], dtype=np.uint64),
+    )
+    best = int(sims.argmax())
+    return rows[best], float(sims[best])
+
+def _pool_add(domain_key: str, skills: list[str], signature: list[int], projects: list[dict]):
+    """Store a generated set and evict the least recently used beyond the per-domain cap."""
+    db = SessionLocal()
+    try:
+        db.add(models.SuggestionSet(
+            domain_key=domain_key, skills=skills, signature=signature, projects=projects,
+        ))
+        db.flush()
+        evicted = [
+            set_id for (set_id,) in
+            db.query(models.SuggestionSet.id)
+              .filter(models.SuggestionSet.domain_key == domain_key)
+              .order_by(models.SuggestionSet.last_used_at.desc())
+              .offset(SUGGESTION_POOL_PER_DOMAIN)
+        ]
+        if evicted:
+            db.query(models.SuggestionSet).filter(
+                models.SuggestionSet.id.in_(evicted)
+            ).delete(synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+def _complete_set(projects: list[dict]) -> bool:
+    return len(projects) == sum(SUGGESTION_MIX.values())
+
+def _refresh_pool(domain: str, skills: list[str], domain_key: str, signature: list[int]):
+    try:
+        with llm_priority("background"):
+            projects = generate_suggestions(domain, skills)
+        if _complete_set(projects):
+            _pool_add(domain_key, skills, signature, projects)
+            SUGGESTION_POOL.labels("refresh").inc()
+    except Exception:
+        logger.exception("Background refresh of the suggestion pool failed")
+    finally:
+        with _refreshing_lock:
+            _refreshing.discard(domain_key)
+
+def _schedule_refresh(domain: str, skills: list[str], domain_key: str, signature: list[int]):
+    # at most one refresh per domain queued or running
+    with _refreshing_lock:
+        if domain_key in _refreshing:
+            return
+        _refreshing.add(domain_key)
+    _refresh_executor.submit(_refresh_pool, domain, skills, domain_key, signature)
+
+def suggest_projects(domain: str, skills: list[str]) -> list[dict]:
+    """
+    Suggested projects for a CV. A set generated earlier for the same domain
+    and a similar enough skill set (MinHash estimate of the Jaccard
+    similarity >= SUGGESTION_REUSE_THRESHOLD) is reused; only on a miss is
+    the LLM asked, and the new set joins the pool. Sets that keep being
+    reused get a fresh sibling generated in the background so the pool
+    doesn't hand out the same ideas forever.
+
+    Runs in the threadpool beside the course stage, so it uses short-lived
+    sessions of its own and none is held during generation.
+    """
+    skills = canonicalize_skills(skills)
+    domain_key = normalize_key(domain or "")
+    signature = _skill_signature(skills)
+
+    db = SessionLocal()
+    try:
+        row, sim = _pool_lookup(db, domain_key, signature)
+        if row is not None and sim >= SUGGESTION_REUSE_THRESHOLD:
+            row.hits = (row.hits or 0) + 1
+            row.last_used_at = datetime.utcnow()
+            db.commit()
+            SUGGESTION_POOL.labels("hit").inc()
+            logger.info("Reusing suggestion set %d (similarity %.2f)", row.id, sim)
+            if row.hits % SUGGESTION_REFRESH_HITS == 0:
+                _schedule_refresh(domain, skills, domain_key, signature)
+            # each CV gets its own copy of the projects
+            return copy.deepcopy(row.projects)
+    finally:
+        db.close()
+
+    SUGGESTION_POOL.labels("miss").inc()
+    projects = generate_suggestions(domain, skills)
+    if _complete_set(projects):
+        try:
+            _pool_add(domain_key, skills, signature, projects)
+        except Exception:
+            logger.exception("Could not add a suggestion set to the pool")
+    return projects
+
+# a re-upload keeps the previous CV's suggested projects (and their chats)
+# unless the domain changed or the skill sets overlap less than this
+SUGGESTION_CARRY_THRESHOLD = float(os.getenv("SUGGESTION_CARRY_THRESHOLD", "0.8"))
+
+async def plan_reanalysis(db: AsyncSession, user_id: int, cv_id: int, domain: str,
+                          skills: List[str], missing_skills: List[str]) -> dict:
+    """
+    Diff a freshly stored CV against the user's previous one to decide
+    which derived data has to be recomputed:
+
+      previous           id of the previous CV, or None (first upload)
+      carry_courses      missing skills that already have courses there
+      fetch_courses      missing skills that need a new course search
+      reuse_suggestions  whether the previous suggested projects still fit
+    """
+    prev_id = (await db.execute(
+        select(models.CV.id)
+          .where(models.CV.user_id == user_id, models.CV.id != cv_id)
+          .order_by(models.CV.id.desc())
+          .limit(1)
+    )).scalar()
+    if prev_id is None:
+        return {"previous": None, "carry_courses": [], "fetch_courses": list(missing_skills),
+                "reuse_suggestions": False}
+
+    course_keys = {
+        skill_key(skill) for skill in (await db.execute(
+            select(models.CVCourse.skill).where(models.CVCourse.cv_id == prev_id).distinct()
+        )).scalars()
+    }
+    carry = [s for s in missing_skills if skill_key(s) in course_keys]
+    fetch = [s for s in missing_skills if skill_key(s) not in course_keys]
+
+    prev_skills = {
+        skill_key(s) for s in
+        (await db.execute(select(models.Skill.name).where(models.Skill.cv_id == prev_id))).scalars()
+    }
+    new_skills = {skill_key(s) for s in skills}
+    union = prev_skills | new_skills
+    overlap = len(prev_skills & new_skills) / len(union) if union else 1.0
+    prev_domain = (await db.execute(
+        select(models.CVMeta.domain).where(models.CVMeta.cv_id == prev_id)
+    )).scalar()
+    has_suggestions = (await db.execute(
+        select(models.SuggestedProject.id).where(models.SuggestedProject.cv_id == prev_id).limit(1)
+    )).first() is not None
+    reuse = (
+        has_suggestions
+        and normalize_key(prev_domain or "") == normalize_key(domain or "")
+        and overlap >= SUGGESTION_CARRY_THRESHOLD
+    )
+    logger.info("Re-upload vs CV %d: skill overlap %.2f, %d course sets carried, %d to fetch, suggestions %s",
+                prev_id, overlap, len(carry), len(fetch), "kept" if reuse else "regenerated")
+    return {"previous": prev_id, "carry_courses": carry, "fetch_courses": fetch,
+            "reuse_suggestions": reuse}
+
+def carry_over_courses(db: Session, from_cv: int, to_cv: int, skills: List[str]):
+    """
+    Link the previous CV's courses for `skills` to the new CV too (no
+    commit). Runs after create_courses_for_cv: a course the fresh fetch
+    already linked is not linked again, so a URL stays recommended once
+    per CV.
     """
-    raw = call_mistral(prompt)
-    data = json.loads(raw)  # expect List[dict]
+    keys = {skill_key(s) for s in skills}
+    if not keys:
+        return
+    linked = {course_id for (course_id,) in db.query(CVCourse.course_id).filter(CVCourse.cv_id == to_cv)}
+    links = []
+    for course_id, skill, level in (
+        db.query(CVCourse.course_id, CVCourse.skill, CVCourse.level)
+          .filter(CVCourse.cv_id == from_cv).order_by(CVCourse.id)
+    ):
+        if skill_key(skill) in keys and course_id not in linked:
+            linked.add(course_id)
+            links.append({"cv_id": to_cv, "course_id": course_id, "skill": skill, "level": level})
+    if links:
+        db.bulk_insert_mappings(CVCourse, links)
 
-    # 2) clear out old suggested‐projects
+def move_suggestions(db: Session, from_cv: int, to_cv: int):
+    """
+    Re-attach the previous CV's suggested projects to the new CV (no
+    commit). Their chat messages reference the project, so they come along.
+    """
+    db.query(models.SuggestedProject).filter(
+        models.SuggestedProject.cv_id == from_cv
+    ).update({models.SuggestedProject.cv_id: to_cv}, synchronize_session=False)
+
+def save_suggestions(db: Session, cv_id: int, data: list[dict], commit: bool = True):
+    # clear out old suggested‐projects
     db.query(models.SuggestedProject).filter_by(cv_id=cv_id).filter(models.SuggestedProject.difficulty != None).delete()
     db.flush()
 
-    # 3) insert the new ones
+    # insert the new ones
     for proj in data:
         db.add(models.SuggestedProject(
             cv_id       = cv_id,
@@ -167,32 +952,40 @@ def generate_and_save_suggestions(
             difficulty  = proj["difficulty"],
             tasks       = proj["tasks"],
         ))
-    db.commit()
+    if commit:
+        db.commit()
+
+def generate_and_save_suggestions(
+    db: Session,
+    cv_id: int,
+    domain: str,
+    skills: list[str],
+):
+    save_suggestions(db, cv_id, suggest_projects(domain, skills))
     
 
-def get_chat_history(db: Session, project_id: int) -> List[ChatMessage]:
-    return (
-      db.query(ChatMessage)
-        .filter(ChatMessage.project_id == project_id)
-        .order_by(ChatMessage.timestamp)
-        .all()
-    )
+async def get_chat_history(db: AsyncSession, project_id: int) -> List[ChatMessage]:
+    return list((await db.execute(
+        select(ChatMessage)
+          .where(ChatMessage.project_id == project_id)
+          .order_by(ChatMessage.timestamp)
+    )).scalars())
 
-def save_message(db: Session, project_id: int, sender: str, content: str) -> ChatMessage:
+async def save_message(db: AsyncSession, project_id: int, sender: str, content: str) -> ChatMessage:
     msg = ChatMessage(project_id=project_id, sender=sender, content=content)
     db.add(msg)
-    db.commit()
-    db.refresh(msg)
+    await db.commit()
+    await db.refresh(msg)
     return msg
 
-def send_and_save_chat(db: Session, project_id: int, user_input: str) -> ChatMessage:
+async def send_and_save_chat(db: AsyncSession, project_id: int, user_input: str) -> ChatMessage:
     # 1) save user message
     logger.info("Saving user message for project %s: %r", project_id, user_input)
-    save_message(db, project_id, "user", user_input)
+    await save_message(db, project_id, "user", user_input)
 
     # 2) pull project context + history
-    proj = db.query(SuggestedProject).get(project_id)
-    history = get_chat_history(db, project_id)
+    proj = await db.get(SuggestedProject, project_id)
+    history = await get_chat_history(db, project_id)
 
     # 3) build a single prompt
     prompt = f"""
@@ -206,14 +999,15 @@ Tasks: {', '.join(proj.tasks or [])}
         prompt += f"{m.sender}: {m.content}\n"
     prompt += f"user: {user_input}\nassistant:"
 
-    # 4) call Ollama
+    # 4) call Ollama (blocking, so in the threadpool; the LLM priority and
+    # cancel event travel along in the context)
     try:
-        reply = chat_with_deepseek(prompt)
-        logger.info("Ollama replied: %r", reply)
+        reply = await run_in_threadpool(chat_with_deepseek, prompt)
+        logger.info("Ollama replied with %d chars", len(reply))
     except Exception as e:
         logger.exception("Ollama helper failed")
         raise
 
     # 5) save assistant reply
     logger.info("Saving assistant reply for project %s", project_id)
-    return save_message(db, project_id, "assistant", reply)
\ No newline at end of file
+    return await save_message(db, project_id, "assistant", reply)
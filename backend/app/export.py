@@ -0,0 +1,143 @@
+# backend/app/export.py
+"""
+Bulk export of parsed CVs as NDJSON, one CV per line in the /cv/me shape
+plus `user_id`.
+
+    python -m app.export > cvs.ndjson
+    python -m app.export --since 2025-09-01 --gzip -o cvs.ndjson.gz
+    python -m app.export --cursor 48213 >> cvs.ndjson     # resume
+
+CVs stream in id order through a server-side cursor (yield_per), with the
+relationships of each batch loaded by one SELECT per relationship, so
+memory stays flat whatever the table size. The cursor is the last cv_id
+written; passing it back resumes right after it. The same stream is served
+at GET /admin/export/cvs when ADMIN_TOKEN is set.
+"""
+
+import os
+import sys
+import json
+import zlib
+import logging
+import argparse
+from datetime import datetime
+from typing import Iterable, Iterator, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from .db import SessionLocal
+from . import models
+from .crud import cv_to_dict, CV_PARTS
+
+logger = logging.getLogger(__name__)
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "500"))
+
+
+def iter_cv_records(db: Session, since: Optional[datetime] = None, cursor: Optional[int] = None,
+                    batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[dict]:
+    """CVs created at/after `since` and with id above `cursor`, in id order."""
+    stmt = select(models.CV).options(*CV_PARTS).order_by(models.CV.id)
+    if since is not None:
+        stmt = stmt.where(models.CV.created_at >= since)
+    if cursor is not None:
+        stmt = stmt.where(models.CV.id > cursor)
+    result = db.execute(stmt.execution_options(yield_per=batch_size))
+    # the session only holds weak references to unmodified objects, so
+    # each batch is released once it has been written
+    for cv in result.scalars():
+        yield {**cv_to_dict(cv), "user_id": cv.user_id}
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+class NDJSONEncoder:
+    """Records to NDJSON bytes, optionally as one continuous gzip stream."""
+    def __init__(self, gzip: bool = False):
+        self._compressor = zlib.compressobj(wbits=31) if gzip else None   # 31: gzip container
+
+    def encode(self, records: List[dict]) -> bytes:
+        data = "".join(json.dumps(r, default=_json_default, ensure_ascii=False) + "\n" for r in records).encode("utf-8")
+        return self._compressor.compress(data) if self._compressor is not None else data
+
+    def finish(self) -> bytes:
+        return self._compressor.flush() if self._compressor is not None else b""
+
+
+def iter_ndjson(records: Iterable[dict], gzip: bool = False, lines_per_chunk: int = 100) -> Iterator[bytes]:
+    encoder = NDJSONEncoder(gzip)
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= lines_per_chunk:
+            chunk = encoder.encode(batch)
+            batch = []
+            if chunk:
+                yield chunk
+    tail = encoder.encode(batch) + encoder.finish()
+    if tail:
+        yield tail
+
+
+def stream_export(since: Optional[datetime] = None, cursor: Optional[int] = None,
+                  gzip: bool = False, batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[bytes]:
+    """NDJSON export over its own session, for a streaming HTTP response."""
+    db = SessionLocal()
+    try:
+        yield from iter_ndjson(iter_cv_records(db, since, cursor, batch_size), gzip=gzip)
+    finally:
+        db.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export parsed CVs as NDJSON")
+    parser.add_argument("--since", type=datetime.fromisoformat,
+                        help="only CVs created at or after this ISO timestamp")
+    parser.add_argument("--cursor", type=int,
+                        help="resume after this cv_id (the last one already exported)")
+    parser.add_argument("-o", "--output", default="-",
+                        help="output file (default: stdout)")
+    parser.add_argument("--gzip", action="store_true",
+                        help="gzip the output (implied by an .gz output file)")
+    parser.add_argument("--batch-size", type=int, default=EXPORT_BATCH_SIZE,
+                        help="CVs fetched per round trip")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger().setLevel(logging.WARNING)
+    gzip = args.gzip or args.output.endswith(".gz")
+
+    # records go out in batches; on any interruption the pending batch and
+    # the gzip trailer are still written, so the file is complete up to
+    # the reported cursor
+    encoder = NDJSONEncoder(gzip)
+    count, last_id, batch = 0, args.cursor, []
+    out = sys.stdout.buffer if args.output == "-" else open(args.output, "ab" if args.cursor else "wb")
+    db = SessionLocal()
+    status = 0
+    try:
+        for record in iter_cv_records(db, args.since, args.cursor, args.batch_size):
+            batch.append(record)
+            if len(batch) >= 100:
+                out.write(encoder.encode(batch))
+                count, last_id, batch = count + len(batch), batch[-1]["id"], []
+    except KeyboardInterrupt:
+        status = 130
+    finally:
+        out.write(encoder.encode(batch) + encoder.finish())
+        if batch:
+            count, last_id = count + len(batch), batch[-1]["id"]
+        out.flush()
+        db.close()
+        if out is not sys.stdout.buffer:
+            out.close()
+        print(f"exported {count} CVs; resume with --cursor {last_id}", file=sys.stderr)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
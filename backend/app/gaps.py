@@ -0,0 +1,46 @@
+# backend/app/gaps.py
+"""
+Recompute the missing skills of every stored CV from the domain
+requirements file (app/data/domain_skills.json or DOMAIN_SKILLS_PATH).
+
+    python -m app.gaps                 # always recompute
+    python -m app.gaps --if-changed    # only if the file changed since last run
+
+No LLM calls are made; the whole table is rewritten in batches.
+"""
+
+import sys
+import time
+import logging
+import argparse
+
+from .db import SessionLocal
+from .crud import recompute_missing_skills, recompute_if_changed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Recompute CV skill gaps")
+    parser.add_argument("--if-changed", action="store_true",
+                        help="skip unless the requirements file changed since the last recompute")
+    parser.add_argument("--batch-size", type=int, default=1000,
+                        help="CVs per query and commit")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger().setLevel(logging.WARNING)
+
+    db = SessionLocal()
+    start = time.perf_counter()
+    try:
+        if args.if_changed:
+            ran = recompute_if_changed(db, args.batch_size)
+            print("recomputed" if ran else "requirements unchanged", file=sys.stderr)
+        else:
+            count = recompute_missing_skills(db, batch_size=args.batch_size)
+            print(f"recomputed {count} CVs in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+    finally:
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,259 @@
+# backend/app/ingest.py
+"""
+Bulk CV ingestion over the same pipeline as /cv/upload.
+
+    python -m app.ingest ./cohort-2025/
+    python -m app.ingest manifest.csv --llm-concurrency 4 --batch-size 50
+
+A manifest is a CSV with `path,email` columns (paths relative to the
+manifest). For a directory, every *.pdf under it is ingested. Each CV is
+owned by the existing user with the manifest's email, or else the email the
+CV itself contains; CVs with no matching user are skipped (accounts are not
+created here, people register first).
+
+A person's CVs are one row each in retention, the similarity index and the
+analytics, all of which keep only a user's newest CV(s). So a run never
+stores two CVs for the same user: a manifest naming an email twice is
+rejected up front, and a second CV resolving to an owner already ingested
+in this run is skipped.
+
+PDF extraction runs in a process pool, LLM parsing in a bounded thread
+pool, and rows are committed in batches. Each committed file is appended to
+the checkpoint file, so re-running the same command resumes where a
+crashed run stopped. Suggested projects and courses are not generated here;
+they are produced when the user next uploads.
+"""
+
+import os
+import csv
+import sys
+import time
+import logging
+import argparse
+from collections import Counter
+from concurrent.futures import (
+    ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+)
+
+from .db import SessionLocal
+from . import models
+from .crud import create_cv, replace_missing_skills, index_cvs
+from .utils.cv_parser import extract_pages, extract_links, parse_cv, normalize_parsed
+from .utils.cv_text import compact_text
+from .utils.llm_scheduler import llm_priority
+
+logger = logging.getLogger("ingest")
+
+
+def _extract(path):
+    """Process-pool worker: PDF → (path, compacted text, links)."""
+    return path, compact_text(extract_pages(path)), extract_links(path)
+
+
+def _parse(path, text, links):
+    """Thread-pool worker: the LLM part of the pipeline."""
+    with llm_priority("background"):
+        parsed = parse_cv(text, links)
+    if not isinstance(parsed, dict):
+        raise ValueError("LLM response was not a JSON object")
+    return path, normalize_parsed(parsed)
+
+
+def load_jobs(source):
+    """[(pdf path, owner email or None)] from a manifest CSV or a directory."""
+    if os.path.isdir(source):
+        paths = sorted(
+            os.path.abspath(os.path.join(root, f))
+            for root, _, files in os.walk(source)
+            for f in files if f.lower().endswith(".pdf")
+        )
+        return [(p, None) for p in paths]
+    base = os.path.dirname(os.path.abspath(source))
+    with open(source, newline="", encoding="utf-8") as f:
+        return [
+            (os.path.join(base, row["path"]), (row.get("email") or "").strip() or None)
+            for row in csv.DictReader(f)
+        ]
+
+
+def load_checkpoint(path):
+    if not os.path.exists(path):
+        return set()
+    with open(path, encoding="utf-8") as f:
+        return {line.rstrip("\n") for line in f if line.strip()}
+
+
+class Ingestor:
+    def __init__(self, batch_size, checkpoint):
+        self.db = SessionLocal()
+        self.batch_size = batch_size
+        self.checkpoint = open(checkpoint, "a", encoding="utf-8")
+        self.pending: list[str] = []
+        self.pending_ids: list[int] = []
+        self.users: dict[str, models.User] = {}
+        self.owners: set[int] = set()
+        self.pending_owners: list[int] = []
+        self.done = 0
+        self.failed = 0
+
+    def _user(self, email):
+        if email not in self.users:
+            self.users[email] = (
+                self.db.query(models.User).filter(models.User.email == email).first()
+            )
+        return self.users[email]
+
+    def add(self, path, owner, parsed):
+        email = owner or parsed["meta"].get("email")
+        user = self._user(email) if email else None
+        if user is None:
+            logger.error("%s: no user for %r, skipping", path, email)
+            self.failed += 1
+            return
+        if user.id in self.owners:
+            logger.error("%s: %s already has a CV in this run, skipping", path, email)
+            self.failed += 1
+            return
+        # each CV in its own savepoint, so one that can't be stored leaves
+        # nothing behind in the batch
+        try:
+            with self.db.begin_nested():
+                cv = create_cv(self.db, user.id, os.path.basename(path), parsed, images=[], commit=False)
+                replace_missing_skills(self.db, cv.id, parsed["missing_skills"])
+                user.has_uploaded_cv = True
+        except Exception:
+            logger.exception("%s: could not be stored, skipping", path)
+            self.failed += 1
+            return
+        self.owners.add(user.id)
+        self.pending.append(path)
+        self.pending_ids.append(cv.id)
+        self.pending_owners.append(user.id)
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        try:
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            self.users.clear()
+            self.owners.difference_update(self.pending_owners)
+            self.failed += len(self.pending)
+            logger.exception("Batch of %d CVs failed to commit", len(self.pending))
+            self.pending, self.pending_ids, self.pending_owners = [], [], []
+            return
+        try:
+            index_cvs(self.db, self.pending_ids)
+        except Exception:
+            logger.exception("Could not add a batch to the similarity index")
+        # only committed files are checkpointed
+        self.checkpoint.write("".join(p + "\n" for p in self.pending))
+        self.checkpoint.flush()
+        os.fsync(self.checkpoint.fileno())
+        self.done += len(self.pending)
+        self.pending, self.pending_ids, self.pending_owners = [], [], []
+
+    def close(self):
+        self.flush()
+        self.checkpoint.close()
+        self.db.close()
+
+
+def run(args):
+    jobs = load_jobs(args.source)
+    emails = Counter(email.lower() for _, email in jobs if email)
+    repeated = sorted(email for email, n in emails.items() if n > 1)
+    if repeated:
+        print(f"one CV per person: {', '.join(repeated)} listed more than once", file=sys.stderr)
+        return 2
+    done_before = load_checkpoint(args.checkpoint)
+    todo = [(p, o) for p, o in jobs if p not in done_before]
+    owners = dict(todo)
+    print(f"{len(jobs)} CVs, {len(jobs) - len(todo)} already ingested, {len(todo)} to go",
+          file=sys.stderr)
+    if not todo:
+        return 0
+
+    ingestor = Ingestor(args.batch_size, args.checkpoint)
+    start = time.perf_counter()
+    last_report = start
+
+    def report(final=False):
+        elapsed = time.perf_counter() - start
+        handled = ingestor.done + len(ingestor.pending) + ingestor.failed
+        rate = handled / elapsed if elapsed else 0.0
+        eta = (len(todo) - handled) / rate if rate else 0.0
+        print(f"{'done' if final else 'progress'}: {handled}/{len(todo)} "
+              f"({ingestor.done} committed, {ingestor.failed} failed) "
+              f"{rate:.2f} CV/s, elapsed {elapsed:.0f}s"
+              + ("" if final else f", eta {eta:.0f}s"),
+              file=sys.stderr)
+
+    def drain(parsing):
+        """Persist whichever parses finish next (blocks for at least one)."""
+        nonlocal last_report
+        if not parsing:
+            return parsing
+        finished, parsing = wait(parsing, return_when=FIRST_COMPLETED)
+        for fut in finished:
+            try:
+                path, parsed = fut.result()
+            except Exception as e:
+                ingestor.failed += 1
+                logger.error("Parse failed: %s", e)
+                continue
+            ingestor.add(path, owners[path], parsed)
+        if time.perf_counter() - last_report >= args.report_every:
+            last_report = time.perf_counter()
+            report()
+        return parsing
+
+    try:
+        with ProcessPoolExecutor(max_workers=args.workers) as extract_pool, \
+             ThreadPoolExecutor(max_workers=args.llm_concurrency) as llm_pool:
+            extracting = {extract_pool.submit(_extract, path) for path, _ in todo}
+            parsing = set()
+            while extracting or parsing:
+                # keep at most 2x llm_concurrency parses queued; extraction
+                # results wait in the process pool's queue meanwhile
+                while extracting and len(parsing) < 2 * args.llm_concurrency:
+                    finished, extracting = wait(extracting, return_when=FIRST_COMPLETED)
+                    for fut in finished:
+                        try:
+                            path, text, links = fut.result()
+                        except Exception as e:
+                            ingestor.failed += 1
+                            logger.error("Extraction failed: %s", e)
+                            continue
+                        parsing.add(llm_pool.submit(_parse, path, text, links))
+                parsing = drain(parsing)
+    finally:
+        ingestor.close()
+        report(final=True)
+    return 0 if ingestor.failed == 0 else 1
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk-ingest CV PDFs")
+    parser.add_argument("source", help="directory of PDFs or a path,email manifest CSV")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2,
+                        help="processes for PDF extraction")
+    parser.add_argument("--llm-concurrency", type=int, default=2,
+                        help="CVs parsed by the LLM at the same time")
+    parser.add_argument("--batch-size", type=int, default=25,
+                        help="CVs per database commit")
+    parser.add_argument("--checkpoint", default="ingest.checkpoint",
+                        help="file recording ingested paths, for resuming")
+    parser.add_argument("--report-every", type=float, default=10.0,
+                        help="seconds between progress lines")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger().setLevel(logging.WARNING)
+    return run(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
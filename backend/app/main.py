@@ -1,13 +1,98 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from .routers import cv, auth, chat
-from .db import engine, Base
+from .routers import cv, auth, chat, metrics, debug, health, admin, analytics
+from .middleware import TracingMiddleware, ProfilingMiddleware, QueryStatsMiddleware
+from .utils.profiling import profiling_enabled
+from .db import engine, async_engine, SessionLocal, warm_pool, warm_async_pool
+from .crud import (
+    recompute_if_changed, rebuild_similarity_index, rebuild_analytics, migrate_legacy_courses,
+    claim_job, release_job,
+)
 from . import models
+from .utils.similarity import get_index
+from .utils.ollama import warm_up_models, OLLAMA_WARM_MODELS
+from .utils.readiness import expect, mark_ready
+from .retention import start_background_retention
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+import os
+import asyncio
 import logging
+import threading
 logging.basicConfig(level=logging.INFO)
-Base.metadata.create_all(bind=engine)
+logger = logging.getLogger(__name__)
+
+# the startup refresh runs in one worker at a time; a claim older than this
+# (its worker died) is taken over
+REFRESH_CLAIM_KEY = "derived_data_refresh"
+REFRESH_CLAIM_STALE_SECONDS = float(os.getenv("REFRESH_CLAIM_STALE_SECONDS", "3600"))
+
+
+async def _warm_database():
+    # retried until the database answers; /ready stays 503 meanwhile.
+    # The sync pool (tables, CLIs' background jobs) warms in the
+    # threadpool, the async one the routes use on the event loop.
+    while True:
+        try:
+            await run_in_threadpool(warm_pool)
+            await warm_async_pool()
+            break
+        except Exception as e:
+            logger.warning("Database not ready yet: %s", e)
+            await asyncio.sleep(2)
+    mark_ready("database")
+    threading.Thread(target=_refresh_derived_data, name="derived-data", daemon=True).start()
+
+
+def _refresh_derived_data():
+    db = SessionLocal()
+    token = None
+    try:
+        token = claim_job(db, REFRESH_CLAIM_KEY, REFRESH_CLAIM_STALE_SECONDS)
+        if token is None:
+            logger.info("Another worker is refreshing derived data")
+            return
+        # courses still stored as per-CV copies move into the shared catalog
+        if db.query(models.Course.id).first() is not None:
+            logger.info("Moved %d legacy course rows into the catalog", migrate_legacy_courses(db))
+        recompute_if_changed(db)
+        if not get_index().exists():
+            rebuild_similarity_index(db)
+        # first start with the analytics table: count what is already stored
+        if db.query(models.AnalyticsCount).first() is None and db.query(models.CV.id).first() is not None:
+            rebuild_analytics(db)
+    except Exception:
+        logger.exception("Startup refresh of derived data failed")
+    finally:
+        if token is not None:
+            try:
+                db.rollback()
+                release_job(db, REFRESH_CLAIM_KEY, token)
+            except Exception:
+                logger.exception("Could not release the derived data refresh claim")
+        db.close()
+
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # nothing here blocks: tables and the pool, the LLMs, and then derived
+    # data (a changed requirements file applied to stored CVs, a missing
+    # similarity index built) all warm up in the background
+    # everything /ready waits on is registered before any of it can finish,
+    # so the worker can't look ready in between
+    expect("database")
+    for model in OLLAMA_WARM_MODELS:
+        expect(f"model:{model}")
+    warming = asyncio.create_task(_warm_database())
+    threading.Thread(target=warm_up_models, args=(OLLAMA_WARM_MODELS,), name="warm-models", daemon=True).start()
+    start_background_retention()
+    yield
+    warming.cancel()
+    await async_engine.dispose()
+    engine.dispose()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # 1) Enable CORS for your React origin (http://localhost:8080)
 app.add_middleware(
@@ -21,3 +106,21 @@ app.add_middleware(
 app.include_router(auth.router, prefix="/auth")
 app.include_router(cv.router)
 app.include_router(chat.router, prefix="/api")
+app.include_router(metrics.router)
+app.include_router(health.router)
+app.include_router(analytics.router)
+
+app.add_middleware(QueryStatsMiddleware)
+
+# the admin routes (bulk export) only exist when ADMIN_TOKEN is set
+if admin.admin_enabled():
+    app.include_router(admin.router)
+
+# profiling is opt-in: without PROFILE_TOKEN neither the middleware nor
+# the download route exist
+if profiling_enabled():
+    app.include_router(debug.router)
+    app.add_middleware(ProfilingMiddleware)
+
+# added last so it wraps everything and the request id is set for profiling
+app.add_middleware(TracingMiddleware)
@@ -0,0 +1,94 @@
+# backend/app/middleware.py
+
+import os
+import time
+import logging
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+
+from .utils.metrics import HTTP_SECONDS, start_trace, current_request_id
+from .utils.profiling import SamplingProfiler, save_profile, token_ok
+from .utils.sql_stats import track_queries, SQL_QUERY_BUDGET
+
+logger = logging.getLogger(__name__)
+
+DEBUG = os.getenv("DEBUG", "").lower() in ("1", "true", "yes")
+
+
+class TracingMiddleware(BaseHTTPMiddleware):
+    """
+    Opens a trace for every request, records its latency and echoes the
+    request id back as `X-Request-ID` so slow requests can be looked up
+    in the logs.
+    """
+    async def dispatch(self, request: Request, call_next):
+        request_id = request.headers.get("x-request-id")
+        with start_trace(request_id) as trace:
+            start = time.perf_counter()
+            status_code = 500
+            try:
+                response = await call_next(request)
+                status_code = response.status_code
+            finally:
+                elapsed = time.perf_counter() - start
+                route = request.scope.get("route")
+                route_path = getattr(route, "path", "unmatched")
+                HTTP_SECONDS.labels(request.method, route_path, str(status_code)).observe(elapsed)
+                if trace.spans:
+                    logger.info(
+                        "trace %s %s %s %d %.1fms: %s",
+                        trace.request_id, request.method, route_path,
+                        status_code, elapsed * 1000, trace.summary(),
+                    )
+            response.headers["X-Request-ID"] = trace.request_id
+            return response
+
+
+class ProfilingMiddleware(BaseHTTPMiddleware):
+    """
+    Runs a request under the sampling profiler when it carries the profiling
+    token, either as an `X-Profile` header or a `__profile` query parameter.
+    Only installed when PROFILE_TOKEN is set, so it costs nothing otherwise.
+    The saved profile can be fetched from /debug/profiles/{request_id}.
+    """
+    async def dispatch(self, request: Request, call_next):
+        token = request.headers.get("x-profile") or request.query_params.get("__profile")
+        if not token_ok(token):
+            return await call_next(request)
+
+        profiler = SamplingProfiler()
+        profiler.start()
+        try:
+            response = await call_next(request)
+        finally:
+            profiler.stop()
+        request_id = current_request_id()
+        if request_id and save_profile(request_id, profiler):
+            response.headers["X-Profile-ID"] = request_id
+        return response
+
+
+class QueryStatsMiddleware(BaseHTTPMiddleware):
+    """
+    Counts the SQL statements and database time of each request. In DEBUG
+    mode they are returned as `X-DB-Queries` / `X-DB-Time-ms` headers; a
+    request over SQL_QUERY_BUDGET, or one repeating the same statement
+    shape in a loop, is logged either way.
+    """
+    async def dispatch(self, request: Request, call_next):
+        with track_queries() as stats:
+            response = await call_next(request)
+
+        repeated = stats.repeated()
+        if stats.count > SQL_QUERY_BUDGET or repeated:
+            route = getattr(request.scope.get("route"), "path", request.url.path)
+            logger.warning(
+                "%s %s ran %d SQL statements in %.1fms (budget %d)%s",
+                request.method, route, stats.count, stats.seconds * 1000,
+                SQL_QUERY_BUDGET,
+                "".join(f"\n  repeated {n}x: {shape[:200]}" for shape, n in repeated),
+            )
+        if DEBUG:
+            response.headers["X-DB-Queries"] = str(stats.count)
+            response.headers["X-DB-Time-ms"] = f"{stats.seconds * 1000:.1f}"
+        return response
@@ -1,6 +1,7 @@
 from sqlalchemy import (
-    Column, Float, Integer, String, Text, DateTime, ForeignKey, JSON, Boolean
+    Column, Float, Integer, String, Text, DateTime, ForeignKey, JSON, Boolean, Index
 )
+from sqlalchemy.ext.associationproxy import association_proxy
 from sqlalchemy.orm import relationship
 from .db import Base
 from datetime import datetime
@@ -24,15 +25,21 @@ class CV(Base):
 
     owner     = relationship("User", back_populates="cvs")
     meta      = relationship("CVMeta", uselist=False, back_populates="cv")
-    edus      = relationship("Education",   back_populates="cv", cascade="all, delete-orphan")
-    exps      = relationship("Experience",  back_populates="cv", cascade="all, delete-orphan")
-    skills    = relationship("Skill",       back_populates="cv", cascade="all, delete-orphan")
-    projects  = relationship("Project",     back_populates="cv", cascade="all, delete-orphan")
+    # collections come back in insertion order, however they are loaded
+    edus      = relationship("Education",   back_populates="cv", cascade="all, delete-orphan", order_by="Education.id")
+    exps      = relationship("Experience",  back_populates="cv", cascade="all, delete-orphan", order_by="Experience.id")
+    skills    = relationship("Skill",       back_populates="cv", cascade="all, delete-orphan", order_by="Skill.id")
+    projects  = relationship("Project",     back_populates="cv", cascade="all, delete-orphan", order_by="Project.id")
     missing_skills = relationship("MissingSkill", back_populates="cv", cascade="all, delete-orphan")
-    courses   = relationship("Course", back_populates="cv", cascade="all, delete-orphan")
-    suggested_projects = relationship("SuggestedProject", back_populates="cv", cascade="all, delete-orphan")
+    courses   = relationship("CVCourse", back_populates="cv", cascade="all, delete-orphan", order_by="CVCourse.id")
+    suggested_projects = relationship("SuggestedProject", back_populates="cv", cascade="all, delete-orphan", order_by="SuggestedProject.id")
     
 class Course(Base):
+    """
+    Legacy per-CV copies of recommended courses. No longer written; rows
+    still here are moved into course_catalog / cv_courses at startup or by
+    `python -m app.courses`.
+    """
     __tablename__ = "courses"
     id          = Column(Integer, primary_key=True, index=True)
     cv_id       = Column(Integer, ForeignKey("cvs.id"), nullable=False)
@@ -44,7 +51,35 @@ class Course(Base):
     rating      = Column(Float, nullable=True)
     duration    = Column(String, nullable=True)
 
-    cv          = relationship("CV", back_populates="courses")
+class CourseCatalog(Base):
+    """One row per course (by URL), shared by every CV it is recommended to."""
+    __tablename__ = "course_catalog"
+    id          = Column(Integer, primary_key=True, index=True)
+    url         = Column(String, unique=True, nullable=False)
+    title       = Column(String, nullable=False)
+    description = Column(Text)
+    rating      = Column(Float, nullable=True)
+    duration    = Column(String, nullable=True)
+    updated_at  = Column(DateTime, default=datetime.utcnow)
+
+class CVCourse(Base):
+    """A course recommended to a CV for one missing skill and level."""
+    __tablename__ = "cv_courses"
+    id        = Column(Integer, primary_key=True, index=True)
+    cv_id     = Column(Integer, ForeignKey("cvs.id"), nullable=False, index=True)
+    course_id = Column(Integer, ForeignKey("course_catalog.id"), nullable=False, index=True)
+    skill     = Column(String, nullable=False)
+    level     = Column(String)
+
+    cv        = relationship("CV", back_populates="courses")
+    course    = relationship("CourseCatalog")
+
+    # read like the old per-CV Course rows (load `course` eagerly)
+    title       = association_proxy("course", "title")
+    url         = association_proxy("course", "url")
+    description = association_proxy("course", "description")
+    rating      = association_proxy("course", "rating")
+    duration    = association_proxy("course", "duration")
 
 class CVMeta(Base):
     __tablename__ = "cv_meta"
@@ -137,4 +172,36 @@ class ChatMessage(Base):
     content     = Column(Text, nullable=False)
     timestamp   = Column(DateTime, default=datetime.utcnow)
 
-    project     = relationship("SuggestedProject", back_populates="chat_messages")
\ No newline at end of file
+    project     = relationship("SuggestedProject", back_populates="chat_messages")
+
+class AppState(Base):
+    __tablename__ = "app_state"
+    key   = Column(String, primary_key=True)
+    value = Column(Text, nullable=True)
+
+
+class SuggestionSet(Base):
+    """A generated set of suggested projects, reusable across similar CVs."""
+    __tablename__ = "suggestion_sets"
+    id           = Column(Integer, primary_key=True, index=True)
+    domain_key   = Column(String, index=True, nullable=False)
+    skills       = Column(JSON, nullable=False)     # canonical skills it was generated for
+    signature    = Column(JSON, nullable=False)     # MinHash of their normalized keys
+    projects     = Column(JSON, nullable=False)
+    hits         = Column(Integer, default=0)
+    created_at   = Column(DateTime, default=datetime.utcnow)
+    last_used_at = Column(DateTime, default=datetime.utcnow)
+
+
+class AnalyticsCount(Base):
+    """
+    Running counts over each user's latest CV: kind "skill" / "missing" per
+    skill, "domain" per domain. `domain` is "" for the all-domains totals.
+    """
+    __tablename__ = "analytics_counts"
+    kind   = Column(String, primary_key=True)
+    domain = Column(String, primary_key=True)
+    name   = Column(String, primary_key=True)
+    count  = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (Index("ix_analytics_counts_top", "kind", "domain", "count"),)
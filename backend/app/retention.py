@@ -0,0 +1,210 @@
+# backend/app/retention.py
+"""
+Retention for superseded CVs and their files.
+
+    python -m app.retention                 # keep RETAIN_CV_VERSIONS per user
+    python -m app.retention --keep 1 --dry-run
+
+Each user keeps their newest N CVs; older versions are deleted with all
+their dependent rows, a batch of CVs per transaction. Files in uploads/
+that no remaining CV refers to (older than a grace period, so uploads in
+progress are left alone) are removed. The same job runs in the background
+every RETENTION_INTERVAL seconds when that is set.
+"""
+
+import os
+import sys
+import time
+import logging
+import argparse
+import threading
+from collections import Counter
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from .db import SessionLocal
+from . import models
+from .crud import latest_cv_ids, cv_analytics, apply_analytics
+from .utils.similarity import get_index
+from .utils.cv_parser import image_source
+
+logger = logging.getLogger(__name__)
+
+RETAIN_CV_VERSIONS = int(os.getenv("RETAIN_CV_VERSIONS", "3"))
+# seconds between background runs; 0 disables the background job
+RETENTION_INTERVAL = float(os.getenv("RETENTION_INTERVAL", "0"))
+# files younger than this are never collected
+RETENTION_FILE_GRACE = float(os.getenv("RETENTION_FILE_GRACE", "3600"))
+UPLOAD_DIR = "uploads"
+
+# dependents first, the CV row last
+_CV_TABLES = [
+    models.CVCourse, models.Course, models.MissingSkill, models.Skill, models.Project,
+    models.Education, models.Experience, models.CVMeta,
+]
+
+
+def superseded_cv_ids(db: Session, keep: int):
+    """Ids of every CV that is not among its owner's newest `keep`."""
+    ranked = (
+        db.query(
+            models.CV.id.label("id"),
+            func.row_number().over(
+                partition_by=models.CV.user_id, order_by=models.CV.id.desc()
+            ).label("rank"),
+        ).subquery()
+    )
+    return [cv_id for (cv_id,) in
+            db.query(ranked.c.id).filter(ranked.c.rank > keep).order_by(ranked.c.id)]
+
+
+def delete_cvs(db: Session, cv_ids, counts: Counter):
+    """Delete CVs with all their dependent rows (no commit)."""
+    # a deleted CV that was its owner's latest hands the analytics over to
+    # the one that is latest afterwards
+    doomed = set(cv_ids)
+    owners = {u for (u,) in db.query(models.CV.user_id).filter(models.CV.id.in_(cv_ids)).distinct()}
+    dropped = {u: i for u, i in latest_cv_ids(db, owners).items() if i in doomed}
+    delta = Counter()
+    delta.subtract(cv_analytics(db, dropped.values()))
+    project_ids = [pid for (pid,) in db.query(models.SuggestedProject.id)
+                                       .filter(models.SuggestedProject.cv_id.in_(cv_ids))]
+    if project_ids:
+        counts["chat_messages"] += db.query(models.ChatMessage).filter(
+            models.ChatMessage.project_id.in_(project_ids)
+        ).delete(synchronize_session=False)
+        counts["suggested_projects"] += db.query(models.SuggestedProject).filter(
+            models.SuggestedProject.id.in_(project_ids)
+        ).delete(synchronize_session=False)
+    for table in _CV_TABLES:
+        counts[table.__tablename__] += db.query(table).filter(
+            table.cv_id.in_(cv_ids)
+        ).delete(synchronize_session=False)
+    counts["cvs"] += db.query(models.CV).filter(
+        models.CV.id.in_(cv_ids)
+    ).delete(synchronize_session=False)
+    if dropped:
+        delta.update(cv_analytics(db, latest_cv_ids(db, dropped.keys()).values()))
+        apply_analytics(db, delta)
+
+
+def prune_cv_versions(db: Session, keep: int = RETAIN_CV_VERSIONS,
+                      batch_size: int = 500, dry_run: bool = False) -> Counter:
+    """Delete superseded CVs in batches; returns rows deleted per table."""
+    counts: Counter = Counter()
+    ids = superseded_cv_ids(db, keep)
+    if dry_run:
+        counts["cvs"] = len(ids)
+        return counts
+    for start in range(0, len(ids), batch_size):
+        batch = ids[start:start + batch_size]
+        try:
+            delete_cvs(db, batch, counts)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+    # only each user's latest CV is indexed, but an older one may still be
+    # there if the index was built before a re-upload
+    if ids and get_index().exists():
+        get_index().update([], remove=ids)
+    return counts
+
+
+def collect_orphan_files(db: Session, upload_dir: str = UPLOAD_DIR,
+                         grace: float = RETENTION_FILE_GRACE, dry_run: bool = False):
+    """
+    Remove files under upload_dir that no CV row refers to and that are
+    older than `grace` seconds. A CV's files are its PDF and the images
+    extracted from it. Returns (files removed, bytes reclaimed).
+    """
+    if not os.path.isdir(upload_dir):
+        return 0, 0
+    referenced = {name for (name,) in db.query(models.CV.filename).distinct()}
+    stems = {os.path.splitext(name)[0] for name in referenced}
+    cutoff = time.time() - grace
+    removed, reclaimed = 0, 0
+    with os.scandir(upload_dir) as entries:
+        for entry in entries:
+            if not entry.is_file() or entry.name in referenced or image_source(entry.name) in stems:
+                continue
+            stat = entry.stat()
+            if stat.st_mtime > cutoff:
+                continue
+            if not dry_run:
+                try:
+                    os.remove(entry.path)
+                except OSError as e:
+                    logger.warning("Could not remove %s: %s", entry.path, e)
+                    continue
+            removed += 1
+            reclaimed += stat.st_size
+    return removed, reclaimed
+
+
+def run_retention(db: Session, keep: int = RETAIN_CV_VERSIONS, batch_size: int = 500,
+                  dry_run: bool = False) -> dict:
+    start = time.perf_counter()
+    counts = prune_cv_versions(db, keep, batch_size, dry_run)
+    files, reclaimed = collect_orphan_files(db, dry_run=dry_run)
+    report = {
+        "cvs_deleted": counts.get("cvs", 0),
+        "rows_deleted": dict(counts),
+        "files_removed": files,
+        "bytes_reclaimed": reclaimed,
+        "seconds": round(time.perf_counter() - start, 2),
+        "dry_run": dry_run,
+    }
+    logger.info("Retention (keep %d): %s", keep, report)
+    return report
+
+
+def start_background_retention():
+    """Run the retention job every RETENTION_INTERVAL seconds in a daemon thread."""
+    if RETENTION_INTERVAL <= 0:
+        return
+
+    def loop():
+        while True:
+            time.sleep(RETENTION_INTERVAL)
+            db = SessionLocal()
+            try:
+                run_retention(db)
+            except Exception:
+                logger.exception("Background retention run failed")
+            finally:
+                db.close()
+
+    threading.Thread(target=loop, name="retention", daemon=True).start()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Delete superseded CV versions and orphaned uploads")
+    parser.add_argument("--keep", type=int, default=RETAIN_CV_VERSIONS,
+                        help="CV versions kept per user")
+    parser.add_argument("--batch-size", type=int, default=500,
+                        help="CVs deleted per transaction")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="report what would be deleted without deleting")
+    args = parser.parse_args(argv)
+    if args.keep < 1:
+        parser.error("--keep must be at least 1")
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger().setLevel(logging.WARNING)
+
+    db = SessionLocal()
+    try:
+        report = run_retention(db, args.keep, args.batch_size, args.dry_run)
+    finally:
+        db.close()
+    verb = "would delete" if args.dry_run else "deleted"
+    print(f"{verb} {report['cvs_deleted']} CVs "
+          f"({sum(report['rows_deleted'].values())} rows), "
+          f"{report['files_removed']} files, {report['bytes_reclaimed'] / 1e6:.1f} MB reclaimed "
+          f"in {report['seconds']}s", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
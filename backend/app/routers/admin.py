@@ -0,0 +1,40 @@
+import os
+import hmac
+from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, Header, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from ..export import stream_export
+
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+
+def admin_enabled() -> bool:
+    return bool(ADMIN_TOKEN)
+
+
+def _check_token(token: Optional[str]):
+    if not (ADMIN_TOKEN and token and hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode())):
+        raise HTTPException(403, "Invalid admin token")
+
+
+@router.get("/export/cvs", include_in_schema=False)
+def export_cvs(
+    since: Optional[datetime] = Query(None, description="only CVs created at or after this time"),
+    cursor: Optional[int] = Query(None, description="resume after this cv id"),
+    gzip: bool = Query(False),
+    x_admin_token: Optional[str] = Header(None),
+):
+    """
+    Every parsed CV as NDJSON, streamed in id order. Each line carries its
+    `id`; pass the last one received as `cursor` to resume.
+    """
+    _check_token(x_admin_token)
+    filename = "cvs.ndjson.gz" if gzip else "cvs.ndjson"
+    return StreamingResponse(
+        stream_export(since, cursor, gzip),
+        media_type="application/gzip" if gzip else "application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
@@ -0,0 +1,58 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from .. import models
+from ..crud import top_counts, domain_users, ALL_DOMAINS
+from ..dependencies import get_async_db, get_current_user
+from ..schemas import NamedCount, DomainBreakdown
+
+# every route reads the maintained counts in analytics_counts: a bounded
+# index range scan, however many CVs are stored
+router = APIRouter(prefix="/analytics", tags=["analytics"])
+
+
+@router.get("/skills", response_model=list[NamedCount])
+async def top_skills(
+    domain: str = Query(ALL_DOMAINS, description="restrict to one domain"),
+    k: int = Query(20, ge=1, le=200),
+    db: AsyncSession = Depends(get_async_db),
+    user: models.User = Depends(get_current_user),
+):
+    """Most common skills on users' current CVs."""
+    return await top_counts(db, "skill", domain, k)
+
+
+@router.get("/missing-skills", response_model=list[NamedCount])
+async def top_missing_skills(
+    domain: str = Query(ALL_DOMAINS, description="restrict to one domain"),
+    k: int = Query(20, ge=1, le=200),
+    db: AsyncSession = Depends(get_async_db),
+    user: models.User = Depends(get_current_user),
+):
+    """Most common missing skills on users' current CVs."""
+    return await top_counts(db, "missing", domain, k)
+
+
+@router.get("/domains", response_model=list[NamedCount])
+async def domain_distribution(
+    k: int = Query(50, ge=1, le=500),
+    db: AsyncSession = Depends(get_async_db),
+    user: models.User = Depends(get_current_user),
+):
+    """Users per domain."""
+    return await top_counts(db, "domain", ALL_DOMAINS, k)
+
+
+@router.get("/domains/{domain}", response_model=DomainBreakdown)
+async def domain_breakdown(
+    domain: str,
+    k: int = Query(20, ge=1, le=200),
+    db: AsyncSession = Depends(get_async_db),
+    user: models.User = Depends(get_current_user),
+):
+    """Users, top skills and top missing skills within one domain."""
+    return {
+        "domain":         domain,
+        "users":          await domain_users(db, domain),
+        "skills":         await top_counts(db, "skill", domain, k),
+        "missing_skills": await top_counts(db, "missing", domain, k),
+    }
@@ -1,13 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request
+from sqlalchemy.ext.asyncio import AsyncSession
 from ..crud import get_chat_history, send_and_save_chat
-from ..dependencies import get_db
+from ..dependencies import get_async_db
+from ..utils.llm_scheduler import (
+    llm_priority, cancel_on_disconnect, LLMCancelled, SchedulerBusy
+)
 
 router = APIRouter()
 
 @router.get("/projects/{project_id}/chat")
-def read_chat(project_id: str, db: Session = Depends(get_db)):
-    msgs = get_chat_history(db, project_id)
+async def read_chat(project_id: int, db: AsyncSession = Depends(get_async_db)):
+    msgs = await get_chat_history(db, project_id)
     return [
       {
         "id":        m.id,
@@ -19,11 +22,20 @@ def read_chat(project_id: str, db: Session = Depends(get_db)):
     ]
 
 @router.post("/projects/{project_id}/chat")
-def post_chat(project_id: str, payload: dict, db: Session = Depends(get_db)):
+async def post_chat(project_id: int, payload: dict, request: Request, db: AsyncSession = Depends(get_async_db)):
     user_input = payload.get("message")
     if not user_input:
         raise HTTPException(400, "Missing `message` in body")
-    assistant_msg = send_and_save_chat(db, project_id, user_input)
+    # chat is interactive: it jumps the LLM queue ahead of CV parsing, and
+    # gives up its slot if the user closes the page
+    try:
+        with llm_priority("interactive"):
+            async with cancel_on_disconnect(request):
+                assistant_msg = await send_and_save_chat(db, project_id, user_input)
+    except SchedulerBusy:
+        raise HTTPException(503, "The assistant is busy, try again shortly", headers={"Retry-After": "5"})
+    except LLMCancelled:
+        raise HTTPException(499, "Client closed request")
     return {
       "assistant": {
         "id":        assistant_msg.id,
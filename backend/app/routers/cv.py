@@ -1,35 +1,106 @@
 # backend/app/routers/cv.py
 
 import os
-from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, status
+import asyncio
+from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, Query, Request, status
+from fastapi.concurrency import run_in_threadpool
 from ..utils.coursera_searcher import CourseraSearcher
-from ..crud import create_courses_for_cv, generate_and_save_suggestions
+from ..crud import (
+    create_courses_for_cv, suggest_projects, save_suggestions,
+    plan_reanalysis, carry_over_courses, move_suggestions,
+)
 
-from ..crud import save_recommended_courses
+from ..crud import fetch_recommended_courses
 
-from sqlalchemy.orm import Session
-import json, logging
+from sqlalchemy.ext.asyncio import AsyncSession
+import logging
 
 from .. import models
-from ..crud import create_cv
-from ..dependencies import get_db, get_current_user
+from ..crud import create_cv, replace_missing_skills, index_cvs, find_similar_cvs, similarity_vectors
+from ..crud import get_latest_cv, get_cv, user_cv_ids, cv_to_dict
+from ..dependencies import get_async_db, get_current_user
 from ..utils.cv_parser import (
-    extract_text,
+    extract_pages,
     extract_links,
     extract_images,
-    build_parse_prompt,
-    call_mistral,
+    parse_cv,
+    normalize_parsed,
 )
-from ..schemas import CVOut
+from ..utils.cv_text import compact_text
+from ..schemas import CVOut, SimilarQuery, SimilarCandidate
 from ..models import CVMeta
+from ..utils.metrics import span
+from ..utils.similarity import cv_vector
+from ..utils.llm_scheduler import cancel_on_disconnect, cancel_scope, LLMCancelled, SchedulerBusy
+from ..utils.admission import upload_admission, AdmissionRejected
 
 router = APIRouter(prefix="/cv")
+logger = logging.getLogger(__name__)
+
+# per-stage timeouts (seconds) for the post-parse enrichment fan-out
+SUGGESTIONS_TIMEOUT = float(os.getenv("SUGGESTIONS_TIMEOUT", "180"))
+COURSES_TIMEOUT     = float(os.getenv("COURSES_TIMEOUT", "300"))
+
+async def _enrich_stage(name: str, timeout: float, fn, *args):
+    """
+    Run one blocking enrichment stage in the threadpool under a timeout.
+    The thread can't be interrupted, so a timeout sets the stage's cancel
+    event instead and the worker gives up at its next LLM call or search.
+    """
+    with span(f"upload.{name}"), cancel_scope() as cancel:
+        try:
+            return await asyncio.wait_for(run_in_threadpool(fn, *args), timeout)
+        except asyncio.TimeoutError:
+            cancel.set()
+            raise
+
+async def run_enrichment(domain: str, skills: list[str], missing_skills: list[str],
+                         suggestions: bool = True) -> dict:
+    """
+    Suggested projects (LLM) and recommended courses (Coursera scrape) only
+    depend on the parse, so they run concurrently. A stage that fails or
+    times out comes back as None and the other one is still saved; so does
+    a stage that isn't needed (suggestions=False, no missing skills).
+    """
+    stages = {}
+    if suggestions:
+        stages["suggestions"] = _enrich_stage("suggestions", SUGGESTIONS_TIMEOUT, suggest_projects, domain, skills)
+    if missing_skills:
+        stages["courses"] = _enrich_stage("courses", COURSES_TIMEOUT, fetch_recommended_courses, missing_skills, skills, domain)
+    names = list(stages)
+    results = await asyncio.gather(*stages.values(), return_exceptions=True)
+    out = {"suggestions": None, "courses": None}
+    for name, result in zip(names, results):
+        if isinstance(result, asyncio.TimeoutError):
+            logger.warning("Enrichment stage %s timed out", name)
+            result = None
+        elif isinstance(result, Exception):
+            logger.error("Enrichment stage %s failed: %s", name, result)
+            result = None
+        out[name] = result
+    return out
+
+async def upload_slot(user: models.User = Depends(get_current_user)):
+    """
+    Hold an upload slot for the whole request: a bounded number run at
+    once, a bounded queue waits, and the rest get a 429 straight away.
+    """
+    try:
+        async with upload_admission.admit(user.id):
+            yield
+    except AdmissionRejected as e:
+        detail = ("You already have a CV upload in progress" if e.reason == "per_user_limit"
+                  else "Too many CV uploads in progress, try again shortly")
+        raise HTTPException(status.HTTP_429_TOO_MANY_REQUESTS, detail,
+                            headers={"Retry-After": str(e.retry_after)})
 
 @router.post("/upload", response_model=CVOut, status_code=status.HTTP_201_CREATED)
 async def upload_cv(
+    request: Request,
     file: UploadFile = File(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     user: models.User = Depends(get_current_user),
+    _slot: None = Depends(upload_slot),
 ):
     # 1) Ensure upload dir exists
     upload_dir = "uploads"
@@ -38,98 +109,52 @@ async def upload_cv(
     # 2) Save the file
     file_path = os.path.join(upload_dir, file.filename)
     try:
-        contents = await file.read()
-        with open(file_path, "wb") as f:
-            f.write(contents)
+        with span("upload.save_file"):
+            contents = await file.read()
+            with open(file_path, "wb") as f:
+                f.write(contents)
     except Exception as e:
         raise HTTPException(status_code=500, detail="Could not save uploaded file")
 
     # 3) Parse with your utilities
-    text = extract_text(file_path)
-    links = extract_links(file_path)
-    images = extract_images(file_path, output_dir=upload_dir)
+    with span("upload.extract_pdf"):
+        text = compact_text(extract_pages(file_path))
+        links = extract_links(file_path)
+        images = extract_images(file_path, output_dir=upload_dir)
 
-    
-    logger = logging.getLogger(__name__)
-    
-    # 4) Build prompt + call LLM
-    prompt = build_parse_prompt(text, links)
-    raw = call_mistral(prompt)   # raw JSON text
-    logger.info("LLM raw output: %r", raw) 
-    # extract the first {...} block and ignore anything after it
-    # pull out everything from the first '{' to the last '}' so we get the full JSON
-    start = raw.find("{")
-    end   = raw.rfind("}") + 1
-    if start == -1 or end == 0:
-        logger.error("LLM output didn't contain any JSON braces")
-        raise HTTPException(500, "LLM response did not contain JSON")
-
-    json_text = raw[start:end]
+    # 4) Build prompt(s) + call LLM
+    # LLM work runs at "batch" priority (below chat) and is dropped if the
+    # client disconnects
     try:
-        parsed = json.loads(json_text)
-    except json.JSONDecodeError as err:
-        # logger.error("Failed to JSON-decode LLM output: %s", err)
+        async with cancel_on_disconnect(request):
+            with span("upload.llm_parse"):
+                # long CVs are parsed section by section in parallel and merged
+                parsed = await run_in_threadpool(parse_cv, text, links)
+    except SchedulerBusy:
+        raise HTTPException(503, "CV parsing is at capacity, try again shortly", headers={"Retry-After": "30"})
+    except LLMCancelled:
+        raise HTTPException(499, "Client closed request")
+    except ValueError:
+        logger.error("LLM output could not be recovered as JSON")
         raise HTTPException(500, "Failed to parse LLM response as JSON")
-    # logger.info("LLM parsed output: %r", parsed) 
+    if not isinstance(parsed, dict):
+        raise HTTPException(500, "LLM response was not a JSON object")
 
     # ─── normalize for CVParsed ─────────────────────────────────────
-    # 1) pull top-level meta fields into parsed["meta"]
-    if "meta" not in parsed:
-        meta = {k: parsed.pop(k, None)
-                for k in ["name","email","phone","bio","linkedin","github"]}
-        # everything that’s left is education/experience/skills/projects
-        parsed = {"meta": meta, **parsed}
-        logger.info("name: %s, email: %s, phone: %s, bio: %s, linkedin: %s, github: %s",
-                    meta.get("name"), meta.get("email"), meta.get("phone"), meta.get("bio"), meta.get("linkedin"), meta.get("github"))
-
-    # 2) turn each flat skill string into a dict with {"name": …}
-    parsed["skills"] = [
-        s["name"] if isinstance(s, dict) and "name" in s else s
-        for s in parsed.get("skills", [])
-    ]
-
-    # 3) ensure each project's tools is a real list
-    for proj in parsed.get("projects", []):
-        tools = proj.get("tools", [])
-        if isinstance(tools, str):
-            proj["tools"] = [t.strip() for t in tools.split(",") if t.strip()]
-            
-    # 4) collapse single‐item link lists into a string (or None)
-    for proj in parsed.get("projects", []):
-        link = proj.get("link")
-        if isinstance(link, str):
-            if not (link.startswith("http://") or link.startswith("https://")):
-                proj["link"] = None
-        elif isinstance(link, list):
-            valid = [
-                l for l in link
-                if isinstance(l, str)
-                and (l.startswith("http://") or l.startswith("https://"))
-            ]
-            proj["link"] = valid or None
-
+    parsed = normalize_parsed(parsed)
+    domain          = parsed["meta"]["domain"]
+    missing_skills  = parsed["missing_skills"]
 
 
-    for key in ("linkedin", "github"):
-        val = parsed["meta"].get(key)
-        if isinstance(val, str):
-            parsed["meta"][key] = val.strip().strip("'").strip('"')
-            
-    domain          = parsed.pop("domain", None)
-    missing_skills  = parsed.pop("missing_skills", [])
-    
-    parsed["meta"]["domain"]         = domain
-    parsed["missing_skills"] = missing_skills
-
-
-    # 5) Persist CV record
-    cv = create_cv(
-        db,
-        user_id=user.id,
-        filename=file.filename,
-        parsed=parsed,
-        images=images,
-    )
+    # 5) Persist CV record (create_cv is shared with the sync ingest CLI)
+    with span("upload.db_create_cv"):
+        cv = await db.run_sync(
+            create_cv,
+            user_id=user.id,
+            filename=file.filename,
+            parsed=parsed,
+            images=images,
+        )
     
         # ─── save domain on the User ──────────────────────────────────
     if domain:
@@ -138,19 +163,34 @@ async def upload_cv(
     
     # domain = parsed["meta"]["domain"]
     skills = parsed["skills"]
-    generate_and_save_suggestions(db, cv.id, domain, skills)
 
-    # ─── upsert missing skills ────────────────────────────────────
+    # a revised CV only recomputes what its changes affect
+    with span("upload.diff_previous"):
+        plan = await plan_reanalysis(db, user.id, cv.id, domain, skills, missing_skills)
+    async with cancel_on_disconnect(request):
+        with span("upload.enrichment"):
+            enriched = await run_enrichment(
+                domain, skills, plan["fetch_courses"],
+                suggestions=not plan["reuse_suggestions"],
+            )
+
+    # ─── persist enrichment + missing skills together ─────────────
     # (delete old, then bulk insert fresh)
-    db.query(models.MissingSkill).filter_by(cv_id=cv.id).delete()
-    for skill in missing_skills:
-        if skill and isinstance(skill, str):
-            db.add(models.MissingSkill(cv_id=cv.id, name=skill.strip()))
-            
-    db.commit()
-    
-    save_recommended_courses(db, cv.id, missing_skills)
-    db.refresh(cv)  # ensure relationships are loaded
+    def save_enrichment(sync_db):
+        if plan["reuse_suggestions"]:
+            move_suggestions(sync_db, plan["previous"], cv.id)
+        elif enriched["suggestions"] is not None:
+            save_suggestions(sync_db, cv.id, enriched["suggestions"], commit=False)
+        replace_missing_skills(sync_db, cv.id, missing_skills)
+        if enriched["courses"] is not None:
+            create_courses_for_cv(sync_db, cv.id, enriched["courses"], commit=False)
+        if plan["previous"] is not None:
+            carry_over_courses(sync_db, plan["previous"], cv.id, plan["carry_courses"])
+
+    with span("upload.db_enrichment"):
+        await db.run_sync(save_enrichment)
+        await db.commit()
+    cv = await get_cv(db, cv.id)  # with its suggestions and courses loaded
     
     parsed["suggested_projects"] = [
       {
@@ -182,31 +222,38 @@ async def upload_cv(
     
         # 5b) Persist the meta block into cv_meta
     meta_dict = parsed["meta"]
-    existing = db.query(CVMeta).get(cv.id)
-    if existing:
-        existing.name     = meta_dict.get("name")
-        existing.email    = meta_dict.get("email")
-        existing.phone    = meta_dict.get("phone")
-        existing.bio      = meta_dict.get("bio")
-        existing.linkedin = meta_dict.get("linkedin")
-        existing.github   = meta_dict.get("github")
-        existing.domain   = domain
-    else:
-        db.add(CVMeta(
-            cv_id    = cv.id,
-            name     = meta_dict.get("name"),
-            email    = meta_dict.get("email"),
-            phone    = meta_dict.get("phone"),
-            bio      = meta_dict.get("bio"),
-            linkedin = meta_dict.get("linkedin"),
-            github   = meta_dict.get("github"),
-            domain   = domain,
-        ))
-    db.commit()
-    # 6) Mark that the user has now uploaded a CV
-    user.has_uploaded_cv = True
-    db.add(user)
-    db.commit()
+    with span("upload.db_finalize"):
+        existing = cv.meta
+        if existing:
+            existing.name     = meta_dict.get("name")
+            existing.email    = meta_dict.get("email")
+            existing.phone    = meta_dict.get("phone")
+            existing.bio      = meta_dict.get("bio")
+            existing.linkedin = meta_dict.get("linkedin")
+            existing.github   = meta_dict.get("github")
+            existing.domain   = domain
+        else:
+            db.add(CVMeta(
+                cv_id    = cv.id,
+                name     = meta_dict.get("name"),
+                email    = meta_dict.get("email"),
+                phone    = meta_dict.get("phone"),
+                bio      = meta_dict.get("bio"),
+                linkedin = meta_dict.get("linkedin"),
+                github   = meta_dict.get("github"),
+                domain   = domain,
+            ))
+        # 6) Mark that the user has now uploaded a CV
+        user.has_uploaded_cv = True
+        db.add(user)
+        await db.commit()
+
+    # similar-candidate search; the CV itself is already safely stored
+    try:
+        with span("upload.similarity_index"):
+            await db.run_sync(index_cvs, [cv.id])
+    except Exception:
+        logger.exception("Could not add CV %s to the similarity index", cv.id)
     
     
 
@@ -221,127 +268,39 @@ async def upload_cv(
 
 
 @router.get("/me", response_model=CVOut, status_code=status.HTTP_200_OK)
-def read_my_cv(
-    db: Session = Depends(get_db),
+async def read_my_cv(
+    db: AsyncSession = Depends(get_async_db),
     user: models.User = Depends(get_current_user),
 ):
-    # grab the most recent CV for this user
-    cv: models.CV = (
-        db.query(models.CV)
-          .filter(models.CV.user_id == user.id)
-          .order_by(models.CV.created_at.desc())
-          .first()
-    )
+    # grab the most recent CV for this user, with all of its parts
+    cv: models.CV = await get_latest_cv(db, user.id, full=True)
     if not cv:
         raise HTTPException(404, "No CV found for this user")
 
-    education = [
-        {
-          "degree":      e.degree,
-          "university":  e.university,
-          "location":    e.location,
-          "gpa":         e.gpa,
-          "description": e.description,
-          "start_date":  e.start_date,
-          "end_date":    e.end_date,
-        }
-        for e in cv.edus
-    ]
-    # assemble the “parsed” blob just like in your upload handler
-    meta = {
-        "name":     cv.meta.name,
-        "email":    cv.meta.email,
-        "phone":    cv.meta.phone,
-        "bio":      cv.meta.bio,
-        "linkedin": cv.meta.linkedin,
-        "github":   cv.meta.github,
-        "domain":   cv.meta.domain,
-    }
-    experience = [
-        {
-          "role":        x.role,
-          "company":     x.company,
-          "location":    x.location,
-          "date":        x.date,
-          "description": x.description,
-        }
-        for x in cv.exps
-    ]
-    skills = [s.name for s in cv.skills]
-    projects = []
-    for p in cv.projects:
-        # 1) tools must be a list
-        raw_tools = p.tools or ""
-        if isinstance(raw_tools, str):
-            tools = [t.strip() for t in raw_tools.split(",") if t.strip()]
-        else:
-            tools = raw_tools
+    return cv_to_dict(cv)
 
-        # 2) link must be a list of valid URL(s)
-        raw_link = p.link
-        links: list[str] = []
-        if raw_link:
-            if isinstance(raw_link, str):
-                cleaned = raw_link.strip().strip('"')
-                if cleaned and cleaned.lower() != "null":
-                    links = [cleaned]
-            elif isinstance(raw_link, list):
-                # drop any falsy or "null" strings
-                links = [
-                    l.strip().strip('"')
-                    for l in raw_link
-                    if isinstance(l, str) and l.strip().lower() != "null"
-                ]
 
-        projects.append({
-            "name":        p.name,
-            "tools":       tools,
-            "description": p.description,
-            "link":        links,
-        })
-    
+@router.get("/similar", response_model=list[SimilarCandidate])
+async def similar_to_my_cv(
+    k: int = Query(10, ge=1, le=100),
+    db: AsyncSession = Depends(get_async_db),
+    user: models.User = Depends(get_current_user),
+):
+    """The k stored CVs most similar to the current user's latest CV."""
+    cv = await get_latest_cv(db, user.id)
+    if not cv:
+        raise HTTPException(404, "No CV found for this user")
+    [(_, query)] = await db.run_sync(similarity_vectors, [cv.id])
+    own = await user_cv_ids(db, user.id)
+    return await find_similar_cvs(db, query, k, exclude=own)
 
-    # pull missing skills for this CV
-    missing_skills = [ms.name for ms in cv.missing_skills]
 
-    # pull courses from DB
-    courses = [
-        {
-          "skill":       c.skill,
-          "level":       c.level,
-          "title":       c.title,
-          "url":         c.url,
-          "description": c.description,
-          "rating":      c.rating,
-          "duration":    c.duration,
-        }
-        for c in cv.courses
-    ]
-    
-    suggested = [
-      {
-        "id":          sp.id,
-        "name":        sp.name,
-        "description": sp.description,
-        "tools":       sp.tools or [],
-        "difficulty":  sp.difficulty,
-        "tasks":       sp.tasks or [],
-      }
-      for sp in cv.suggested_projects
-    ]
-    
-    return {
-      "id":         cv.id,
-      "filename":   cv.filename,
-      "created_at": cv.created_at,
-      "parsed": {
-        "meta":      meta,
-        "education": education,
-        "experience": experience,
-        "skills":    skills,
-        "missing_skills": missing_skills,
-        "projects":  projects,
-        "courses":   courses,
-        "suggested_projects": suggested,
-      },
-    }
\ No newline at end of file
+@router.post("/similar", response_model=list[SimilarCandidate])
+async def similar_to_skills(
+    body: SimilarQuery,
+    k: int = Query(10, ge=1, le=100),
+    db: AsyncSession = Depends(get_async_db),
+    user: models.User = Depends(get_current_user),
+):
+    """The k stored CVs most similar to a skill list (and optional domain)."""
+    return await find_similar_cvs(db, cv_vector(body.skills, body.tools, body.domain), k)
@@ -0,0 +1,15 @@
+from fastapi import APIRouter, Header, HTTPException, Response
+from typing import Optional
+from ..utils.profiling import load_profile, token_ok
+
+router = APIRouter(prefix="/debug", tags=["debug"])
+
+@router.get("/profiles/{request_id}", include_in_schema=False)
+def read_profile(request_id: str, x_profile: Optional[str] = Header(None)):
+    if not token_ok(x_profile):
+        raise HTTPException(403, "Invalid profiling token")
+    profile = load_profile(request_id)
+    if profile is None:
+        raise HTTPException(404, "No profile for this request id")
+    # collapsed stacks: feed to flamegraph.pl or drop into speedscope
+    return Response(content=profile, media_type="text/plain")
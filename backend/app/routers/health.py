@@ -0,0 +1,14 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from ..utils.readiness import readiness, failures
+
+router = APIRouter(tags=["health"])
+
+@router.get("/ready", include_in_schema=False)
+def ready():
+    # 503 until the database pool and the LLMs are warm, so a load
+    # balancer keeps traffic on the old workers during a rollout; checks
+    # that gave up (a model that isn't installed) are listed with the reason
+    ok, checks = readiness()
+    return JSONResponse({"ready": ok, "checks": checks, "failed": failures()},
+                        status_code=200 if ok else 503)
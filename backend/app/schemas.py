@@ -118,4 +118,25 @@ class UserProfileOut(UserOut):
     cv: Optional[CVOut] = None
 
     class Config(UserOut.Config):
-        orm_mode = True
\ No newline at end of file
+        orm_mode = True
+
+class SimilarQuery(BaseModel):
+    skills: List[str]
+    tools: List[str] = []
+    domain: Optional[str] = None
+
+class SimilarCandidate(BaseModel):
+    cv_id: int
+    score: float
+    domain: Optional[str]
+    skills: List[str]
+
+class NamedCount(BaseModel):
+    name: str
+    count: int
+
+class DomainBreakdown(BaseModel):
+    domain: str
+    users: int
+    skills: List[NamedCount]
+    missing_skills: List[NamedCount]
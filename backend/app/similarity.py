@@ -0,0 +1,39 @@
+# backend/app/similarity.py
+"""
+Rebuild the similar-candidate index from the database.
+
+    python -m app.similarity
+
+Uploads keep the index current on their own; this is for a fresh
+deployment, a changed SIMILARITY_DIM or a changed skill taxonomy.
+"""
+
+import sys
+import time
+import logging
+import argparse
+
+from .db import SessionLocal
+from .crud import rebuild_similarity_index
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rebuild the similar-candidate index")
+    parser.add_argument("--batch-size", type=int, default=1000,
+                        help="CVs loaded per query")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger().setLevel(logging.WARNING)
+
+    db = SessionLocal()
+    start = time.perf_counter()
+    try:
+        count = rebuild_similarity_index(db, args.batch_size)
+    finally:
+        db.close()
+    print(f"indexed {count} CVs in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,134 @@
+# backend/app/utils/admission.py
+
+import os
+import time
+import asyncio
+import logging
+from collections import Counter, deque
+from contextlib import asynccontextmanager
+from typing import Deque, Hashable
+
+from .metrics import ADMISSION_IN_PROGRESS, ADMISSION_QUEUE_DEPTH, ADMISSION_OUTCOMES, ADMISSION_WAIT_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# uploads processed at once per worker; more wait in a queue of
+# UPLOAD_QUEUE_LIMIT, and beyond that they are turned away with a 429
+UPLOAD_CONCURRENCY = int(os.getenv("UPLOAD_CONCURRENCY", "4"))
+UPLOAD_QUEUE_LIMIT = int(os.getenv("UPLOAD_QUEUE_LIMIT", "16"))
+# uploads one user may have running or queued
+UPLOAD_PER_USER = int(os.getenv("UPLOAD_PER_USER", "1"))
+# a queued upload gives up after this long
+UPLOAD_QUEUE_TIMEOUT = float(os.getenv("UPLOAD_QUEUE_TIMEOUT", "120"))
+# assumed upload duration until some have been observed
+UPLOAD_EXPECTED_SECONDS = float(os.getenv("UPLOAD_EXPECTED_SECONDS", "60"))
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(f"{reason}, retry after {retry_after}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    At most `limit` holders at once, a FIFO queue of at most `queue_limit`
+    waiters and at most `per_key` holders-or-waiters per key (user).
+
+    Requests that can't even queue are rejected right away with a
+    Retry-After estimate: the work ahead of them (in progress and queued)
+    spread over the slots, at the average time a slot was held recently.
+    Runs on the event loop; limits apply per worker process.
+    """
+    def __init__(self, name: str, limit: int, queue_limit: int, per_key: int,
+                 queue_timeout: float = UPLOAD_QUEUE_TIMEOUT,
+                 expected_seconds: float = UPLOAD_EXPECTED_SECONDS):
+        self.name = name
+        self.limit = limit
+        self.queue_limit = queue_limit
+        self.per_key = per_key
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._per_key: Counter = Counter()
+        self._hold_seconds = expected_seconds        # EWMA of observed hold times
+
+    def retry_after(self) -> int:
+        ahead = self.active + len(self._waiters)
+        seconds = (ahead / max(self.limit, 1)) * self._hold_seconds
+        return int(min(max(seconds, 1), 600))
+
+    def _reject(self, reason: str):
+        ADMISSION_OUTCOMES.labels(self.name, reason).inc()
+        raise AdmissionRejected(reason, self.retry_after())
+
+    @asynccontextmanager
+    async def admit(self, key: Hashable):
+        if self._per_key[key] >= self.per_key:
+            self._reject("per_user_limit")
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            outcome = "admitted"
+        else:
+            if len(self._waiters) >= self.queue_limit:
+                self._reject("queue_full")
+            await self._wait(key)
+            outcome = "queued"
+        ADMISSION_OUTCOMES.labels(self.name, outcome).inc()
+        ADMISSION_IN_PROGRESS.labels(self.name).set(self.active)
+
+        self._per_key[key] += 1
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._hold_seconds = 0.8 * self._hold_seconds + 0.2 * (time.perf_counter() - start)
+            self._forget(key)
+            self._release()
+
+    async def _wait(self, key: Hashable):
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        # a queued request counts against its user too
+        self._per_key[key] += 1
+        ADMISSION_QUEUE_DEPTH.labels(self.name).set(len(self._waiters))
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.shield(future), self.queue_timeout)
+        except BaseException as e:
+            if future.done() and not future.cancelled():
+                # granted just as we gave up: pass the slot on
+                self._release()
+            else:
+                future.cancel()
+                if future in self._waiters:
+                    self._waiters.remove(future)
+            if isinstance(e, asyncio.TimeoutError):
+                self._reject("queue_timeout")
+            raise
+        finally:
+            self._forget(key)
+            ADMISSION_QUEUE_DEPTH.labels(self.name).set(len(self._waiters))
+            ADMISSION_WAIT_SECONDS.labels(self.name).observe(time.perf_counter() - start)
+
+    def _forget(self, key: Hashable):
+        # drop zeroed counters, or every user who ever queued stays in the dict
+        self._per_key[key] -= 1
+        if not self._per_key[key]:
+            del self._per_key[key]
+
+    def _release(self):
+        # hand the slot straight to the next waiter, so nobody can cut in
+        while self._waiters:
+            future = self._waiters.popleft()
+            if not future.done():
+                future.set_result(None)
+                break
+        else:
+            self.active -= 1
+        ADMISSION_IN_PROGRESS.labels(self.name).set(self.active)
+        ADMISSION_QUEUE_DEPTH.labels(self.name).set(len(self._waiters))
+
+
+upload_admission = AdmissionController("upload", UPLOAD_CONCURRENCY, UPLOAD_QUEUE_LIMIT, UPLOAD_PER_USER)
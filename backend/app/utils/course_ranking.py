@@ -0,0 +1,175 @@
+# backend/app/utils/course_ranking.py
+
+import os
+import re
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+# courses kept per (skill, level) after ranking
+COURSES_PER_LEVEL = int(os.getenv("COURSES_PER_LEVEL", "3"))
+
+# score = relevance + rating + level fit; relevance dominates
+RELEVANCE_WEIGHT = 1.0
+RATING_WEIGHT = 0.15
+LEVEL_WEIGHT = 0.1
+# how much the CV's own skills and domain pull on relevance, next to the
+# missing skill itself (1.0)
+CONTEXT_WEIGHT = 0.25
+# below this a course is off-topic and is only kept when its slot has
+# nothing better
+MIN_RELEVANCE = 0.05
+TITLE_BOOST = 2
+
+_TOKEN = re.compile(r"[a-z0-9+#]+")
+_STOPWORDS = frozenset(
+    "a an and as at by for from in into of on or the to with your you learn course "
+    "courses specialization certificate professional using introduction".split()
+)
+_LEVEL_HINTS = {
+    "beginner":     re.compile(r"\b(beginners?|intro|introduction|introductory|fundamentals|basics|foundations?|getting started|101)\b", re.IGNORECASE),
+    "intermediate": re.compile(r"\b(intermediate|applied|practical|hands-on)\b", re.IGNORECASE),
+    "advanced":     re.compile(r"\b(advanced|mastering|mastery|expert|deep dive)\b", re.IGNORECASE),
+}
+
+
+def tokenize(text: str) -> List[str]:
+    tokens = []
+    for t in _TOKEN.findall((text or "").lower()):
+        if t in _STOPWORDS:
+            continue
+        # crude plural folding: "apis" ~ "api", "containers" ~ "container"
+        if len(t) > 3 and t.endswith("s") and not t.endswith("ss"):
+            t = t[:-1]
+        tokens.append(t)
+    return tokens
+
+
+class _Vocabulary:
+    def __init__(self):
+        self.index: Dict[str, int] = {}
+
+    def ids(self, tokens: Sequence[str], grow: bool) -> List[int]:
+        out = []
+        for t in tokens:
+            i = self.index.get(t)
+            if i is None and grow:
+                i = self.index[t] = len(self.index)
+            if i is not None:
+                out.append(i)
+        return out
+
+
+def _term_matrix(rows: List[List[int]], n_cols: int, weights: Optional[List[List[float]]] = None) -> "sparse.csr_matrix":
+    """CSR of (summed) term weights, one row per token-id list."""
+    from scipy import sparse
+    indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+    indptr[1:] = np.cumsum([len(r) for r in rows])
+    indices = np.fromiter((i for r in rows for i in r), dtype=np.int64, count=indptr[-1])
+    if weights is None:
+        data = np.ones(indptr[-1], dtype=np.float32)
+    else:
+        data = np.fromiter((w for ws in weights for w in ws), dtype=np.float32, count=indptr[-1])
+    m = sparse.csr_matrix((data, indices, indptr), shape=(len(rows), n_cols))
+    m.sum_duplicates()
+    return m
+
+
+def _l2_normalize(m: "sparse.csr_matrix") -> "sparse.csr_matrix":
+    from scipy import sparse
+    norms = np.sqrt(np.asarray(m.multiply(m).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    return sparse.diags(1.0 / norms) @ m
+
+
+def _level_fit(courses: List[dict]) -> np.ndarray:
+    """+1 when the title/description hints at the requested level, -1 when at another."""
+    fit = np.zeros(len(courses), dtype=np.float32)
+    for i, c in enumerate(courses):
+        text = f"{c.get('title', '')} {c.get('description', '')}"
+        hinted = [lvl for lvl, pattern in _LEVEL_HINTS.items() if pattern.search(text)]
+        if not hinted:
+            continue
+        fit[i] = 1.0 if c.get("level") in hinted else -1.0
+    return fit
+
+
+def rank_courses(
+    candidates: List[dict],
+    cv_skills: Sequence[str] = (),
+    domain: Optional[str] = None,
+    per_level: int = COURSES_PER_LEVEL,
+) -> List[dict]:
+    """
+    Rank scraped course candidates for one CV and keep the best `per_level`
+    for each (skill, level).
+
+    Candidates are dicts with at least "skill", "level", "title" and "url".
+    All of them go into one TF-IDF matrix (titles counted TITLE_BOOST
+    times); every missing skill becomes one query vector, padded with the
+    CV's skills and domain at CONTEXT_WEIGHT, so relevance for every skill
+    of the CV is a single sparse matrix product. A course whose text never
+    mentions its skill is dropped when its slot has on-topic alternatives.
+    A URL is only recommended once per CV, under its best-scoring slot.
+
+    The TF-IDF is fitted on this CV's candidates alone, not on
+    course_catalog: a CV brings a few dozen scraped cards, so fitting them
+    is cheaper than keeping a catalog-wide matrix current, and IDF over the
+    candidates is what separates courses within one search.
+    """
+    if not candidates:
+        return []
+    # scipy takes a while to import and is only needed here, not at startup
+    from scipy import sparse
+
+    vocab = _Vocabulary()
+    doc_rows = [
+        vocab.ids(tokenize(c.get("title", "")) * TITLE_BOOST + tokenize(c.get("description", "")), grow=True)
+        for c in candidates
+    ]
+    n_terms = len(vocab.index)
+    tf = _term_matrix(doc_rows, n_terms)
+    tf.data = 1.0 + np.log(tf.data)                                    # sublinear tf
+    df = np.bincount(tf.indices, minlength=n_terms)
+    idf = np.log((1 + len(candidates)) / (1 + df)) + 1.0
+    docs = _l2_normalize(tf @ sparse.diags(idf.astype(np.float32)))
+
+    skills = list(dict.fromkeys(c["skill"] for c in candidates))
+    context = vocab.ids([t for s in cv_skills for t in tokenize(s)] + tokenize(domain or ""), grow=False)
+    query_rows, query_weights = [], []
+    for skill in skills:
+        own = vocab.ids(tokenize(skill), grow=False)
+        query_rows.append(own + context)
+        query_weights.append([1.0] * len(own) + [CONTEXT_WEIGHT] * len(context))
+    queries = _l2_normalize(_term_matrix(query_rows, n_terms, query_weights) @ sparse.diags(idf.astype(np.float32)))
+
+    # (n_courses, n_skills) in one product; each course is scored by its own skill's column
+    relevance = np.asarray((docs @ queries.T).todense())
+    column = np.array([skills.index(c["skill"]) for c in candidates])
+    relevance = relevance[np.arange(len(candidates)), column]
+
+    rating = np.array([float(c.get("rating") or 0.0) for c in candidates], dtype=np.float32) / 5.0
+    score = (RELEVANCE_WEIGHT * relevance
+             + RATING_WEIGHT * np.clip(rating, 0.0, 1.0)
+             + LEVEL_WEIGHT * _level_fit(candidates))
+
+    on_topic = relevance >= MIN_RELEVANCE
+    slots_on_topic = {(c["skill"], c["level"]) for c, ok in zip(candidates, on_topic) if ok}
+
+    kept, seen_urls, per_slot = [], set(), {}
+    for i in np.argsort(-score, kind="stable"):
+        c = candidates[i]
+        slot = (c["skill"], c["level"])
+        if c["url"] in seen_urls or per_slot.get(slot, 0) >= per_level:
+            continue
+        if not on_topic[i] and slot in slots_on_topic:
+            continue
+        seen_urls.add(c["url"])
+        per_slot[slot] = per_slot.get(slot, 0) + 1
+        kept.append({**c, "score": round(float(score[i]), 4)})
+
+    # back to a stable skill → level → score order for storage and display
+    skill_order = {s: n for n, s in enumerate(skills)}
+    level_order = {l: n for n, l in enumerate(dict.fromkeys(c["level"] for c in candidates))}
+    kept.sort(key=lambda c: (skill_order[c["skill"]], level_order[c["level"]], -c["score"]))
+    return kept
@@ -6,13 +6,180 @@ import time
 from typing import List, Dict, Any
 from urllib.parse import quote
 import logging
-from bs4 import BeautifulSoup
 import re
+from lxml import etree, html as lxml_html
+from .metrics import COURSERA_SECONDS, COURSERA_REQUESTS
+from .singleflight import SingleFlight
+from .llm_scheduler import check_cancelled
+
+# cards kept per search; the ranking stage picks the best few of them
+SEARCH_CANDIDATES = 10
+
+# concurrent uploads missing the same skill share one scrape
+_search_flight = SingleFlight("coursera")
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+COURSERA_BASE = "https://www.coursera.org"
+
+_NUMBER = re.compile(r"(\d+\.?\d*)")
+
+# compiled once; EXSLT regexes keep the old class-name matching
+_XPATH_NS = {"re": "http://exslt.org/regular-expressions"}
+_CARDS = etree.XPath('//div[@data-testid="search-result-card"]')
+_CLASS_CARDS = etree.XPath('//div[re:test(@class, "result.*card")]', namespaces=_XPATH_NS)
+_LEARN_LINKS = etree.XPath('//a[contains(@href, "/learn/")]')
+_CARD_H3 = etree.XPath('.//h3')
+_CARD_H2 = etree.XPath('.//h2')
+_CARD_A = etree.XPath('.//a')
+_CARD_LEARN_LINK = etree.XPath('.//a[contains(@href, "/learn/")]')
+_CARD_P = etree.XPath('.//p')
+_CARD_DESCRIPTION = etree.XPath('.//div[re:test(@class, "description")]', namespaces=_XPATH_NS)
+_CARD_RATING = etree.XPath('.//span[re:test(@class, "rating")]', namespaces=_XPATH_NS)
+
+# keys course objects use in the embedded state
+_TITLE_KEYS = ("name", "title")
+_URL_KEYS = ("url", "link", "objectUrl", "productUrl")
+_DESCRIPTION_KEYS = ("description", "tagline")
+_RATING_KEYS = ("avgProductRating", "productRating", "rating")
+_DURATION_KEYS = ("productDuration", "duration")
+
+
+def _absolute(href: str) -> str:
+    return f"{COURSERA_BASE}{href}" if href.startswith("/") else href
+
+
+def _text(el) -> str:
+    return " ".join(el.text_content().split()) if el is not None else ""
+
+
+def _first(*candidates):
+    for found in candidates:
+        if found:
+            return found[0]
+    return None
+
+
+def _course(skill, level, title, url, description="", rating=0.0, duration=""):
+    return {
+        "title": title,
+        "url": url,
+        "description": description,
+        "level": level or "Unknown",
+        "rating": rating,
+        "duration": duration,
+        "skills": [skill],
+    }
+
+
+def _embedded_state(raw: bytes):
+    """
+    The JSON text of the page's hydration state, located with plain byte
+    searches (no regex, no DOM): __NEXT_DATA__ or window.__APOLLO_STATE__.
+    """
+    i = raw.find(b'id="__NEXT_DATA__"')
+    if i != -1:
+        start = raw.find(b">", i) + 1
+        end = raw.find(b"</script>", start)
+        return raw[start:end] if start and end != -1 else None
+    i = raw.find(b"window.__APOLLO_STATE__")
+    if i != -1:
+        start = raw.find(b"=", i) + 1
+        end = raw.find(b"</script>", start)
+        return raw[start:end].strip().rstrip(b";") if start and end != -1 else None
+    return None
+
+
+def _courses_from_state(raw: bytes, skill: str, level: str, limit: int) -> List[Dict[str, Any]]:
+    """
+    Course objects from the JSON state the page ships for hydration
+    (__NEXT_DATA__ or __APOLLO_STATE__): any object with a title and a
+    /learn/ URL, in document order.
+    """
+    text = _embedded_state(raw)
+    if not text:
+        return []
+    try:
+        state = json.loads(text)
+    except ValueError:
+        return []
+
+    courses, seen = [], set()
+    stack = [state]
+    while stack and len(courses) < limit:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(reversed(node))
+            continue
+        if not isinstance(node, dict):
+            continue
+        title = next((node[k] for k in _TITLE_KEYS if isinstance(node.get(k), str)), None)
+        url = next((node[k] for k in _URL_KEYS if isinstance(node.get(k), str) and "/learn/" in node[k]), None)
+        if title and url:
+            url = _absolute(url)
+            if url not in seen:
+                seen.add(url)
+                rating = next((node[k] for k in _RATING_KEYS if isinstance(node.get(k), (int, float))), 0.0)
+                courses.append(_course(
+                    skill, level, title.strip(), url,
+                    next((node[k] for k in _DESCRIPTION_KEYS if isinstance(node.get(k), str)), ""),
+                    float(rating),
+                    next((node[k] for k in _DURATION_KEYS if isinstance(node.get(k), str)), ""),
+                ))
+            continue
+        stack.extend(reversed(list(node.values())))
+    return courses
+
+
+def _courses_from_dom(raw: bytes, skill: str, level: str, limit: int) -> List[Dict[str, Any]]:
+    """Result cards (or, failing that, bare /learn/ links) via lxml and compiled XPath."""
+    try:
+        root = lxml_html.fromstring(raw)
+    except (etree.ParserError, ValueError):
+        return []
+
+    courses: List[Dict[str, Any]] = []
+    cards = _CARDS(root) or _CLASS_CARDS(root)
+    if not cards:
+        for link in _LEARN_LINKS(root)[:limit]:
+            title = _text(link)
+            if title:
+                courses.append(_course(skill, level, title, _absolute(link.get("href", ""))))
+        return courses
+
+    for card in cards[:limit]:
+        try:
+            title = _text(_first(_CARD_H3(card), _CARD_H2(card), _CARD_A(card)))
+            link = _first(_CARD_LEARN_LINK(card))
+            url = _absolute(link.get("href", "")) if link is not None else ""
+            description = _text(_first(_CARD_P(card), _CARD_DESCRIPTION(card)))
+            rating = 0.0
+            rating_elem = _first(_CARD_RATING(card))
+            if rating_elem is not None:
+                m = _NUMBER.search(_text(rating_elem))
+                if m:
+                    rating = float(m.group(1))
+            if title and url:
+                courses.append(_course(skill, level, title, url, description, rating))
+        except Exception as e:
+            logger.warning(f"Error parsing course card: {e}")
+    return courses
+
+
+def parse_search_results(raw, skill: str, level: str = None, limit: int = SEARCH_CANDIDATES) -> List[Dict[str, Any]]:
+    """
+    Courses from a Coursera search page: the embedded JSON state when the
+    page has one, otherwise the result cards.
+    """
+    if isinstance(raw, str):
+        raw = raw.encode("utf-8")
+    courses = _courses_from_state(raw, skill, level, limit)
+    if not courses:
+        courses = _courses_from_dom(raw, skill, level, limit)
+    return courses[:limit]
+
 class CourseraSearcher:
     def __init__(self):
         """
@@ -33,10 +200,19 @@ class CourseraSearcher:
             'Upgrade-Insecure-Requests': '1',
         })
 
-    def search_courses_web(self, skill: str, level: str = None) -> List[Dict[str, Any]]:
+    def search_courses_web(self, skill: str, level: str = None, limit: int = SEARCH_CANDIDATES) -> List[Dict[str, Any]]:
         """
         Search courses using web scraping from Coursera search results.
+        Returns up to `limit` cards in page order; relevance ranking happens
+        later, over all the CV's candidates at once (see course_ranking).
+        Identical searches in flight at the same time are made only once.
         """
+        key = (skill.strip().lower(), (level or "").lower(), limit)
+        return _search_flight.do(key, self._search_courses_web, skill, level, limit)
+
+    def _search_courses_web(self, skill: str, level: str = None, limit: int = SEARCH_CANDIDATES) -> List[Dict[str, Any]]:
+        # an abandoned enrichment stage stops here rather than scraping on
+        check_cancelled()
         # Construct search URL
         search_url = (
             f"https://www.coursera.org/search?query={quote(skill)}"
@@ -55,93 +231,18 @@ class CourseraSearcher:
         
         try:
             logger.info(f"Searching: {search_url}")
-            response = self.session.get(search_url, timeout=10)
+            start = time.perf_counter()
+            try:
+                response = self.session.get(search_url, timeout=10)
+            except requests.exceptions.RequestException:
+                COURSERA_REQUESTS.labels("error").inc()
+                raise
+            finally:
+                COURSERA_SECONDS.observe(time.perf_counter() - start)
+            COURSERA_REQUESTS.labels(str(response.status_code)).inc()
             response.raise_for_status()
             
-            # Parse HTML
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Extract course data from search results
-            courses: List[Dict[str, Any]] = []
-            
-            # Look for course cards in the search results
-            course_cards = soup.find_all('div', {'data-testid': 'search-result-card'})
-            
-            if not course_cards:
-                # Try alternative selectors
-                course_cards = soup.find_all(
-                    'div', class_=re.compile(r'.*result.*card.*')
-                )
-            
-            if not course_cards:
-                # Fallback: find direct links to /learn/
-                course_links = soup.find_all('a', href=re.compile(r'/learn/'))
-                for link in course_links[:10]:
-                    href = link.get('href', '')
-                    if '/learn/' in href:
-                        course_url = (
-                            f"https://www.coursera.org{href}"
-                            if href.startswith('/') else href
-                        )
-                        title = link.get_text(strip=True)
-                        if title:
-                            courses.append({
-                                'title': title,
-                                'url': course_url,
-                                'description': '',
-                                'level': level or 'Unknown',
-                                'rating': 0,
-                                'duration': '',
-                                'skills': [skill]
-                            })
-            else:
-                # Parse the top 10 cards
-                for card in course_cards[:10]:
-                    try:
-                        # Title
-                        title_elem = card.find('h3') or card.find('h2') or card.find('a')
-                        title = title_elem.get_text(strip=True) if title_elem else ''
-                        
-                        # URL
-                        link_elem = card.find('a', href=re.compile(r'/learn/'))
-                        url = ''
-                        if link_elem:
-                            href = link_elem.get('href', '')
-                            url = (
-                                f"https://www.coursera.org{href}"
-                                if href.startswith('/') else href
-                            )
-                        
-                        # Description
-                        desc_elem = card.find('p') or card.find(
-                            'div', class_=re.compile(r'.*description.*')
-                        )
-                        description = desc_elem.get_text(strip=True) if desc_elem else ''
-                        
-                        # Rating
-                        rating = 0.0
-                        rating_elem = card.find('span', class_=re.compile(r'.*rating.*'))
-                        if rating_elem:
-                            rt = rating_elem.get_text(strip=True)
-                            m = re.search(r'(\d+\.?\d*)', rt)
-                            if m:
-                                rating = float(m.group(1))
-                        
-                        if title and url:
-                            courses.append({
-                                'title': title,
-                                'url': url,
-                                'description': description,
-                                'level': level or 'Unknown',
-                                'rating': rating,
-                                'duration': '',
-                                'skills': [skill]
-                            })
-                    except Exception as e:
-                        logger.warning(f"Error parsing course card: {e}")
-                        continue
-            
-            return courses[:3]  # top 3
+            return parse_search_results(response.content, skill, level, limit)
         except requests.exceptions.RequestException as e:
             logger.error(f"Request failed for {skill} ({level}): {e}")
             return []
@@ -0,0 +1,139 @@
+# backend/app/utils/cv_extract.py
+
+import re
+from typing import Dict, List, Optional
+
+_EMAIL = re.compile(r"\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b")
+_PHONE = re.compile(r"(?<![\w/])\+?\(?\d[\d\s().-]{7,}\d(?![\w/])")
+_LINKEDIN = re.compile(r"(?:https?://)?(?:[a-z]{2,3}\.)?linkedin\.com/in/[A-Za-z0-9_%-]+/?", re.IGNORECASE)
+_GITHUB = re.compile(r"(?:https?://)?(?:www\.)?github\.com/[A-Za-z0-9-]+/?(?![\w/-])", re.IGNORECASE)
+_NAME_WORD = re.compile(r"^[A-ZÀ-Ý][A-Za-zÀ-ÿ'’-]*\.?$")
+_YEAR_RANGE = re.compile(r"^(19|20)\d{2}\s*[-–]\s*(19|20)\d{2}$")
+_CONTACT_LABEL = re.compile(r"\b(e-?mail|phone|tel|mobile|cell|linkedin|github)\b", re.IGNORECASE)
+_PHONE_LABEL = re.compile(r"\b(phone|tel|telephone|mobile|cell|whatsapp)\b", re.IGNORECASE)
+# numbers on these lines are identifiers, not phone numbers
+_ID_LABEL = re.compile(
+    r"\b(id|student|matric\w*|registration|reg|passport|licen[cs]e|ssn|no|number|roll)\b", re.IGNORECASE
+)
+# a first line like "Curriculum Vitae": the name, if any, is on the next one
+_DOCUMENT_TITLE = re.compile(r"^(curriculum vitae|resume|résumé|cv)$", re.IGNORECASE)
+# words that make a capitalised line a heading or a job title, not a name
+_NOT_NAME_WORDS = {
+    "curriculum", "vitae", "resume", "résumé", "cv", "profile", "contact", "summary",
+    "experience", "education", "skills", "projects", "objective", "personal", "details",
+    "engineer", "engineering", "developer", "development", "manager", "software", "senior",
+    "junior", "intern", "internship", "student", "graduate", "designer", "analyst", "scientist",
+    "consultant", "architect", "lead", "specialist", "administrator", "officer", "director",
+    "technician", "programmer", "full", "stack", "data", "web", "frontend", "backend",
+    "devops", "researcher", "teacher", "assistant", "associate", "head", "chief",
+}
+
+
+def _url(match: Optional[str]) -> Optional[str]:
+    if not match:
+        return None
+    match = match.rstrip("/")
+    return match if match.lower().startswith("http") else f"https://{match}"
+
+
+def find_email(text: str) -> Optional[str]:
+    m = _EMAIL.search(text)
+    return m.group(0) if m else None
+
+
+def _phone_in(line: str) -> Optional[str]:
+    for m in _PHONE.finditer(line):
+        candidate = m.group(0).strip()
+        digits = re.sub(r"\D", "", candidate)
+        if 9 <= len(digits) <= 15 and not _YEAR_RANGE.match(candidate):
+            return candidate
+    return None
+
+
+def find_phone(header: str, text: str = "") -> Optional[str]:
+    """
+    A phone number from the header (contact block), or from a line of the
+    whole text that labels it as one ("Phone:", "Mobile", ...). Numbers on
+    lines labelled as an ID or student number are never taken.
+    """
+    for line in header.splitlines():
+        if not _ID_LABEL.search(line) or _PHONE_LABEL.search(line):
+            phone = _phone_in(line)
+            if phone:
+                return phone
+    for line in text.splitlines():
+        if _PHONE_LABEL.search(line):
+            phone = _phone_in(line)
+            if phone:
+                return phone
+    return None
+
+
+def find_profile(pattern: re.Pattern, text: str, links: List[str]) -> Optional[str]:
+    for link in links:
+        m = pattern.search(link)
+        if m:
+            return _url(m.group(0))
+    m = pattern.search(text)
+    return _url(m.group(0)) if m else None
+
+
+def _looks_like_name(line: str) -> bool:
+    words = line.split()
+    return (
+        2 <= len(words) <= 4 and len(line) <= 40
+        and all(_NAME_WORD.match(w) for w in words)
+        and not any(w.lower().strip(".") in _NOT_NAME_WORDS for w in words)
+    )
+
+
+def find_name(header: str) -> Optional[str]:
+    """
+    The first line of the header section (or the one after a "Curriculum
+    Vitae" title), when it looks unambiguously like a person's name: 2-4
+    capitalised words, no digits or punctuation, and none of them a
+    heading or job-title word.
+    """
+    lines = [l.strip() for l in header.splitlines() if l.strip()]
+    if lines and _DOCUMENT_TITLE.match(lines[0]):
+        lines = lines[1:]
+    if lines and _looks_like_name(lines[0]):
+        return lines[0]
+    return None
+
+
+def pre_extract(text: str, header: str, links: List[str]) -> Dict[str, str]:
+    """
+    Deterministically extract the contact fields that can be found with
+    high confidence. Only fields that were found are returned, and those
+    take precedence over the LLM's, so anything ambiguous is left out for
+    the LLM to fill in.
+    """
+    found = {
+        "name":     find_name(header),
+        "email":    find_email(text),
+        "phone":    find_phone(header, text),
+        "linkedin": find_profile(_LINKEDIN, text, links),
+        "github":   find_profile(_GITHUB, text, links),
+    }
+    return {k: v for k, v in found.items() if v}
+
+
+def strip_contact_lines(text: str, found: Dict[str, str]) -> str:
+    """
+    Drop lines that hold nothing but already-extracted contact details
+    (emails, phones, profile URLs and separators).
+    """
+    values = list(found.values())
+    keep = []
+    for line in text.splitlines():
+        rest = line
+        for pattern in (_EMAIL, _LINKEDIN, _GITHUB):
+            rest = pattern.sub("", rest)
+        for v in values:
+            rest = rest.replace(v, "")
+        rest = _CONTACT_LABEL.sub("", rest)
+        if line.strip() and not re.sub(r"[\s|•·,;:/–-]+", "", rest):
+            continue
+        keep.append(line)
+    return "\n".join(keep)
@@ -1,11 +1,72 @@
 import os
-import fitz    # PyMuPDF
-import pdfplumber
+import re
+import json
+import time
+import logging
 import requests
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from .metrics import (
+    LLM_SECONDS, LLM_CALLS, LLM_PROMPT_CHARS, LLM_RESPONSE_CHARS, LLM_JSON_OUTCOMES,
+    PRE_EXTRACTED_FIELDS,
+)
+from .json_repair import StreamingJSONScanner, repair_json
+from .cv_text import estimate_tokens, split_sections, chunk_sections, PARSE_TOKEN_BUDGET
+from .cv_extract import pre_extract, strip_contact_lines
+from .skills import canonicalize_skills, normalize_key
+from .skill_gap import get_engine
+from .ollama import get_router, OLLAMA_TIMEOUT, OLLAMA_KEEP_ALIVE
+from .llm_scheduler import llm_slot, check_cancelled
+from .singleflight import SingleFlight, prompt_key
+
+logger = logging.getLogger(__name__)
 
 OUTPUT_IMG_DIR = "extracted_images"
+# extracted images are named after their PDF ("<stem>_page1_img2.png"), so
+# they can be traced back to it
+_IMAGE_NAME = re.compile(r"^(?P<stem>.+)_page\d+_img\d+\.\w+$")
 
-def extract_text(pdf_path):
+# top-level keys of the parse prompt's JSON object; any the model leaves
+# out get re-requested on their own
+CV_SECTIONS = [
+    "name", "email", "phone", "bio", "linkedin", "github", "domain",
+    "education", "experience", "skills", "projects",
+]
+
+# how each field is described to the model
+FIELD_SPECS = {
+    "name": "name",
+    "email": "email",
+    "phone": "phone",
+    "bio": "bio",
+    "linkedin": "linkedin",
+    "github": "github",
+    "domain": "domain: the candidate’s professional domain (e.g. \"Software Development\", \"Data Science\", \"Machine Learning\", only one domain)",
+    "education": "education: list of {\"degree\", \"university\", \"location\", \"gpa\", \"description\", \"start_date\", \"end_date\"}, treat 'present' as end_date",
+    "experience": "experience: list of {\"role\", \"company\", \"location\", \"date\", \"description\"}",
+    "skills": "skills: technical only (exclude languages & soft skills)",
+    "projects": "projects: list of {\"name\", \"tools\", \"description\", \"link\"}",
+}
+# only asked for when the skill-gap engine has no requirements for the domain
+MISSING_SKILLS_SPEC = "missing_skills: list of strings (skills commonly required in their domain that are NOT in their CV)"
+# which fields a chunk is asked for, by the sections it contains
+SECTION_FIELDS = {
+    "header":     ["name", "email", "phone", "bio", "linkedin", "github"],
+    "summary":    ["bio"],
+    "education":  ["education"],
+    "experience": ["experience"],
+    "skills":     ["skills"],
+    "projects":   ["projects"],
+    "other":      [],
+    "ignore":     [],
+}
+# parallel LLM calls when a long CV is parsed in chunks
+PARSE_MAX_PARALLEL = int(os.getenv("PARSE_MAX_PARALLEL", "4"))
+# project links beyond this many are noise for the prompt
+MAX_PROJECT_LINKS = 15
+
+def extract_pages(pdf_path):
+    import fitz    # PyMuPDF; imported on first use, it is slow to load
     doc = fitz.open(pdf_path)
     pages = []
     for page in doc:
@@ -14,9 +75,13 @@ def extract_text(pdf_path):
             pages.append(txt)
         else:
             pages.append(_two_col_extract(pdf_path, page.number))
-    return "\n\n".join(pages)
+    return pages
+
+def extract_text(pdf_path):
+    return "\n\n".join(extract_pages(pdf_path))
 
 def _two_col_extract(pdf_path, page_index):
+    import pdfplumber
     with pdfplumber.open(pdf_path) as pdf:
         page = pdf.pages[page_index]
         w, h = page.width, page.height
@@ -31,6 +96,7 @@ def _two_col_extract(pdf_path, page_index):
         return "\n".join(left_lines + [""] + right_lines)
 
 def extract_links(pdf_path):
+    import fitz
     doc = fitz.open(pdf_path)
     links = []
     for page in doc:
@@ -41,9 +107,11 @@ def extract_links(pdf_path):
     return links
 
 def extract_images(pdf_path, output_dir=OUTPUT_IMG_DIR):
+    import fitz
     os.makedirs(output_dir, exist_ok=True)
     doc = fitz.open(pdf_path)
     saved = []
+    stem = os.path.splitext(os.path.basename(pdf_path))[0]
     for pi in range(len(doc)):
         page = doc[pi]
         for idx, img in enumerate(page.get_images(full=True), start=1):
@@ -51,46 +119,361 @@ def extract_images(pdf_path, output_dir=OUTPUT_IMG_DIR):
             img_dict = doc.extract_image(xref)
             ext = img_dict["ext"]
             data = img_dict["image"]
-            fn = f"page{pi+1}_img{idx}.{ext}"
+            fn = f"{stem}_page{pi+1}_img{idx}.{ext}"
             path = os.path.join(output_dir, fn)
             with open(path, "wb") as f:
                 f.write(data)
             saved.append(path)
     return saved
 
-def build_parse_prompt(text, links):
+def image_source(filename):
+    """Stem of the PDF an extracted image file came from, or None."""
+    m = _IMAGE_NAME.match(filename)
+    return m.group("stem") if m else None
+
+def split_links(links):
+    """
+    Pick out the LinkedIn and GitHub profile links and return the remaining,
+    de-duplicated project links (mailto:/tel: dropped, capped).
+    """
     linkedin = next((u for u in links if "linkedin.com" in u.lower()), None)
     github   = next((u for u in links if "github.com" in u.lower()), None)
-    project_links = [u for u in links if u not in [linkedin, github]]
+    project_links = []
+    for u in links:
+        if u in (linkedin, github) or u in project_links:
+            continue
+        if u.lower().startswith(("mailto:", "tel:")):
+            continue
+        project_links.append(u)
+    return linkedin, github, project_links[:MAX_PROJECT_LINKS]
+
+def _parse_prompt(text, fields, linkedin, github, project_links):
+    link_lines = []
+    if "linkedin" in fields:
+        link_lines.append(f"LinkedIn: {linkedin or 'null'}")
+    if "github" in fields:
+        link_lines.append(f"GitHub: {github or 'null'}")
+    if "projects" in fields:
+        link_lines.append(f"Project Links: {project_links}")
+    field_lines = "\n".join(f"- {FIELD_SPECS[f]}" for f in fields)
     return f"""You are a professional resume parser. Here is the resume text and extracted links:
 
-LinkedIn: {linkedin or 'null'}
-GitHub: {github or 'null'}
-Project Links: {project_links}
+{chr(10).join(link_lines)}
 
 Resume Text (read the whole text before answering):
 {text}
 
 Extract to JSON with fields:
-- name, email, phone
-- bio
-- linkedin, github
-- domain: the candidate’s professional domain (e.g. "Software Development", "Data Science", "Machine Learning", only one domain)
-- education: list of {{"degree", "university", "location", "gpa", "description", "start_date", "end_date"}}, treat 'present' as end_date
-- experience: list of {{"role", "company", "location", "date", "description"}}
-- skills: technical only (exclude languages & soft skills)
-- missing_skills: list of strings (skills commonly required in their domain that are NOT in their CV)  
-- projects: list of {{"name", "tools", "description", "link"}}
+{field_lines}
 
 If not found, use null.
 IMPORTANT: Return exactly one JSON object — 
-start with '{' and end with '}',
+start with '{{' and end with '}}',
 with no extra text, explanations, or trailing commas.
 """
 
-def call_mistral(prompt: str):
-    resp = requests.post(
-        "http://localhost:11434/api/generate",
-        json={"model": "mistral", "prompt": prompt, "stream": False}
-    )
-    return resp.json().get("response", "")
+def build_parse_prompt(text, links, fields=None):
+    linkedin, github, project_links = split_links(links)
+    return _parse_prompt(text, fields or list(FIELD_SPECS), linkedin, github, project_links)
+
+def _parse_chunk(chunk, fields, links):
+    text = "\n\n".join(body for _, body in chunk)
+    return call_mistral_json(build_parse_prompt(text, links, fields), required=fields)
+
+def _merge_parts(parts):
+    merged = {}
+    for part in parts:
+        if not isinstance(part, dict):
+            continue
+        for key, value in part.items():
+            if isinstance(value, list):
+                bucket = merged.setdefault(key, [])
+                seen = {json.dumps(v, sort_keys=True).lower() for v in bucket}
+                for v in value:
+                    marker = json.dumps(v, sort_keys=True).lower()
+                    if marker not in seen:
+                        seen.add(marker)
+                        bucket.append(v)
+            elif value not in (None, "") and merged.get(key) in (None, ""):
+                merged[key] = value
+    return merged
+
+def parse_cv(text, links):
+    """
+    Parse compacted CV text into the parse-prompt JSON shape.
+
+    Contact fields found deterministically (see cv_extract) are filled in
+    directly; the LLM only gets the remaining fields, and sections none of
+    them live in are left out of the prompt.
+
+    Text within PARSE_TOKEN_BUDGET goes out in a single call. Longer CVs
+    are split on section headings into chunks that are parsed in parallel,
+    each asked only for the fields its sections can contain, then merged;
+    a last small call derives the domain from the merged result, since
+    that needs the whole picture.
+
+    Missing skills are computed by normalize_parsed with the local
+    skill-gap engine; only a CV in a domain the engine doesn't cover
+    (Accounting, Nursing, ...) costs one more small call for them.
+    """
+    sections = split_sections(text)
+    header = next((body for name, body in sections if name == "header"), "")
+    known = pre_extract(text, header, links)
+    for field in known:
+        PRE_EXTRACTED_FIELDS.labels(field).inc()
+
+    no_headings = len(sections) == 1
+    sections = [
+        (name, strip_contact_lines(body, known) if name == "header" else body)
+        for name, body in sections
+        if name != "ignore"
+    ]
+    sections = [(name, body) for name, body in sections if body.strip()]
+    text = "\n\n".join(body for _, body in sections)
+    todo = [f for f in FIELD_SPECS if f not in known]
+
+    tokens = estimate_tokens(text)
+    if tokens <= PARSE_TOKEN_BUDGET:
+        parsed = call_mistral_json(build_parse_prompt(text, links, todo), required=todo)
+        if isinstance(parsed, dict):
+            parsed.update(known)
+            _ask_missing_skills(parsed)
+        return parsed
+
+    chunks = chunk_sections(sections)
+    jobs = []
+    for chunk in chunks:
+        if no_headings:
+            fields = [f for f in todo if f != "domain"]
+        else:
+            fields = []
+            for name, _ in chunk:
+                fields += [f for f in SECTION_FIELDS[name] if f in todo and f not in fields]
+        if fields:
+            jobs.append((chunk, fields))
+    logger.info("CV text ~%d tokens over budget %d: parsing %d chunks",
+                tokens, PARSE_TOKEN_BUDGET, len(jobs))
+
+    with ThreadPoolExecutor(max_workers=max(1, min(len(jobs), PARSE_MAX_PARALLEL))) as pool:
+        futures = [pool.submit(copy_context().run, _parse_chunk, chunk, fields, links)
+                   for chunk, fields in jobs]
+        parts = []
+        for fut in futures:
+            try:
+                parts.append(fut.result())
+            except ValueError:
+                logger.warning("A CV chunk could not be parsed; continuing with the rest")
+    merged = _merge_parts(parts)
+    if not merged and not known:
+        raise ValueError("no CV chunk could be parsed")
+    merged.update(known)
+
+    reduce_prompt = f"""You are a career coach. From this candidate summary:
+Bio: {merged.get('bio') or 'null'}
+Skills: {', '.join(s if isinstance(s, str) else str(s) for s in merged.get('skills') or [])}
+Roles: {', '.join(str(x.get('role')) for x in merged.get('experience') or [] if isinstance(x, dict))}
+
+Return a JSON object with fields:
+- {FIELD_SPECS['domain']}
+"""
+    try:
+        reduced = call_mistral_json(reduce_prompt, required=["domain"])
+        if isinstance(reduced, dict):
+            merged["domain"] = reduced.get("domain")
+    except ValueError:
+        logger.warning("Could not derive the domain of a chunked CV")
+    for key in CV_SECTIONS:
+        if merged.get(key) is None:
+            merged[key] = [] if key in ("education", "experience", "skills", "projects") else None
+    _ask_missing_skills(merged)
+    return merged
+
+def _skill_names(skills):
+    return [sk["name"] if isinstance(sk, dict) and "name" in sk else sk for sk in skills or []]
+
+def _ask_missing_skills(parsed: dict):
+    """
+    Ask the LLM for the gaps of a CV whose domain the skill-gap engine has
+    no requirements for; for any other CV the engine's gaps are used.
+    """
+    if parsed.get("missing_skills"):
+        return
+    skills = canonicalize_skills(_skill_names(parsed.get("skills")))
+    resolved, _ = get_engine().missing_for(parsed.get("domain"), skills)
+    if resolved is not None:
+        return
+    prompt = f"""You are a career coach. For a candidate in this domain:
+Domain: {parsed.get('domain') or 'unknown'}
+Skills: {', '.join(skills)}
+
+Return a JSON object with fields:
+- {MISSING_SKILLS_SPEC}
+"""
+    try:
+        reply = call_mistral_json(prompt, required=["missing_skills"])
+    except ValueError:
+        logger.warning("Could not get missing skills for a CV in domain %r", parsed.get("domain"))
+        return
+    if isinstance(reply, dict) and isinstance(reply.get("missing_skills"), list):
+        parsed["missing_skills"] = reply["missing_skills"]
+
+# identical prompts in flight at the same time (a class uploading together)
+# share one generation
+_mistral_flight = SingleFlight("mistral")
+
+def call_mistral(prompt: str, format: str = None):
+    return _mistral_flight.do(prompt_key("generate", format, prompt), _call_mistral, prompt, format)
+
+def _call_mistral(prompt: str, format: str = None):
+    LLM_PROMPT_CHARS.labels("mistral").observe(len(prompt))
+    body = {"model": "mistral", "prompt": prompt, "stream": False, "keep_alive": OLLAMA_KEEP_ALIVE}
+    if format:
+        body["format"] = format
+    start = time.perf_counter()
+    try:
+        with llm_slot("mistral"):
+            out = get_router().post("mistral", "/api/generate", body).get("response", "")
+    except Exception:
+        LLM_CALLS.labels("mistral", "error").inc()
+        raise
+    finally:
+        LLM_SECONDS.labels("mistral").observe(time.perf_counter() - start)
+    LLM_CALLS.labels("mistral", "ok").inc()
+    LLM_RESPONSE_CHARS.labels("mistral").observe(len(out))
+    return out
+
+def stream_mistral_json(prompt: str) -> str:
+    """
+    Ask Ollama for JSON-format output and read the streamed reply until the
+    top-level value is closed, then hang up instead of waiting for the model
+    to finish on its own. Returns the (possibly truncated) JSON text.
+    """
+    return _mistral_flight.do(prompt_key("stream-json", prompt), _stream_mistral_json, prompt)
+
+def _stream_mistral_json(prompt: str) -> str:
+    LLM_PROMPT_CHARS.labels("mistral").observe(len(prompt))
+    scanner = StreamingJSONScanner()
+    start = time.perf_counter()
+    try:
+        with llm_slot("mistral"), get_router().dispatch("mistral") as instance, requests.post(
+            f"{instance.url}/api/generate",
+            json={"model": "mistral", "prompt": prompt, "stream": True, "format": "json",
+                  "keep_alive": OLLAMA_KEEP_ALIVE},
+            stream=True,
+            timeout=OLLAMA_TIMEOUT,
+        ) as resp:
+            resp.raise_for_status()
+            for line in resp.iter_lines():
+                if not line:
+                    continue
+                check_cancelled()
+                chunk = json.loads(line)
+                if scanner.feed(chunk.get("response", "")) or chunk.get("done"):
+                    break
+    except Exception:
+        LLM_CALLS.labels("mistral", "error").inc()
+        raise
+    finally:
+        LLM_SECONDS.labels("mistral").observe(time.perf_counter() - start)
+    LLM_CALLS.labels("mistral", "ok").inc()
+    LLM_RESPONSE_CHARS.labels("mistral").observe(len(scanner.text))
+    return scanner.text
+
+def call_mistral_json(prompt: str, required: list[str] = None):
+    """
+    Structured LLM call: JSON-mode, streamed, parsed tolerantly. If the
+    reply is an object missing some of the `required` keys (usually because
+    it was cut off), only those keys are asked for again and merged in.
+
+    Raises ValueError when no JSON can be recovered at all.
+    """
+    raw = stream_mistral_json(prompt)
+    try:
+        data = json.loads(raw)
+        outcome = "clean"
+    except json.JSONDecodeError:
+        try:
+            data = repair_json(raw)
+        except ValueError:
+            LLM_JSON_OUTCOMES.labels("failed").inc()
+            raise
+        outcome = "repaired"
+
+    missing = [k for k in (required or []) if isinstance(data, dict) and k not in data]
+    if missing:
+        logger.info("LLM reply missing %s, re-requesting just those", missing)
+        retry_prompt = (
+            f"{prompt}\n\nReturn ONLY a JSON object with these keys: "
+            f"{', '.join(missing)}."
+        )
+        try:
+            extra = repair_json(stream_mistral_json(retry_prompt))
+        except ValueError:
+            extra = {}
+        if isinstance(extra, dict):
+            data.update({k: extra[k] for k in missing if k in extra})
+        outcome = "section_retry"
+    LLM_JSON_OUTCOMES.labels(outcome).inc()
+    return data
+
+def normalize_parsed(parsed):
+    """
+    Reshape the parse JSON for CVParsed: meta fields under "meta" (domain
+    included), skills as canonical plain strings, project tools as lists,
+    project links as valid URLs only, and missing skills computed locally
+    against the domain's requirements (see skill_gap). For a domain the
+    engine doesn't know, the LLM's missing skills are kept.
+    """
+    # 1) pull top-level meta fields into parsed["meta"]
+    if "meta" not in parsed:
+        meta = {k: parsed.pop(k, None)
+                for k in ["name","email","phone","bio","linkedin","github"]}
+        # everything that’s left is education/experience/skills/projects
+        parsed = {"meta": meta, **parsed}
+
+    # 2) turn each {"name": …} skill into a flat string
+    parsed["skills"] = [
+        s["name"] if isinstance(s, dict) and "name" in s else s
+        for s in parsed.get("skills") or []
+    ]
+
+    # 3) ensure each project's tools is a real list
+    for proj in parsed.get("projects") or []:
+        tools = proj.get("tools", [])
+        if isinstance(tools, str):
+            proj["tools"] = [t.strip() for t in tools.split(",") if t.strip()]
+
+    # 4) keep only http(s) project links
+    for proj in parsed.get("projects") or []:
+        link = proj.get("link")
+        if isinstance(link, str):
+            if not (link.startswith("http://") or link.startswith("https://")):
+                proj["link"] = None
+        elif isinstance(link, list):
+            valid = [
+                l for l in link
+                if isinstance(l, str)
+                and (l.startswith("http://") or l.startswith("https://"))
+            ]
+            proj["link"] = valid or None
+
+    for key in ("linkedin", "github"):
+        val = parsed["meta"].get(key)
+        if isinstance(val, str):
+            parsed["meta"][key] = val.strip().strip("'").strip('"')
+
+    # 5) canonical skill names; gaps against the domain's requirements
+    parsed["skills"] = canonicalize_skills(parsed["skills"])
+    llm_missing = parsed.pop("missing_skills", None)
+    domain = parsed.pop("domain", None)
+    resolved, missing = get_engine().missing_for(domain, parsed["skills"])
+    if missing is None:
+        # a skill the CV has is never "missing"
+        have = {normalize_key(s) for s in parsed["skills"]}
+        missing = [s for s in canonicalize_skills(_skill_names(llm_missing if isinstance(llm_missing, list) else []))
+                   if normalize_key(s) not in have]
+    parsed["missing_skills"] = missing
+    parsed["meta"]["domain"] = domain or resolved
+    for key in ("education", "experience", "projects"):
+        parsed[key] = parsed.get(key) or []
+    return parsed
@@ -0,0 +1,176 @@
+# backend/app/utils/cv_text.py
+
+import os
+import re
+from collections import Counter
+from typing import List, Tuple
+
+# prompt budget (estimated tokens) for the CV text of a single parse call
+PARSE_TOKEN_BUDGET = int(os.getenv("PARSE_TOKEN_BUDGET", "3000"))
+
+_WS_RUN = re.compile(r"[ \t ]+")
+# "Page 2", "page 2 of 3", "2 of 3", "2/3"; at most three digits so years
+# ("2019", "2016 / 2019") never look like page numbers
+_PAGE_LABEL = re.compile(
+    r"^(page\s*\d{1,3}(\s*(of|/)\s*\d{1,3})?|\d{1,3}\s*(of|/)\s*\d{1,3})$", re.IGNORECASE
+)
+# a bare number only counts as a page number on a page's first or last line
+_BARE_NUMBER = re.compile(r"^\d{1,3}$")
+
+# heading text -> canonical section
+SECTION_HEADINGS = {
+    "summary": "summary", "profile": "summary", "about": "summary", "about me": "summary",
+    "professional summary": "summary", "objective": "summary",
+    "education": "education", "academic background": "education",
+    "experience": "experience", "work experience": "experience",
+    "professional experience": "experience", "employment": "experience",
+    "employment history": "experience", "internships": "experience",
+    "research experience": "experience",
+    "skills": "skills", "technical skills": "skills", "core skills": "skills",
+    "technologies": "skills", "tools": "skills", "skills & tools": "skills",
+    "programming languages": "skills",
+    "projects": "projects", "personal projects": "projects",
+    "academic projects": "projects", "selected projects": "projects",
+    "certifications": "other", "publications": "other", "awards": "other",
+    # spoken or programming languages; settled from the body (see _languages_section)
+    "languages": "languages",
+    # nothing the parser extracts lives in these
+    "interests": "ignore", "hobbies": "ignore",
+    "volunteering": "ignore", "references": "ignore", "activities": "ignore",
+}
+_HEADING = re.compile(
+    r"^(%s)\s*:?$" % "|".join(sorted((re.escape(h) for h in SECTION_HEADINGS), key=len, reverse=True)),
+    re.IGNORECASE,
+)
+
+# a "Languages" section is spoken languages when every line is only these
+# names and proficiency levels ("French (C1)", "English - native")
+_SPOKEN_LANGUAGES = frozenset(
+    "english french german spanish italian portuguese dutch russian arabic chinese mandarin "
+    "cantonese japanese korean hindi urdu bengali punjabi turkish persian farsi polish ukrainian "
+    "romanian greek swedish norwegian danish finnish czech hungarian hebrew thai vietnamese "
+    "indonesian malay tagalog swahili tamil telugu catalan croatian serbian bulgarian slovak".split()
+)
+_LANGUAGE_LEVELS = frozenset(
+    "a1 a2 b1 b2 c1 c2 native fluent fluently bilingual basic beginner elementary intermediate "
+    "advanced upper lower conversational professional working full limited proficiency proficient "
+    "mother tongue first second language languages level good excellent business and".split()
+)
+_WORD = re.compile(r"[^\W\d_]+\d?", re.UNICODE)
+
+# header/footer candidates: this many lines at the top and bottom of a page
+_EDGE_LINES = 3
+
+
+def _clean_lines(page: str) -> List[str]:
+    return [_WS_RUN.sub(" ", line).strip() for line in page.splitlines()]
+
+
+def compact_text(pages: List[str]) -> str:
+    """
+    Normalize extracted CV text before it goes into a prompt: collapse
+    whitespace runs, drop page numbers, drop header/footer lines repeated at
+    the edges of several pages, and squeeze blank lines and consecutive
+    duplicate lines.
+    """
+    cleaned = [_clean_lines(p) for p in pages]
+
+    edge_counts: Counter = Counter()
+    for lines in cleaned:
+        body = [l for l in lines if l]
+        edges = set(body[:_EDGE_LINES] + body[-_EDGE_LINES:])
+        edge_counts.update(edges)
+    repeated_edges = (
+        {l for l, n in edge_counts.items() if n >= 2}
+        if len(cleaned) >= 2 else set()
+    )
+
+    out: List[str] = []
+    seen_edges = set()
+    for lines in cleaned:
+        body = [i for i, l in enumerate(lines) if l]
+        edges = {body[0], body[-1]} if body else set()
+        for i, line in enumerate(lines):
+            if _PAGE_LABEL.match(line) or (i in edges and _BARE_NUMBER.match(line)):
+                continue
+            if line in repeated_edges:
+                # keep the first copy: a name header carries information once
+                if line in seen_edges:
+                    continue
+                seen_edges.add(line)
+            if not line:
+                if out and out[-1] == "":
+                    continue
+            elif out and out[-1] == line:
+                continue
+            out.append(line)
+    return "\n".join(out).strip()
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token for English prose)."""
+    return len(text) // 4 + 1
+
+
+def _languages_section(lines: List[str]) -> str:
+    """"ignore" for spoken languages and their levels, else "skills" (Python, Java, ...)."""
+    words = [w for line in lines[1:] for w in _WORD.findall(line.lower())]
+    if words and all(w in _SPOKEN_LANGUAGES or w in _LANGUAGE_LEVELS for w in words):
+        return "ignore"
+    return "skills"
+
+
+def split_sections(text: str) -> List[Tuple[str, str]]:
+    """
+    Split CV text on recognised section headings. Returns
+    [(section, body)], where section is a canonical name from
+    SECTION_HEADINGS and the text before the first heading is "header".
+    """
+    sections: List[Tuple[str, List[str]]] = [("header", [])]
+    for line in text.splitlines():
+        m = _HEADING.match(line.strip())
+        if m:
+            sections.append((SECTION_HEADINGS[m.group(1).lower()], [line]))
+        else:
+            sections[-1][1].append(line)
+    sections = [(_languages_section(lines) if name == "languages" else name, lines)
+                for name, lines in sections]
+    return [(name, "\n".join(lines).strip()) for name, lines in sections
+            if "\n".join(lines).strip()]
+
+
+def chunk_sections(sections: List[Tuple[str, str]], budget: int = PARSE_TOKEN_BUDGET) -> List[List[Tuple[str, str]]]:
+    """
+    Pack consecutive sections into chunks of at most `budget` estimated
+    tokens. A section bigger than the budget is split on line boundaries.
+    """
+    chunks: List[List[Tuple[str, str]]] = []
+    current: List[Tuple[str, str]] = []
+    size = 0
+    for name, body in sections:
+        for piece in _split_oversized(body, budget):
+            cost = estimate_tokens(piece)
+            if current and size + cost > budget:
+                chunks.append(current)
+                current, size = [], 0
+            current.append((name, piece))
+            size += cost
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _split_oversized(body: str, budget: int) -> List[str]:
+    if estimate_tokens(body) <= budget:
+        return [body]
+    pieces, current, size = [], [], 0
+    for line in body.splitlines():
+        cost = estimate_tokens(line)
+        if current and size + cost > budget:
+            pieces.append("\n".join(current))
+            current, size = [], 0
+        current.append(line)
+        size += cost
+    if current:
+        pieces.append("\n".join(current))
+    return pieces
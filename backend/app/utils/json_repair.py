@@ -0,0 +1,158 @@
+# backend/app/utils/json_repair.py
+
+import json
+import re
+from typing import Any
+
+_FENCE = re.compile(r"```(?:json|JSON)?")
+_CLOSERS = {"{": "}", "[": "]"}
+
+
+def strip_code_fences(text: str) -> str:
+    return _FENCE.sub("", text)
+
+
+class StreamingJSONScanner:
+    """
+    Follows a JSON document as it streams in, chunk by chunk, and reports
+    when the top-level value is complete so the caller can stop reading.
+
+    Text before the first '{' or '[' (chatter, code fences) is skipped and
+    anything after the top-level value is ignored.
+    """
+    def __init__(self):
+        self.buffer: list[str] = []
+        self.started = False
+        self.complete = False
+        self._stack: list[str] = []
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, chunk: str) -> bool:
+        """Consume a chunk; returns True once the top-level value is closed."""
+        for ch in chunk:
+            if self.complete:
+                break
+            if not self.started:
+                if ch in "{[":
+                    self.started = True
+                else:
+                    continue
+            self.buffer.append(ch)
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                self._stack.append(ch)
+            elif ch in "}]":
+                if self._stack:
+                    self._stack.pop()
+                if not self._stack:
+                    self.complete = True
+        return self.complete
+
+    @property
+    def text(self) -> str:
+        return "".join(self.buffer)
+
+
+def repair_json(text: str) -> Any:
+    """
+    Parse JSON produced by an LLM, repairing the usual damage: code fences,
+    leading/trailing chatter, trailing commas and truncation (unterminated
+    strings, unclosed objects/arrays, dangling keys). A truncated document
+    is cut back to its last complete element and closed.
+
+    Raises ValueError if nothing parseable can be recovered.
+    """
+    text = strip_code_fences(text)
+    start = min((i for i in (text.find("{"), text.find("[")) if i != -1), default=-1)
+    if start == -1:
+        raise ValueError("no JSON object or array in text")
+
+    out: list[str] = []
+    stack: list[str] = []
+    # (length of `out`, open brackets) at points where cutting leaves valid JSON
+    safe_points: list[tuple[int, list[str]]] = []
+    in_string = escape = False
+
+    for ch in text[start:]:
+        if in_string:
+            out.append(ch)
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+            continue
+        if ch == '"':
+            in_string = True
+        elif ch in "{[":
+            stack.append(ch)
+            out.append(ch)
+            safe_points.append((len(out), list(stack)))
+            continue
+        elif ch in "}]":
+            _drop_trailing_comma(out)
+            if stack:
+                stack.pop()
+            out.append(ch)
+            if not stack:
+                break
+            safe_points.append((len(out), list(stack)))
+            continue
+        elif ch == ",":
+            _drop_trailing_comma(out)
+            safe_points.append((len(out), list(stack)))
+        out.append(ch)
+
+    candidate = "".join(out)
+    if not stack and not in_string:
+        try:
+            return json.loads(candidate)
+        except json.JSONDecodeError:
+            pass
+    else:
+        closed = candidate + ('"' if in_string else "") + _closing(stack)
+        try:
+            return json.loads(closed)
+        except json.JSONDecodeError:
+            pass
+
+    # cut back to the last complete element and close what is still open
+    for length, open_stack in reversed(safe_points):
+        attempt = "".join(out[:length]).rstrip()
+        if attempt.endswith(","):
+            attempt = attempt[:-1]
+        try:
+            return json.loads(attempt + _closing(open_stack))
+        except json.JSONDecodeError:
+            continue
+    raise ValueError("could not repair JSON")
+
+
+def _drop_trailing_comma(out: list[str]):
+    i = len(out) - 1
+    while i >= 0 and out[i].isspace():
+        i -= 1
+    if i >= 0 and out[i] == ",":
+        del out[i]
+
+
+def _closing(stack: list[str]) -> str:
+    return "".join(_CLOSERS[b] for b in reversed(stack))
+
+
+def loads_tolerant(text: str) -> Any:
+    """Strict parse first (the common case), repair only when that fails."""
+    try:
+        return json.loads(strip_code_fences(text))
+    except json.JSONDecodeError:
+        return repair_json(text)
@@ -0,0 +1,224 @@
+# backend/app/utils/llm_scheduler.py
+
+import os
+import time
+import heapq
+import asyncio
+import itertools
+import threading
+from collections import Counter
+from contextlib import contextmanager, asynccontextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from .metrics import LLM_QUEUE_SECONDS, LLM_QUEUE_DEPTH, LLM_SCHEDULER_OUTCOMES
+
+# lower runs first
+PRIORITIES = {"interactive": 0, "batch": 1, "background": 2}
+
+
+def _parse_limits(spec: str) -> Dict[str, int]:
+    out = {}
+    for entry in spec.replace(";", ",").split(","):
+        name, _, value = entry.partition("=")
+        if name.strip() and value.strip():
+            out[name.strip()] = int(value)
+    return out
+
+
+# concurrent calls per model, e.g. "mistral=4,deepseek-coder=2"
+LLM_CONCURRENCY = _parse_limits(os.getenv("LLM_CONCURRENCY", ""))
+LLM_DEFAULT_CONCURRENCY = int(os.getenv("LLM_DEFAULT_CONCURRENCY", "2"))
+# waiting calls per model and priority before new ones are turned away
+LLM_QUEUE_LIMITS = {
+    "interactive": 32, "batch": 64, "background": 256,
+    **_parse_limits(os.getenv("LLM_QUEUE_LIMITS", "")),
+}
+
+_priority: ContextVar[str] = ContextVar("llm_priority", default="batch")
+_cancel: ContextVar[Optional[threading.Event]] = ContextVar("llm_cancel", default=None)
+
+
+class SchedulerBusy(RuntimeError):
+    """The queue for this model and priority is full."""
+
+
+class LLMCancelled(Exception):
+    """The caller went away (client disconnected) before or during the call."""
+
+
+@contextmanager
+def llm_priority(name: str):
+    """Run the LLM calls made inside the block (and threads spawned with its context) at `name`."""
+    if name not in PRIORITIES:
+        raise ValueError(f"unknown LLM priority {name!r}")
+    token = _priority.set(name)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def check_cancelled():
+    """Raise LLMCancelled if the current request was cancelled; for streaming loops."""
+    event = _cancel.get()
+    if event is not None and event.is_set():
+        raise LLMCancelled()
+
+
+class _ScopeEvent(threading.Event):
+    """A cancel event that also reads as set once the enclosing one is."""
+
+    def __init__(self, parent: Optional[threading.Event]):
+        super().__init__()
+        self.parent = parent
+
+    def is_set(self) -> bool:
+        return super().is_set() or (self.parent is not None and self.parent.is_set())
+
+
+@contextmanager
+def cancel_scope():
+    """
+    A cancel event of its own for the LLM work inside the block, e.g. one
+    stage that is abandoned on a timeout while the rest of the request goes
+    on. Cancelling the enclosing request still cancels it too.
+    """
+    event = _ScopeEvent(_cancel.get())
+    token = _cancel.set(event)
+    try:
+        yield event
+    finally:
+        _cancel.reset(token)
+
+
+@asynccontextmanager
+async def cancel_on_disconnect(request, poll_seconds: float = 0.5):
+    """
+    Cancel the LLM work of this request when its client disconnects.
+
+    Sets a cancel event in the current context, so threadpool calls started
+    inside the block see it; queued calls give up their place and streaming
+    calls stop reading.
+    """
+    event = threading.Event()
+    token = _cancel.set(event)
+
+    async def watch():
+        while not event.is_set():
+            if await request.is_disconnected():
+                event.set()
+                return
+            await asyncio.sleep(poll_seconds)
+
+    watcher = asyncio.create_task(watch())
+    try:
+        yield event
+    finally:
+        watcher.cancel()
+        _cancel.reset(token)
+
+
+class _ModelQueue:
+    """
+    Concurrency limit for one model with a priority queue in front of it.
+    Waiters are served strictly by (priority, arrival).
+    """
+    def __init__(self, model: str, limit: int):
+        self.model = model
+        self.limit = limit
+        self.active = 0
+        self._cond = threading.Condition()
+        self._waiting = []                    # heap of (priority rank, seq)
+        self._depth: Counter = Counter()
+        self._seq = itertools.count()
+
+    def acquire(self, priority: str, cancel: Optional[threading.Event]) -> float:
+        """Block until a slot is free; returns seconds spent queued."""
+        start = time.perf_counter()
+        with self._cond:
+            if self.active < self.limit and not self._waiting:
+                self.active += 1
+                return 0.0
+            if self._depth[priority] >= LLM_QUEUE_LIMITS.get(priority, 64):
+                raise SchedulerBusy(f"{self.model}: {priority} queue is full")
+            ticket = (PRIORITIES[priority], next(self._seq))
+            heapq.heappush(self._waiting, ticket)
+            self._depth[priority] += 1
+            LLM_QUEUE_DEPTH.labels(self.model, priority).inc()
+            try:
+                while True:
+                    if self._waiting[0] == ticket and self.active < self.limit:
+                        heapq.heappop(self._waiting)
+                        self.active += 1
+                        # the next waiter may fit into another free slot
+                        self._cond.notify_all()
+                        return time.perf_counter() - start
+                    if cancel is not None and cancel.is_set():
+                        raise LLMCancelled()
+                    # with a cancel event, wake up now and then to check it
+                    self._cond.wait(0.25 if cancel is not None else None)
+            except BaseException:
+                if ticket in self._waiting:
+                    self._waiting.remove(ticket)
+                    heapq.heapify(self._waiting)
+                    self._cond.notify_all()
+                raise
+            finally:
+                self._depth[priority] -= 1
+                LLM_QUEUE_DEPTH.labels(self.model, priority).dec()
+
+    def release(self):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify_all()
+
+
+_queues: Dict[str, _ModelQueue] = {}
+_queues_lock = threading.Lock()
+
+
+def _queue(model: str) -> _ModelQueue:
+    with _queues_lock:
+        if model not in _queues:
+            _queues[model] = _ModelQueue(model, LLM_CONCURRENCY.get(model, LLM_DEFAULT_CONCURRENCY))
+        return _queues[model]
+
+
+@contextmanager
+def llm_slot(model: str):
+    """
+    Hold one of `model`'s concurrency slots for the duration of an LLM call,
+    queueing by the current priority. Raises SchedulerBusy when the queue is
+    full and LLMCancelled when the request is cancelled while waiting.
+    """
+    priority = _priority.get()
+    queue = _queue(model)
+    try:
+        waited = queue.acquire(priority, _cancel.get())
+    except SchedulerBusy:
+        LLM_SCHEDULER_OUTCOMES.labels(model, priority, "rejected").inc()
+        raise
+    except LLMCancelled:
+        LLM_SCHEDULER_OUTCOMES.labels(model, priority, "cancelled").inc()
+        raise
+    LLM_QUEUE_SECONDS.labels(model, priority).observe(waited)
+    try:
+        yield
+    except LLMCancelled:
+        LLM_SCHEDULER_OUTCOMES.labels(model, priority, "cancelled").inc()
+        raise
+    except Exception:
+        LLM_SCHEDULER_OUTCOMES.labels(model, priority, "error").inc()
+        raise
+    else:
+        LLM_SCHEDULER_OUTCOMES.labels(model, priority, "done").inc()
+    finally:
+        queue.release()
+
+
+def scheduler_status() -> Dict[str, dict]:
+    return {
+        model: {"limit": q.limit, "active": q.active, "waiting": dict(q._depth)}
+        for model, q in _queues.items()
+    }
@@ -0,0 +1,223 @@
+# backend/app/utils/metrics.py
+
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from prometheus_client import (
+    CollectorRegistry, Counter, Gauge, Histogram, generate_latest, CONTENT_TYPE_LATEST
+)
+
+# Own registry so /metrics only shows what the app records
+REGISTRY = CollectorRegistry(auto_describe=True)
+
+# LLM calls and scrapes take seconds, not milliseconds
+SLOW_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+SIZE_BUCKETS = (256, 1024, 4096, 8192, 16384, 32768, 65536, 131072)
+
+STAGE_SECONDS = Histogram(
+    "careercompass_stage_seconds",
+    "Time spent in a named pipeline stage",
+    ["stage"], buckets=SLOW_BUCKETS, registry=REGISTRY,
+)
+STAGE_ERRORS = Counter(
+    "careercompass_stage_errors_total",
+    "Stages that raised an exception",
+    ["stage"], registry=REGISTRY,
+)
+
+LLM_SECONDS = Histogram(
+    "careercompass_llm_seconds",
+    "Latency of LLM calls",
+    ["model"], buckets=SLOW_BUCKETS, registry=REGISTRY,
+)
+LLM_CALLS = Counter(
+    "careercompass_llm_calls_total",
+    "LLM calls by outcome",
+    ["model", "outcome"], registry=REGISTRY,
+)
+LLM_PROMPT_CHARS = Histogram(
+    "careercompass_llm_prompt_chars",
+    "Prompt size sent to the LLM, in characters",
+    ["model"], buckets=SIZE_BUCKETS, registry=REGISTRY,
+)
+LLM_RESPONSE_CHARS = Histogram(
+    "careercompass_llm_response_chars",
+    "Response size returned by the LLM, in characters",
+    ["model"], buckets=SIZE_BUCKETS, registry=REGISTRY,
+)
+LLM_JSON_OUTCOMES = Counter(
+    "careercompass_llm_json_outcomes_total",
+    "How structured LLM replies were recovered: clean, repaired, section_retry or failed",
+    ["outcome"], registry=REGISTRY,
+)
+LLM_QUEUE_SECONDS = Histogram(
+    "careercompass_llm_queue_seconds",
+    "Time LLM calls waited for a scheduler slot",
+    ["model", "priority"], buckets=SLOW_BUCKETS, registry=REGISTRY,
+)
+LLM_QUEUE_DEPTH = Gauge(
+    "careercompass_llm_queue_depth",
+    "LLM calls waiting for a scheduler slot",
+    ["model", "priority"], registry=REGISTRY,
+)
+LLM_SCHEDULER_OUTCOMES = Counter(
+    "careercompass_llm_scheduler_total",
+    "Scheduled LLM calls by outcome (done, error, rejected, cancelled)",
+    ["model", "priority", "outcome"], registry=REGISTRY,
+)
+SINGLEFLIGHT_CALLS = Counter(
+    "careercompass_singleflight_calls_total",
+    "Coalesced calls by role: leader (did the work) or shared (reused a leader's); "
+    "dedup ratio = shared / (leader + shared)",
+    ["group", "role"], registry=REGISTRY,
+)
+SINGLEFLIGHT_WAITERS = Gauge(
+    "careercompass_singleflight_waiters",
+    "Callers currently waiting on an identical in-flight call",
+    ["group"], registry=REGISTRY,
+)
+LLM_INSTANCE_UP = Gauge(
+    "careercompass_llm_instance_up",
+    "Whether the router considers an Ollama instance up",
+    ["instance"], registry=REGISTRY,
+)
+LLM_INSTANCE_IN_FLIGHT = Gauge(
+    "careercompass_llm_instance_in_flight",
+    "Requests currently dispatched to an Ollama instance",
+    ["instance"], registry=REGISTRY,
+)
+PRE_EXTRACTED_FIELDS = Counter(
+    "careercompass_pre_extracted_fields_total",
+    "CV fields filled by the deterministic extractor instead of the LLM",
+    ["field"], registry=REGISTRY,
+)
+
+COURSERA_SECONDS = Histogram(
+    "careercompass_coursera_request_seconds",
+    "Latency of Coursera search requests",
+    buckets=SLOW_BUCKETS, registry=REGISTRY,
+)
+COURSERA_REQUESTS = Counter(
+    "careercompass_coursera_requests_total",
+    "Coursera search requests by HTTP status ('error' when no response)",
+    ["status"], registry=REGISTRY,
+)
+
+SUGGESTION_POOL = Counter(
+    "careercompass_suggestion_pool_total",
+    "Suggested-project lookups: hit (reused a pooled set), miss (generated), refresh (background)",
+    ["outcome"], registry=REGISTRY,
+)
+
+ADMISSION_IN_PROGRESS = Gauge(
+    "careercompass_admission_in_progress",
+    "Requests holding an admission slot",
+    ["controller"], registry=REGISTRY,
+)
+ADMISSION_QUEUE_DEPTH = Gauge(
+    "careercompass_admission_queue_depth",
+    "Requests waiting for an admission slot",
+    ["controller"], registry=REGISTRY,
+)
+ADMISSION_OUTCOMES = Counter(
+    "careercompass_admission_total",
+    "Admission decisions: admitted, queued, or rejected (queue_full, per_user_limit, queue_timeout)",
+    ["controller", "outcome"], registry=REGISTRY,
+)
+ADMISSION_WAIT_SECONDS = Histogram(
+    "careercompass_admission_wait_seconds",
+    "Time a request waited in the admission queue",
+    ["controller"], buckets=SLOW_BUCKETS, registry=REGISTRY,
+)
+
+DB_SESSION_SECONDS = Histogram(
+    "careercompass_db_session_seconds",
+    "Lifetime of a request-scoped database session",
+    buckets=SLOW_BUCKETS, registry=REGISTRY,
+)
+
+HTTP_SECONDS = Histogram(
+    "careercompass_http_request_seconds",
+    "End-to-end HTTP request latency",
+    ["method", "route", "status"], buckets=SLOW_BUCKETS, registry=REGISTRY,
+)
+
+
+# ─── trace spans ─────────────────────────────────────────────────────
+class Trace:
+    """
+    Collects the spans recorded while serving one request so they can be
+    logged together under a single request id.
+    """
+    def __init__(self, request_id: Optional[str] = None):
+        self.request_id = request_id or uuid.uuid4().hex
+        self.started = time.perf_counter()
+        self.spans: list[dict] = []
+
+    def summary(self) -> str:
+        return " ".join(
+            f"{'>' * s['depth']}{s['name']}={s['ms']:.1f}ms{'!' if s['error'] else ''}"
+            for s in sorted(self.spans, key=lambda s: s["offset_ms"])
+        )
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+# nesting depth is per context so spans running in worker threads nest correctly
+_span_depth: ContextVar[int] = ContextVar("span_depth", default=0)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+def current_request_id() -> Optional[str]:
+    trace = _current_trace.get()
+    return trace.request_id if trace else None
+
+
+@contextmanager
+def start_trace(request_id: Optional[str] = None):
+    trace = Trace(request_id)
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+@contextmanager
+def span(stage: str):
+    """
+    Time a block of work: records it in the stage histogram and, when a
+    request trace is active, as a span of that trace.
+    """
+    trace = _current_trace.get()
+    depth = _span_depth.get()
+    depth_token = _span_depth.set(depth + 1)
+    start = time.perf_counter()
+    error = False
+    try:
+        yield
+    except BaseException:
+        error = True
+        STAGE_ERRORS.labels(stage).inc()
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        _span_depth.reset(depth_token)
+        STAGE_SECONDS.labels(stage).observe(elapsed)
+        if trace is not None:
+            trace.spans.append({
+                "name": stage,
+                "offset_ms": (start - trace.started) * 1000,
+                "ms": elapsed * 1000,
+                "depth": depth,
+                "error": error,
+            })
+
+
+def render_metrics() -> tuple[bytes, str]:
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -0,0 +1,43 @@
+# backend/app/utils/minhash.py
+
+import os
+import hashlib
+from typing import Iterable
+
+import numpy as np
+
+MINHASH_PERMUTATIONS = int(os.getenv("MINHASH_PERMUTATIONS", "64"))
+
+_PRIME = (1 << 31) - 1
+# fixed seed: signatures are stored, so every process must agree on these
+_rng = np.random.default_rng(0x5EED)
+_A = _rng.integers(1, _PRIME, size=MINHASH_PERMUTATIONS, dtype=np.uint64)
+_B = _rng.integers(0, _PRIME, size=MINHASH_PERMUTATIONS, dtype=np.uint64)
+
+
+def _base_hashes(keys: Iterable[str]) -> np.ndarray:
+    return np.array(
+        [int.from_bytes(hashlib.blake2b(k.encode("utf-8"), digest_size=4).digest(), "little") % _PRIME
+         for k in keys],
+        dtype=np.uint64,
+    )
+
+
+def signature(keys: Iterable[str]) -> np.ndarray:
+    """
+    MinHash signature of a set of strings: for each of the fixed hash
+    functions (a*x + b) mod p, the minimum over the set. An empty set gets
+    an all-max signature, which only matches other empty sets.
+    """
+    x = _base_hashes(set(keys))
+    if not len(x):
+        return np.full(MINHASH_PERMUTATIONS, _PRIME, dtype=np.uint64)
+    # a, x < 2^31, so a*x + b stays well inside uint64
+    return ((_A[:, None] * x[None, :] + _B[:, None]) % _PRIME).min(axis=1)
+
+
+def similarity(sig: np.ndarray, others: np.ndarray) -> np.ndarray:
+    """Estimated Jaccard similarity of `sig` to each row of `others`."""
+    if not len(others):
+        return np.zeros(0)
+    return (others == sig[None, :]).mean(axis=1)
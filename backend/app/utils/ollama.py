@@ -1,33 +1,354 @@
 # backend/app/utils/ollama.py
 
-import subprocess
+import os
+import json
+import time
+import random
 import logging
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Dict, List, Optional, Set
+
+import requests
+
+from .metrics import (
+    LLM_SECONDS, LLM_CALLS, LLM_PROMPT_CHARS, LLM_RESPONSE_CHARS,
+    LLM_INSTANCE_UP, LLM_INSTANCE_IN_FLIGHT,
+)
+from .llm_scheduler import llm_slot, check_cancelled, LLMCancelled, SchedulerBusy
+from .singleflight import SingleFlight, prompt_key
+from .readiness import expect, mark_ready, mark_failed
 
 logger = logging.getLogger(__name__)
 
+OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434")
+# "http://gpu1:11434=mistral,deepseek-coder http://gpu2:11434=mistral";
+# an endpoint without "=models" serves whatever its /api/tags lists
+OLLAMA_ENDPOINTS = os.getenv("OLLAMA_ENDPOINTS", OLLAMA_URL)
+OLLAMA_HEALTH_INTERVAL = float(os.getenv("OLLAMA_HEALTH_INTERVAL", "10"))
+OLLAMA_HEALTH_TIMEOUT = float(os.getenv("OLLAMA_HEALTH_TIMEOUT", "2"))
+# consecutive failures that take an instance out, and for how long
+OLLAMA_MAX_FAILURES = int(os.getenv("OLLAMA_MAX_FAILURES", "3"))
+OLLAMA_DOWN_SECONDS = float(os.getenv("OLLAMA_DOWN_SECONDS", "30"))
+# an instance whose average request latency is above this is only used
+# when nothing faster serves the model
+OLLAMA_SLOW_SECONDS = float(os.getenv("OLLAMA_SLOW_SECONDS", "120"))
+# queued requests an instance may be behind and still win because it
+# already has the model in memory (loading one takes seconds)
+OLLAMA_LOADED_BONUS = int(os.getenv("OLLAMA_LOADED_BONUS", "2"))
+OLLAMA_TIMEOUT = float(os.getenv("OLLAMA_TIMEOUT", "600"))
+# how long Ollama keeps a model in memory after a request
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+# models loaded at startup, before the worker reports ready; empty disables
+OLLAMA_WARM_MODELS = [m.strip() for m in os.getenv("OLLAMA_WARM_MODELS", "mistral,deepseek-coder").split(",") if m.strip()]
+# warm-up retries back off from OLLAMA_WARM_RETRY_SECONDS, doubling up to
+# OLLAMA_WARM_RETRY_MAX_SECONDS; a model still cold after
+# OLLAMA_WARM_ATTEMPTS tries is reported unavailable on /ready
+OLLAMA_WARM_RETRY_SECONDS = float(os.getenv("OLLAMA_WARM_RETRY_SECONDS", "5"))
+OLLAMA_WARM_RETRY_MAX_SECONDS = float(os.getenv("OLLAMA_WARM_RETRY_MAX_SECONDS", "60"))
+OLLAMA_WARM_ATTEMPTS = int(os.getenv("OLLAMA_WARM_ATTEMPTS", "10"))
+
+
+class NoInstanceAvailable(RuntimeError):
+    pass
+
+
+class Instance:
+    def __init__(self, url: str, models: Optional[Set[str]] = None):
+        self.url = url.rstrip("/")
+        # None: whatever /api/tags says
+        self.configured_models = {_base(m) for m in models} if models else None
+        self.available: Set[str] = set()      # from /api/tags
+        self.loaded: Set[str] = set()         # from /api/ps
+        self.in_flight = 0
+        self.failures = 0
+        self.down_until = 0.0
+        self.latency = 0.0                    # EWMA of request seconds
+
+    def serves(self, model: str) -> bool:
+        if self.configured_models is not None:
+            return _base(model) in self.configured_models
+        # before the first health check we don't know, so assume yes
+        return not self.available or _base(model) in self.available
+
+    def is_up(self, now: float) -> bool:
+        return now >= self.down_until
+
+    def __repr__(self):
+        return f"<Instance {self.url} in_flight={self.in_flight} failures={self.failures}>"
+
+
+def _base(model: str) -> str:
+    # "mistral" and "mistral:latest" are the same model
+    return model if ":" in model else f"{model}:latest"
+
+
+def parse_endpoints(spec: str) -> List[Instance]:
+    instances = []
+    for entry in spec.replace(";", " ").split():
+        url, _, models = entry.partition("=")
+        names = {m.strip() for m in models.split(",") if m.strip()}
+        instances.append(Instance(url, names or None))
+    return instances
+
+
+class OllamaRouter:
+    """
+    Spreads LLM requests over several Ollama instances.
+
+    Each request goes to the healthy instance serving the model with the
+    fewest requests in flight, where having the model already loaded
+    counts as OLLAMA_LOADED_BONUS fewer. Instances that fail
+    OLLAMA_MAX_FAILURES times in a row (requests or health probes) are
+    taken out for OLLAMA_DOWN_SECONDS; slow ones are used last. A
+    background thread probes /api/tags and /api/ps every
+    OLLAMA_HEALTH_INTERVAL seconds.
+    """
+    def __init__(self, instances: List[Instance]):
+        self.instances = instances
+        self._lock = threading.Lock()
+        self._checker: Optional[threading.Thread] = None
+
+    # ─── selection ─────────────────────────────────────────────────
+    def _pick(self, model: str, exclude=()) -> Instance:
+        now = time.monotonic()
+        serving = [i for i in self.instances if i.serves(model) and i not in exclude]
+        if not serving:
+            raise NoInstanceAvailable(f"no Ollama instance serves {model!r}")
+        up = [i for i in serving if i.is_up(now)]
+        if not up:
+            raise NoInstanceAvailable(f"every Ollama instance serving {model!r} is down")
+        fast = [i for i in up if i.latency <= OLLAMA_SLOW_SECONDS] or up
+        key = lambda i: (
+            i.in_flight - (OLLAMA_LOADED_BONUS if _base(model) in i.loaded else 0),
+            i.latency,
+            random.random(),
+        )
+        return min(fast, key=key)
+
+    @contextmanager
+    def dispatch(self, model: str, exclude=()):
+        """
+        Reserve the best instance for one request. Connection errors and
+        5xx responses raised inside the block count against the instance.
+        """
+        with self._lock:
+            instance = self._pick(model, exclude)
+            instance.in_flight += 1
+        LLM_INSTANCE_IN_FLIGHT.labels(instance.url).inc()
+        start = time.perf_counter()
+        try:
+            yield instance
+        except requests.RequestException as e:
+            status = getattr(getattr(e, "response", None), "status_code", None)
+            if status is None or status >= 500:
+                self._failed(instance, e)
+            raise
+        else:
+            self._succeeded(instance, time.perf_counter() - start)
+        finally:
+            with self._lock:
+                instance.in_flight -= 1
+            LLM_INSTANCE_IN_FLIGHT.labels(instance.url).dec()
+
+    def post(self, model: str, path: str, body: dict, timeout: float = OLLAMA_TIMEOUT) -> dict:
+        """POST a non-streaming request; a connection failure is retried once elsewhere."""
+        tried = []
+        while True:
+            try:
+                with self.dispatch(model, exclude=tried) as instance:
+                    tried.append(instance)
+                    resp = requests.post(f"{instance.url}{path}", json=body, timeout=timeout)
+                    resp.raise_for_status()
+                    return resp.json()
+            except requests.ConnectionError:
+                if len(tried) >= 2 or len(tried) >= len(self.instances):
+                    raise
+            except NoInstanceAvailable:
+                if not tried:
+                    raise
+                raise requests.ConnectionError(f"{model}: no other instance to retry on")
+
+    def warm_up(self, model: str) -> bool:
+        """
+        Load `model` on every healthy instance serving it (a generate call
+        without a prompt only loads) and keep it for OLLAMA_KEEP_ALIVE.
+        True when at least one instance has it in memory.
+        """
+        now = time.monotonic()
+        warm = False
+        for instance in self.instances:
+            if not instance.serves(model) or not instance.is_up(now):
+                continue
+            try:
+                resp = requests.post(
+                    f"{instance.url}/api/generate",
+                    json={"model": model, "keep_alive": OLLAMA_KEEP_ALIVE},
+                    timeout=OLLAMA_TIMEOUT,
+                )
+                resp.raise_for_status()
+            except requests.RequestException as e:
+                self._failed(instance, e)
+                logger.info("Warming up %s on %s failed: %s", model, instance.url, e)
+                continue
+            with self._lock:
+                instance.loaded.add(_base(model))
+            warm = True
+        return warm
+
+    # ─── bookkeeping ───────────────────────────────────────────────
+    def _succeeded(self, instance: Instance, seconds: float):
+        with self._lock:
+            instance.failures = 0
+            instance.latency = seconds if not instance.latency else 0.8 * instance.latency + 0.2 * seconds
+        LLM_INSTANCE_UP.labels(instance.url).set(1)
+
+    def _failed(self, instance: Instance, error):
+        with self._lock:
+            instance.failures += 1
+            if instance.failures >= OLLAMA_MAX_FAILURES and instance.is_up(time.monotonic()):
+                instance.down_until = time.monotonic() + OLLAMA_DOWN_SECONDS
+                logger.warning("Ollama %s marked down for %.0fs after %d failures: %s",
+                               instance.url, OLLAMA_DOWN_SECONDS, instance.failures, error)
+                LLM_INSTANCE_UP.labels(instance.url).set(0)
+
+    # ─── health checks ─────────────────────────────────────────────
+    def check(self, instance: Instance):
+        """Probe one instance: reachable, which models it has, which are loaded."""
+        try:
+            tags = requests.get(f"{instance.url}/api/tags", timeout=OLLAMA_HEALTH_TIMEOUT)
+            tags.raise_for_status()
+            ps = requests.get(f"{instance.url}/api/ps", timeout=OLLAMA_HEALTH_TIMEOUT)
+            ps.raise_for_status()
+        except requests.RequestException as e:
+            self._failed(instance, e)
+            return
+        available = {m.get("name") or m.get("model") for m in tags.json().get("models", [])}
+        loaded = {m.get("name") or m.get("model") for m in ps.json().get("models", [])}
+        with self._lock:
+            instance.available = {_base(m) for m in available if m}
+            instance.loaded = {_base(m) for m in loaded if m}
+            instance.failures = 0
+            if not instance.is_up(time.monotonic()):
+                logger.info("Ollama %s is back up", instance.url)
+            instance.down_until = 0.0
+        LLM_INSTANCE_UP.labels(instance.url).set(1)
+
+    def check_all(self):
+        for instance in self.instances:
+            self.check(instance)
+
+    def start_health_checks(self):
+        if self._checker is not None:
+            return
+
+        def loop():
+            while True:
+                self.check_all()
+                time.sleep(OLLAMA_HEALTH_INTERVAL)
+
+        self._checker = threading.Thread(target=loop, name="ollama-health", daemon=True)
+        self._checker.start()
+
+    def status(self) -> List[Dict]:
+        now = time.monotonic()
+        return [
+            {"url": i.url, "up": i.is_up(now), "in_flight": i.in_flight,
+             "loaded": sorted(i.loaded), "latency": round(i.latency, 3)}
+            for i in self.instances
+        ]
+
+
+@lru_cache(maxsize=1)
+def get_router() -> OllamaRouter:
+    router = OllamaRouter(parse_endpoints(OLLAMA_ENDPOINTS))
+    logger.info("Ollama endpoints: %s", ", ".join(i.url for i in router.instances))
+    router.start_health_checks()
+    return router
+
+
+def warm_up_models(models=OLLAMA_WARM_MODELS, attempts: int = OLLAMA_WARM_ATTEMPTS,
+                   delay: float = OLLAMA_WARM_RETRY_SECONDS,
+                   max_delay: float = OLLAMA_WARM_RETRY_MAX_SECONDS):
+    """
+    Preload `models` so the first real request doesn't pay the load time.
+    Marks "model:<name>" ready as each one finishes. Failed tries are
+    retried with exponential backoff; after `attempts` tries a model is
+    logged and marked failed (not installed, or no instance up), and the
+    worker stays unready until it is restarted.
+    """
+    router = get_router()
+    pending = list(models)
+    for model in pending:
+        expect(f"model:{model}")
+    for attempt in range(1, attempts + 1):
+        for model in list(pending):
+            start = time.perf_counter()
+            if router.warm_up(model):
+                logger.info("Warmed up %s in %.1fs", model, time.perf_counter() - start)
+                mark_ready(f"model:{model}")
+                pending.remove(model)
+        if not pending or attempt == attempts:
+            break
+        time.sleep(min(delay * 2 ** (attempt - 1), max_delay))
+    for model in pending:
+        logger.error("Model %s could not be loaded after %d attempts; is it pulled on an Ollama instance?",
+                     model, attempts)
+        mark_failed(f"model:{model}", f"not loaded after {attempts} attempts")
+
+
+_chat_flight = SingleFlight("deepseek-coder")
+
+
 def chat_with_deepseek(prompt: str) -> str:
     """
-    Call `ollama run deepseek-coder`, piping the prompt on stdin and
-    capturing both stdout and stderr explicitly.
+    One-shot deepseek-coder completion through the scheduler and router.
+    The reply is streamed so a cancelled request (client gone) hangs up
+    and Ollama stops generating. An identical prompt already in flight (a
+    double-submitted message) is shared rather than generated twice.
     """
-    cmd = ["ollama", "run", "deepseek-coder"]
-    logger.info("→ ollama cmd: %r (prompt length %d)", cmd, len(prompt))
-
-    proc = subprocess.run(
-        cmd,
-        input=prompt,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        universal_newlines=True,
-    )
-
-    # If Ollama errored, log and raise
-    if proc.returncode != 0:
-        logger.error("Ollama stderr: %s", proc.stderr.strip())
-        raise RuntimeError(f"Ollama chat failed: {proc.stderr.strip()!r}")
-
-    # Make absolutely sure stdout is a string
-    out = proc.stdout or ""
-    out = out.strip()
-    logger.info("← ollama stdout: %r", out)
+    return _chat_flight.do(prompt_key(prompt), _chat_with_deepseek, prompt)
+
+
+def _chat_with_deepseek(prompt: str) -> str:
+    logger.info("→ deepseek-coder prompt: %d chars", len(prompt))
+    LLM_PROMPT_CHARS.labels("deepseek-coder").observe(len(prompt))
+
+    start = time.perf_counter()
+    parts = []
+    try:
+        with llm_slot("deepseek-coder"), get_router().dispatch("deepseek-coder") as instance, requests.post(
+            f"{instance.url}/api/generate",
+            json={"model": "deepseek-coder", "prompt": prompt, "stream": True,
+                  "keep_alive": OLLAMA_KEEP_ALIVE},
+            stream=True,
+            timeout=OLLAMA_TIMEOUT,
+        ) as resp:
+            resp.raise_for_status()
+            for line in resp.iter_lines():
+                if not line:
+                    continue
+                check_cancelled()
+                chunk = json.loads(line)
+                parts.append(chunk.get("response", ""))
+                if chunk.get("done"):
+                    break
+    except LLMCancelled:
+        LLM_CALLS.labels("deepseek-coder", "cancelled").inc()
+        raise
+    except SchedulerBusy:
+        LLM_CALLS.labels("deepseek-coder", "rejected").inc()
+        raise
+    except Exception as e:
+        LLM_CALLS.labels("deepseek-coder", "error").inc()
+        logger.error("deepseek-coder request failed: %s", e)
+        raise RuntimeError(f"Ollama chat failed: {e}") from e
+    finally:
+        LLM_SECONDS.labels("deepseek-coder").observe(time.perf_counter() - start)
+
+    out = "".join(parts).strip()
+    LLM_CALLS.labels("deepseek-coder", "ok").inc()
+    LLM_RESPONSE_CHARS.labels("deepseek-coder").observe(len(out))
+    logger.info("← deepseek-coder reply: %d chars", len(out))
     return out
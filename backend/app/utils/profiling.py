@@ -0,0 +1,122 @@
+# backend/app/utils/profiling.py
+
+import os
+import re
+import hmac
+import sys
+import threading
+import logging
+from collections import Counter
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN")
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL_MS", "5")) / 1000
+
+# request ids come from clients, so keep them to something safe for a filename
+_SAFE_ID = re.compile(r"^[A-Za-z0-9_.-]{1,128}$")
+
+# innermost frames of a thread that is parked rather than doing work
+_IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("selectors.py", "select"),
+    ("queue.py", "get"),
+}
+
+
+def profiling_enabled() -> bool:
+    return bool(PROFILE_TOKEN)
+
+
+def token_ok(token: Optional[str]) -> bool:
+    return bool(PROFILE_TOKEN and token) and hmac.compare_digest(token.encode(), PROFILE_TOKEN.encode())
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    filename = code.co_filename
+    if "site-packages" in filename:
+        filename = filename.split("site-packages" + os.sep, 1)[1]
+    elif os.sep + "app" + os.sep in filename:
+        filename = "app" + os.sep + filename.split(os.sep + "app" + os.sep, 1)[1]
+    else:
+        filename = os.path.basename(filename)
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+
+def _is_idle(frame) -> bool:
+    code = frame.f_code
+    return (os.path.basename(code.co_filename), code.co_name) in _IDLE_FRAMES
+
+
+class SamplingProfiler:
+    """
+    Samples the Python stacks of every thread at a fixed interval while it
+    runs and aggregates them into collapsed ("folded") stacks, the input
+    format of flamegraph.pl and speedscope.
+
+    Sync handlers run in the threadpool and async ones on the event loop,
+    so all busy threads are sampled; each stack is rooted at its thread name.
+    Requests running concurrently with a profiled one show up in its
+    samples too, so profile on a quiet instance when you can.
+    """
+    def __init__(self, interval: float = PROFILE_INTERVAL):
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own or _is_idle(frame):
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.samples[";".join(reversed(stack))] += 1
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+
+def profile_path(request_id: str) -> Optional[str]:
+    if not _SAFE_ID.match(request_id):
+        return None
+    return os.path.join(PROFILE_DIR, f"{request_id}.collapsed")
+
+
+def save_profile(request_id: str, profiler: SamplingProfiler) -> Optional[str]:
+    path = profile_path(request_id)
+    if path is None:
+        logger.warning("Not saving profile for unsafe request id %r", request_id)
+        return None
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(profiler.collapsed())
+    logger.info("Saved profile for request %s (%d samples) to %s",
+                request_id, sum(profiler.samples.values()), path)
+    return path
+
+
+def load_profile(request_id: str) -> Optional[str]:
+    path = profile_path(request_id)
+    if path is None or not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return f.read()
@@ -0,0 +1,41 @@
+# backend/app/utils/readiness.py
+
+import threading
+import time
+from typing import Dict, List, Tuple
+
+# name -> None while warming up, else the time it became ready
+_checks: Dict[str, float] = {}
+# checks that gave up warming up; they stay not ready
+_failed: Dict[str, str] = {}
+_lock = threading.Lock()
+
+
+def expect(name: str):
+    """Register something that has to warm up before the worker takes traffic."""
+    with _lock:
+        _checks.setdefault(name, None)
+
+
+def mark_ready(name: str):
+    with _lock:
+        _checks[name] = time.time()
+        _failed.pop(name, None)
+
+
+def mark_failed(name: str, reason: str):
+    """`name` won't become ready without intervention (e.g. a model that isn't installed)."""
+    with _lock:
+        _checks.setdefault(name, None)
+        _failed[name] = reason
+
+
+def readiness() -> Tuple[bool, Dict[str, bool]]:
+    with _lock:
+        checks = {name: at is not None for name, at in _checks.items()}
+    return bool(checks) and all(checks.values()), checks
+
+
+def failures() -> Dict[str, str]:
+    with _lock:
+        return dict(_failed)
@@ -2,9 +2,7 @@ import os
 from datetime import datetime, timedelta
 from jose import jwt
 from passlib.context import CryptContext
-from dotenv import load_dotenv
 
-load_dotenv()
 
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM  = os.getenv("ALGORITHM", "HS256")
@@ -0,0 +1,270 @@
+# backend/app/utils/similarity.py
+
+import os
+import fcntl
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .skills import get_taxonomy, normalize_key
+
+logger = logging.getLogger(__name__)
+
+# hashed feature space; 256 float32 columns keep 100k CVs at ~100 MB
+SIMILARITY_DIM = int(os.getenv("SIMILARITY_DIM", "256"))
+SIMILARITY_INDEX_DIR = os.getenv("SIMILARITY_INDEX_DIR", "similarity_index")
+# journal rows after which a writer folds the journal into the snapshot
+SIMILARITY_COMPACT_ROWS = int(os.getenv("SIMILARITY_COMPACT_ROWS", "5000"))
+
+SKILL_WEIGHT = 1.0
+TOOL_WEIGHT = 0.5
+DOMAIN_WEIGHT = 2.0
+
+
+@lru_cache(maxsize=65536)
+def _bucket(feature: str, dim: int) -> Tuple[int, float]:
+    # stable across processes, unlike hash()
+    h = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+    return h % dim, (1.0 if h >> 63 == 0 else -1.0)
+
+
+def cv_vector(skills: Iterable[str], tools: Iterable[str] = (), domain: Optional[str] = None,
+              dim: int = SIMILARITY_DIM) -> np.ndarray:
+    """
+    L2-normalized, feature-hashed vector of a CV. Skills and project tools
+    share one namespace (a tool used in a project matches a listed skill)
+    but tools weigh less; the domain is one heavy feature of its own.
+    """
+    taxonomy = get_taxonomy()
+    features = {}
+    for s in skills:
+        if isinstance(s, str) and s.strip():
+            features[f"skill:{normalize_key(taxonomy.canonicalize(s))}"] = SKILL_WEIGHT
+    for t in tools:
+        if isinstance(t, str) and t.strip():
+            features.setdefault(f"skill:{normalize_key(taxonomy.canonicalize(t))}", TOOL_WEIGHT)
+    if domain:
+        features[f"domain:{normalize_key(domain)}"] = DOMAIN_WEIGHT
+
+    vec = np.zeros(dim, dtype=np.float32)
+    for feature, weight in features.items():
+        i, sign = _bucket(feature, dim)
+        vec[i] += sign * weight
+    norm = np.linalg.norm(vec)
+    return vec / norm if norm else vec
+
+
+class SimilarityIndex:
+    """
+    Dense (n, dim) float32 matrix of unit CV vectors with a row per CV id;
+    cosine top-K is one matrix-vector product plus argpartition.
+
+    On disk it is a snapshot (snapshot.npz, ids and vectors together,
+    swapped in atomically) and an append-only journal of (id, vector)
+    records; an all-zero vector removes the id.
+    Writers append under a file lock, and every process replays only the
+    journal tail it hasn't seen yet, so an upload in one worker shows up in
+    the others on their next query without reloading the whole matrix.
+    """
+    def __init__(self, directory: str = SIMILARITY_INDEX_DIR, dim: int = SIMILARITY_DIM):
+        self.dir = directory
+        self.dim = dim
+        self._record = np.dtype([("id", "<i8"), ("vec", "<f4", (dim,))])
+        self._mutex = threading.Lock()
+        self._reset()
+        self._snapshot_key = None
+        self._journal_offset = 0
+
+    # ─── files ─────────────────────────────────────────────────────
+    def _path(self, name: str) -> str:
+        return os.path.join(self.dir, name)
+
+    @contextmanager
+    def _file_lock(self):
+        os.makedirs(self.dir, exist_ok=True)
+        with open(self._path(".lock"), "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def exists(self) -> bool:
+        return os.path.exists(self._path("snapshot.npz"))
+
+    # ─── in-memory state ───────────────────────────────────────────
+    def _reset(self):
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._matrix = np.zeros((0, self.dim), dtype=np.float32)
+        self._rows = {}
+        self._size = 0
+
+    def _grow(self):
+        capacity = max(1024, 2 * len(self._ids))
+        ids = np.zeros(capacity, dtype=np.int64)
+        matrix = np.zeros((capacity, self.dim), dtype=np.float32)
+        ids[: self._size] = self._ids[: self._size]
+        matrix[: self._size] = self._matrix[: self._size]
+        self._ids, self._matrix = ids, matrix
+
+    def _apply(self, cv_id: int, vec: np.ndarray):
+        row = self._rows.get(cv_id)
+        if not vec.any():
+            if row is not None:
+                # swap-remove keeps the live rows contiguous
+                last = self._size - 1
+                self._ids[row] = self._ids[last]
+                self._matrix[row] = self._matrix[last]
+                self._rows[int(self._ids[row])] = row
+                del self._rows[cv_id]
+                self._size = last
+            return
+        if row is None:
+            if self._size == len(self._ids):
+                self._grow()
+            row = self._size
+            self._size += 1
+            self._rows[cv_id] = row
+            self._ids[row] = cv_id
+        self._matrix[row] = vec
+
+    def __len__(self) -> int:
+        return self._size
+
+    def refresh(self):
+        """Pick up a new snapshot, or just the journal records appended since last time."""
+        with self._mutex:
+            self._refresh()
+
+    def _refresh(self):
+        snapshot_key = self._stat_key(self._path("snapshot.npz"))
+        journal = self._path("journal.bin")
+        journal_size = os.path.getsize(journal) if os.path.exists(journal) else 0
+
+        if snapshot_key != self._snapshot_key or journal_size < self._journal_offset:
+            self._reset()
+            if snapshot_key is not None:
+                snapshot_key = self._load_snapshot()
+            self._snapshot_key = snapshot_key
+            self._journal_offset = 0
+
+        pending = (journal_size - self._journal_offset) // self._record.itemsize
+        if pending > 0:
+            with open(journal, "rb") as f:
+                f.seek(self._journal_offset)
+                records = np.fromfile(f, dtype=self._record, count=pending)
+            for cv_id, vec in zip(records["id"], records["vec"]):
+                self._apply(int(cv_id), vec)
+            self._journal_offset += len(records) * self._record.itemsize
+
+    @staticmethod
+    def _stat_key(path: str):
+        # a replaced snapshot is a new inode, even within the mtime resolution
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return st.st_ino, st.st_mtime_ns
+
+    def _load_snapshot(self):
+        """Load snapshot.npz; returns the key of the file actually read."""
+        try:
+            f = open(self._path("snapshot.npz"), "rb")
+        except FileNotFoundError:
+            return None
+        with f:
+            st = os.fstat(f.fileno())
+            with np.load(f) as snapshot:
+                ids, matrix = snapshot["ids"], snapshot["vectors"]
+        if matrix.shape[1:] != (self.dim,) or len(ids) != len(matrix):
+            logger.error("Similarity snapshot has shape %s for %d ids, expected dim %d; ignoring it",
+                         matrix.shape, len(ids), self.dim)
+        else:
+            self._ids, self._matrix, self._size = ids.astype(np.int64), matrix.astype(np.float32), len(ids)
+            self._rows = {int(i): r for r, i in enumerate(self._ids)}
+        return st.st_ino, st.st_mtime_ns
+
+    # ─── writes ────────────────────────────────────────────────────
+    def update(self, entries: Sequence[Tuple[int, np.ndarray]], remove: Iterable[int] = ()):
+        """Upsert (cv_id, vector) entries and drop `remove` ids, durably."""
+        upserted = {cv_id for cv_id, _ in entries}
+        tombstones = [i for i in remove if i not in upserted]
+        records = np.zeros(len(entries) + len(tombstones), dtype=self._record)
+        for r, (cv_id, vec) in enumerate(entries):
+            records[r] = (cv_id, vec)
+        for r, cv_id in enumerate(tombstones, start=len(entries)):
+            records["id"][r] = cv_id
+        if not len(records):
+            return
+        with self._file_lock(), self._mutex:
+            with open(self._path("journal.bin"), "ab") as f:
+                records.tofile(f)
+                f.flush()
+                os.fsync(f.fileno())
+            self._refresh()
+            if self._journal_offset // self._record.itemsize >= SIMILARITY_COMPACT_ROWS:
+                self._write_snapshot()
+
+    def replace_all(self, ids: np.ndarray, matrix: np.ndarray):
+        """Swap in a freshly built matrix (rebuild) and clear the journal."""
+        with self._file_lock(), self._mutex:
+            self._reset()
+            self._ids, self._matrix, self._size = ids.astype(np.int64), matrix.astype(np.float32), len(ids)
+            self._rows = {int(i): r for r, i in enumerate(self._ids)}
+            self._write_snapshot()
+
+    def _write_snapshot(self):
+        # caller holds both locks; ids and vectors go into one file that is
+        # renamed into place, so a reader never sees one without the other
+        tmp = self._path(".snapshot.npz.tmp")
+        with open(tmp, "wb") as f:
+            np.savez(f, ids=self._ids[: self._size], vectors=self._matrix[: self._size])
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self._path("snapshot.npz"))
+        open(self._path("journal.bin"), "wb").close()
+        for legacy in ("ids.npy", "vectors.npy"):
+            if os.path.exists(self._path(legacy)):
+                os.remove(self._path(legacy))
+        self._snapshot_key = self._stat_key(self._path("snapshot.npz"))
+        self._journal_offset = 0
+        logger.info("Wrote similarity snapshot: %d CVs", self._size)
+
+    # ─── queries ───────────────────────────────────────────────────
+    def search(self, query: np.ndarray, k: int = 10, exclude: Iterable[int] = ()) -> List[Tuple[int, float]]:
+        """Exact cosine top-K: [(cv_id, score)] best first."""
+        return self.search_many(query[None, :], k, exclude)[0]
+
+    def search_many(self, queries: np.ndarray, k: int = 10,
+                    exclude: Iterable[int] = ()) -> List[List[Tuple[int, float]]]:
+        """Top-K for a batch of queries with a single (n, dim) @ (dim, q) product."""
+        with self._mutex:
+            self._refresh()
+            n = self._size
+            if n == 0 or k <= 0:
+                return [[] for _ in range(len(queries))]
+            scores = self._matrix[:n] @ queries.astype(np.float32).T      # (n, q)
+            for cv_id in exclude:
+                row = self._rows.get(cv_id)
+                if row is not None:
+                    scores[row, :] = -np.inf
+            ids = self._ids[:n].copy()
+
+        k = min(k, n)
+        top = np.argpartition(-scores, k - 1, axis=0)[:k]                 # (k, q) unordered
+        out = []
+        for q in range(scores.shape[1]):
+            rows = top[:, q]
+            rows = rows[np.argsort(-scores[rows, q])]
+            out.append([(int(ids[r]), float(scores[r, q])) for r in rows if np.isfinite(scores[r, q])])
+        return out
+
+
+@lru_cache(maxsize=1)
+def get_index() -> SimilarityIndex:
+    return SimilarityIndex()
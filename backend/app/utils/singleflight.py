@@ -0,0 +1,75 @@
+# backend/app/utils/singleflight.py
+
+import copy
+import hashlib
+import threading
+from typing import Any, Callable, Dict, Hashable
+
+from .metrics import SINGLEFLIGHT_CALLS, SINGLEFLIGHT_WAITERS
+from .llm_scheduler import LLMCancelled, check_cancelled
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls with the same key: the first caller (the
+    leader) runs the function, the others wait for it and get a copy of
+    its result, or its exception. Nothing is cached once the call is done.
+    """
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+
+    def do(self, key: Hashable, fn: Callable[..., Any], *args, **kwargs):
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                leader = call is None
+                if leader:
+                    call = self._calls[key] = _Call()
+
+            if leader:
+                SINGLEFLIGHT_CALLS.labels(self.name, "leader").inc()
+                try:
+                    call.result = fn(*args, **kwargs)
+                    return call.result
+                except BaseException as e:
+                    call.error = e
+                    raise
+                finally:
+                    with self._lock:
+                        del self._calls[key]
+                    call.done.set()
+
+            SINGLEFLIGHT_CALLS.labels(self.name, "shared").inc()
+            SINGLEFLIGHT_WAITERS.labels(self.name).inc()
+            try:
+                # a waiter whose own request is cancelled stops waiting
+                while not call.done.wait(0.25):
+                    check_cancelled()
+            finally:
+                SINGLEFLIGHT_WAITERS.labels(self.name).dec()
+            if isinstance(call.error, LLMCancelled):
+                # the leader's client went away, not ours: run it ourselves
+                continue
+            if call.error is not None:
+                raise call.error
+            return copy.deepcopy(call.result)
+
+
+def prompt_key(*parts: str) -> str:
+    """Compact key for long prompt strings."""
+    h = hashlib.sha256()
+    for p in parts:
+        h.update((p or "").encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
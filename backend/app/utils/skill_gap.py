@@ -0,0 +1,139 @@
+# backend/app/utils/skill_gap.py
+
+import os
+import json
+import hashlib
+import logging
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .skills import get_taxonomy, normalize_key
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REQUIREMENTS = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), "data", "domain_skills.json"
+)
+DOMAIN_SKILLS_PATH = os.getenv("DOMAIN_SKILLS_PATH", DEFAULT_REQUIREMENTS)
+
+
+class SkillGapEngine:
+    """
+    Domain → required-skills matrix over an interned skill vocabulary.
+
+    Every skill set is a packed bitset (one bit per vocabulary skill, uint8
+    words), so the gaps of a CV are `required[domain] & ~have`, and those
+    of thousands of CVs are the same expression over a 2-D array.
+    """
+    def __init__(self, requirements: Dict[str, dict], signature: str = ""):
+        self.signature = signature
+        taxonomy = get_taxonomy()
+        self.domains: List[str] = list(requirements)
+        self._domain_index: Dict[str, int] = {}
+        vocab: Dict[str, int] = {}
+        self.skills: List[str] = []
+        rows = []
+        for i, (domain, spec) in enumerate(requirements.items()):
+            for alias in [domain, *spec.get("aliases", [])]:
+                self._domain_index.setdefault(normalize_key(alias), i)
+            ids = []
+            for skill in spec.get("skills", []):
+                canonical = taxonomy.canonicalize(skill)
+                key = normalize_key(canonical)
+                if key not in vocab:
+                    vocab[key] = len(self.skills)
+                    self.skills.append(canonical)
+                ids.append(vocab[key])
+            rows.append(ids)
+        self._vocab = vocab
+
+        dense = np.zeros((len(self.domains), max(len(self.skills), 1)), dtype=bool)
+        for i, ids in enumerate(rows):
+            dense[i, ids] = True
+        self.required = np.packbits(dense, axis=1)
+        self._required_counts = dense.sum(axis=1)
+        self._skill_names = np.array(self.skills, dtype=object)
+
+    @classmethod
+    def load(cls, path: str) -> "SkillGapEngine":
+        with open(path, "rb") as f:
+            raw = f.read()
+        return cls(json.loads(raw), hashlib.sha256(raw).hexdigest())
+
+    # ─── encoding ──────────────────────────────────────────────────
+    def encode(self, skills: Sequence[str]) -> np.ndarray:
+        """Packed bitset of the vocabulary skills present in `skills`."""
+        dense = np.zeros(max(len(self.skills), 1), dtype=bool)
+        taxonomy = get_taxonomy()
+        for s in skills:
+            idx = self._vocab.get(normalize_key(taxonomy.canonicalize(s)))
+            if idx is not None:
+                dense[idx] = True
+        return np.packbits(dense)
+
+    def encode_many(self, skill_lists: Sequence[Sequence[str]]) -> np.ndarray:
+        if not skill_lists:
+            return np.zeros((0, self.required.shape[1]), dtype=np.uint8)
+        return np.stack([self.encode(s) for s in skill_lists])
+
+    def _decode(self, bits: np.ndarray) -> List[str]:
+        dense = np.unpackbits(bits)[: len(self.skills)].astype(bool)
+        return list(self._skill_names[dense])
+
+    # ─── domains ───────────────────────────────────────────────────
+    def resolve_domains(self, domains: Sequence[Optional[str]], have: np.ndarray) -> np.ndarray:
+        """
+        Row index of each CV's domain, or -1 when it has none here. A named
+        domain must match a domain name or alias: an "Accounting" CV is not
+        measured against the tech domains. A CV without a domain gets the
+        one whose requirements it covers best, if it covers any at all.
+        """
+        out = np.full(len(domains), -1, dtype=np.int64)
+        unnamed = []
+        for i, d in enumerate(domains):
+            if d:
+                out[i] = self._domain_index.get(normalize_key(d), -1)
+            else:
+                unnamed.append(i)
+        if unnamed and self.domains:
+            # coverage[cv, domain] = |have & required| / |required|
+            overlap = np.bitwise_and(have[unnamed][:, None, :], self.required[None, :, :])
+            covered = np.unpackbits(overlap, axis=2).sum(axis=2)
+            coverage = covered / np.maximum(self._required_counts, 1)
+            best = coverage.argmax(axis=1)
+            out[unnamed] = np.where(coverage.max(axis=1) > 0, best, -1)
+        return out
+
+    # ─── gaps ──────────────────────────────────────────────────────
+    def missing_many(
+        self, domains: Sequence[Optional[str]], skill_lists: Sequence[Sequence[str]]
+    ) -> List[Tuple[Optional[str], Optional[List[str]]]]:
+        """
+        (resolved domain, missing skills) for each CV, computed in one pass;
+        (None, None) for a CV whose domain has no requirements here, so the
+        caller keeps whatever gaps it already has.
+        """
+        if not self.domains:
+            return [(None, None) for _ in domains]
+        have = self.encode_many(skill_lists)
+        idx = self.resolve_domains(domains, have)
+        gaps = np.bitwise_and(self.required[np.maximum(idx, 0)], np.bitwise_not(have))
+        return [(self.domains[i], self._decode(row)) if i >= 0 else (None, None)
+                for i, row in zip(idx, gaps)]
+
+    def missing_for(self, domain: Optional[str], skills: Sequence[str]) -> Tuple[Optional[str], Optional[List[str]]]:
+        return self.missing_many([domain], [skills])[0]
+
+
+@lru_cache(maxsize=1)
+def get_engine() -> SkillGapEngine:
+    try:
+        engine = SkillGapEngine.load(DOMAIN_SKILLS_PATH)
+    except (OSError, ValueError) as e:
+        logger.error("Could not load domain requirements %s: %s", DOMAIN_SKILLS_PATH, e)
+        engine = SkillGapEngine({})
+    logger.info("Skill-gap engine: %d domains over %d skills",
+                len(engine.domains), len(engine.skills))
+    return engine
@@ -0,0 +1,96 @@
+# backend/app/utils/skills.py
+
+import os
+import re
+import json
+import logging
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TAXONOMY = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "skills.json")
+SKILL_TAXONOMY_PATH = os.getenv("SKILL_TAXONOMY_PATH", DEFAULT_TAXONOMY)
+
+_PARENTHETICAL = re.compile(r"\s*[\(\[][^\)\]]*[\)\]]")
+# only whitespace-separated versions: "s3", "d3" and "html5" are names
+_VERSION = re.compile(r"\s+v?\d+(\.\d+)*(\.x)?\+?$")
+_NON_KEY = re.compile(r"[^a-z0-9+#]")
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_key(name: str) -> str:
+    """
+    Hash key for a skill name: lowercased, parenthetical notes and trailing
+    versions dropped, everything but letters, digits, '+' and '#' removed.
+    "React.js", "ReactJS" and "react js" all become "reactjs";
+    "Javascript (ES6)" becomes "javascript".
+    """
+    key = name.lower().strip()
+    key = _PARENTHETICAL.sub("", key)
+    key = _VERSION.sub("", key)
+    return _NON_KEY.sub("", key)
+
+
+class SkillTaxonomy:
+    """
+    Canonical skill names with their aliases, compiled into a dict from
+    normalized key to canonical name.
+    """
+    def __init__(self, entries: Dict[str, List[str]]):
+        self.index: Dict[str, str] = {}
+        for canonical, aliases in entries.items():
+            for alias in [canonical, *aliases]:
+                key = normalize_key(alias)
+                if key and key not in self.index:
+                    self.index[key] = canonical
+
+    @classmethod
+    def load(cls, path: str) -> "SkillTaxonomy":
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def canonical(self, name: str) -> Optional[str]:
+        """The canonical name for `name`, or None when it's not in the taxonomy."""
+        return self.index.get(normalize_key(name))
+
+    def canonicalize(self, name: str) -> str:
+        """Canonical name if known, otherwise the name with whitespace tidied."""
+        cleaned = _SPACES.sub(" ", name).strip().strip(",;.")
+        return self.index.get(normalize_key(cleaned)) or cleaned
+
+    def canonicalize_all(self, names: Iterable) -> List[str]:
+        """
+        Canonicalize a list of skills and collapse near-duplicates (same
+        normalized key), keeping first-seen order.
+        """
+        out, seen = [], set()
+        for name in names:
+            if not isinstance(name, str) or not name.strip():
+                continue
+            canonical = self.canonicalize(name)
+            key = normalize_key(canonical)
+            if key and key not in seen:
+                seen.add(key)
+                out.append(canonical)
+        return out
+
+
+@lru_cache(maxsize=1)
+def get_taxonomy() -> SkillTaxonomy:
+    try:
+        taxonomy = SkillTaxonomy.load(SKILL_TAXONOMY_PATH)
+    except (OSError, ValueError) as e:
+        logger.error("Could not load skill taxonomy %s: %s", SKILL_TAXONOMY_PATH, e)
+        taxonomy = SkillTaxonomy({})
+    logger.info("Loaded skill taxonomy: %d aliases", len(taxonomy.index))
+    return taxonomy
+
+
+def canonicalize_skills(names: Iterable) -> List[str]:
+    return get_taxonomy().canonicalize_all(names)
+
+
+def skill_key(name: str) -> str:
+    """Key of the canonical skill, so "JS" and "Javascript" compare equal."""
+    return normalize_key(get_taxonomy().canonicalize(name))
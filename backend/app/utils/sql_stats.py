@@ -0,0 +1,126 @@
+# backend/app/utils/sql_stats.py
+
+import os
+import re
+import time
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+
+# a request that runs more statements than this is logged
+SQL_QUERY_BUDGET = int(os.getenv("SQL_QUERY_BUDGET", "50"))
+# the same statement shape this many times in one request looks like a loop
+SQL_REPEAT_THRESHOLD = int(os.getenv("SQL_REPEAT_THRESHOLD", "5"))
+
+_WS = re.compile(r"\s+")
+_NUMBER = re.compile(r"\b\d+(\.\d+)?\b")
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_PLACEHOLDER_LIST = re.compile(r"\((?:\s*(?:\?|%\(\w+\)s|%s|:\w+)\s*,?)+\)")
+_PLACEHOLDER = re.compile(r"%\(\w+\)s|%s|:\w+")
+
+
+def statement_shape(statement: str) -> str:
+    """
+    Reduce a SQL statement to its shape so that the same query with
+    different parameters (or IN-lists of different length) compares equal.
+    """
+    shape = _STRING.sub("?", statement)
+    shape = _NUMBER.sub("?", shape)
+    shape = _PLACEHOLDER.sub("?", shape)
+    shape = _PLACEHOLDER_LIST.sub("(?)", shape)
+    return _WS.sub(" ", shape).strip()
+
+
+class QueryStats:
+    """
+    Statement count, time spent in the database and statement shapes for
+    one unit of work (usually a request).
+    """
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.shapes: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, statement: str, seconds: float):
+        shape = statement_shape(statement)
+        with self._lock:
+            self.count += 1
+            self.seconds += seconds
+            self.shapes[shape] += 1
+
+    def repeated(self, threshold: int = SQL_REPEAT_THRESHOLD) -> list[tuple[str, int]]:
+        """Statement shapes that ran at least `threshold` times (likely N+1)."""
+        return [(s, n) for s, n in self.shapes.most_common() if n >= threshold]
+
+
+_current_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+# collectors opened by query_budget(); they see every statement, whatever
+# thread or context it runs in
+_global_collectors: list[QueryStats] = []
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("query_start")
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.record(statement, elapsed)
+    for collector in _global_collectors:
+        collector.record(statement, elapsed)
+
+
+def install_query_hooks(engine):
+    """Attach the statement counters to an engine (once)."""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+@contextmanager
+def track_queries():
+    """Collect QueryStats for every statement run in the current context."""
+    stats = QueryStats()
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+
+
+@contextmanager
+def query_budget(max_queries: int, max_repeats: Optional[int] = None):
+    """
+    Test helper: fail if the block runs more than `max_queries` statements,
+    or repeats one statement shape more than `max_repeats` times.
+
+        with query_budget(12, max_repeats=1):
+            client.get("/cv/me", headers=auth)
+
+    Works with TestClient, which serves the request in another thread.
+    """
+    stats = QueryStats()
+    _global_collectors.append(stats)
+    try:
+        yield stats
+    finally:
+        _global_collectors.remove(stats)
+
+    problems = []
+    if stats.count > max_queries:
+        problems.append(f"{stats.count} statements, budget is {max_queries}")
+    if max_repeats is not None:
+        for shape, n in stats.repeated(max_repeats + 1):
+            problems.append(f"{n}x {shape}")
+    if problems:
+        raise AssertionError("Query budget exceeded: " + "; ".join(problems))
@@ -0,0 +1,84 @@
+# backend/benchmarks/bench_coursera_parse.py
+"""
+Parse time per Coursera search page: the previous full-DOM html.parser
+walk against parse_search_results, over the saved fixture pages.
+
+    cd backend && python -m benchmarks.bench_coursera_parse [-n 50]
+"""
+
+import os
+import re
+import sys
+import time
+import argparse
+
+from bs4 import BeautifulSoup
+
+from app.utils.coursera_searcher import parse_search_results
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+def legacy_parse(content, skill, level):
+    """The card walk search_courses_web used before parse_search_results."""
+    soup = BeautifulSoup(content, 'html.parser')
+    courses = []
+    course_cards = soup.find_all('div', {'data-testid': 'search-result-card'})
+    if not course_cards:
+        course_cards = soup.find_all('div', class_=re.compile(r'.*result.*card.*'))
+    if not course_cards:
+        for link in soup.find_all('a', href=re.compile(r'/learn/'))[:10]:
+            href = link.get('href', '')
+            title = link.get_text(strip=True)
+            if title:
+                courses.append({'title': title, 'url': f"https://www.coursera.org{href}"})
+        return courses[:3]
+    for card in course_cards[:10]:
+        title_elem = card.find('h3') or card.find('h2') or card.find('a')
+        title = title_elem.get_text(strip=True) if title_elem else ''
+        link_elem = card.find('a', href=re.compile(r'/learn/'))
+        url = f"https://www.coursera.org{link_elem.get('href', '')}" if link_elem else ''
+        desc_elem = card.find('p') or card.find('div', class_=re.compile(r'.*description.*'))
+        description = desc_elem.get_text(strip=True) if desc_elem else ''
+        rating = 0.0
+        rating_elem = card.find('span', class_=re.compile(r'.*rating.*'))
+        if rating_elem:
+            m = re.search(r'(\d+\.?\d*)', rating_elem.get_text(strip=True))
+            if m:
+                rating = float(m.group(1))
+        if title and url:
+            courses.append({'title': title, 'url': url, 'description': description, 'rating': rating})
+    return courses[:3]
+
+
+def bench(fn, content, n):
+    fn(content)                                   # warm-up
+    start = time.perf_counter()
+    for _ in range(n):
+        fn(content)
+    return (time.perf_counter() - start) / n * 1000
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("-n", type=int, default=30, help="iterations per page")
+    args = parser.parse_args(argv)
+
+    print(f"{'fixture':28} {'size':>8} {'legacy ms':>10} {'new ms':>8} {'speedup':>8}  courses")
+    for name in sorted(os.listdir(FIXTURES)):
+        if not name.endswith(".html"):
+            continue
+        with open(os.path.join(FIXTURES, name), "rb") as f:
+            content = f.read()
+        old = bench(lambda c: legacy_parse(c, "Docker", "beginner"), content, args.n)
+        new = bench(lambda c: parse_search_results(c, "Docker", "beginner"), content, args.n)
+        found = parse_search_results(content, "Docker", "beginner")
+        legacy_urls = [c["url"] for c in legacy_parse(content, "Docker", "beginner")]
+        same = [c["url"] for c in found[:len(legacy_urls)]] == legacy_urls
+        print(f"{name:28} {len(content) // 1024:>6}KB {old:>10.2f} {new:>8.2f} {old / new:>7.1f}x  "
+              f"{len(found)}{'' if same else '  (top results differ from legacy!)'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
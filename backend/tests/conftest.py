@@ -0,0 +1,65 @@
+import os
+import shutil
+import tempfile
+
+import pytest
+
+# the app reads its configuration at import time: point it at a throwaway
+# SQLite database before anything imports app.db
+_TMP = tempfile.mkdtemp(prefix="careercompass-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_TMP, 'test.db')}")
+os.environ.setdefault("SECRET_KEY", "test")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("OLLAMA_WARM_MODELS", "")
+os.environ.setdefault("SIMILARITY_INDEX_DIR", os.path.join(_TMP, "similarity_index"))
+
+
+@pytest.fixture
+def db():
+    from app.db import Base, SessionLocal, engine
+    from app import models  # noqa: F401  (registers the tables)
+    from app.utils.similarity import get_index
+
+    Base.metadata.create_all(engine)
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+        Base.metadata.drop_all(engine)
+        # the similarity index lives next to the database; start it over too
+        shutil.rmtree(os.environ["SIMILARITY_INDEX_DIR"], ignore_errors=True)
+        get_index.cache_clear()
+
+
+@pytest.fixture
+def user(db):
+    from app import models
+
+    u = models.User(email="jane@example.com", hashed_password="x")
+    db.add(u)
+    db.commit()
+    return u
+
+
+_RAW_PARSE = {
+    "name": "Jane Doe", "email": "jane@example.com", "phone": None, "bio": "Backend developer",
+    "linkedin": None, "github": None, "domain": "Software Development",
+    "education": [{"degree": "BSc", "university": "MIT", "location": None, "gpa": None,
+                   "description": None, "start_date": "2016", "end_date": "2019"}],
+    "experience": [{"role": "Developer", "company": "Acme", "location": None,
+                    "date": "2019 - 2023", "description": "APIs"}],
+    "skills": ["Python", "Docker", "SQL"],
+    "projects": [],
+}
+
+
+@pytest.fixture
+def make_parsed():
+    """Builds a normalized parse as the pipeline hands it to create_cv."""
+    from app.utils.cv_parser import normalize_parsed
+
+    def make(**overrides):
+        raw = dict(_RAW_PARSE, **overrides)
+        return normalize_parsed(raw)
+    return make
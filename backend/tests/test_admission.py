@@ -0,0 +1,112 @@
+import asyncio
+
+import pytest
+
+from app.utils.admission import AdmissionController, AdmissionRejected
+
+
+def controller(**kw):
+    args = dict(limit=1, queue_limit=1, per_key=1, queue_timeout=5, expected_seconds=10)
+    args.update(kw)
+    return AdmissionController("test", **args)
+
+
+def test_per_key_limit():
+    async def scenario():
+        c = controller(limit=2)
+        async with c.admit("jane"):
+            with pytest.raises(AdmissionRejected) as e:
+                async with c.admit("jane"):
+                    pass
+            assert e.value.reason == "per_user_limit"
+        assert c.active == 0
+    asyncio.run(scenario())
+
+
+def test_queue_is_fifo_and_hands_over_slots():
+    async def scenario():
+        c = controller(queue_limit=2)
+        order = []
+        release = asyncio.Event()
+
+        async def job(key):
+            async with c.admit(key):
+                order.append(key)
+                if key == "a":
+                    await release.wait()
+
+        first = asyncio.create_task(job("a"))
+        await asyncio.sleep(0)
+        rest = [asyncio.create_task(job(k)) for k in ("b", "c")]
+        await asyncio.sleep(0)
+        assert order == ["a"] and len(c._waiters) == 2
+        release.set()
+        await asyncio.gather(first, *rest)
+        assert order == ["a", "b", "c"]
+        assert c.active == 0 and not c._waiters
+    asyncio.run(scenario())
+
+
+def test_queue_full_is_rejected_with_retry_after():
+    async def scenario():
+        c = controller(queue_limit=1)
+        release = asyncio.Event()
+
+        async def hold(key):
+            async with c.admit(key):
+                await release.wait()
+
+        tasks = [asyncio.create_task(hold(k)) for k in ("a", "b")]
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected) as e:
+            async with c.admit("c"):
+                pass
+        assert e.value.reason == "queue_full"
+        assert e.value.retry_after == 20      # 2 ahead, 1 slot, 10s each
+        release.set()
+        await asyncio.gather(*tasks)
+    asyncio.run(scenario())
+
+
+def test_queue_timeout_frees_the_place():
+    async def scenario():
+        c = controller(queue_timeout=0.01)
+        release = asyncio.Event()
+
+        async def hold():
+            async with c.admit("a"):
+                await release.wait()
+
+        holder = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected) as e:
+            async with c.admit("b"):
+                pass
+        assert e.value.reason == "queue_timeout"
+        assert not c._waiters and "b" not in c._per_key
+        release.set()
+        await holder
+        assert c.active == 0
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiter_does_not_leak_a_slot():
+    async def scenario():
+        c = controller()
+        release = asyncio.Event()
+
+        async def hold(key):
+            async with c.admit(key):
+                await release.wait()
+
+        holder = asyncio.create_task(hold("a"))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(hold("b"))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        release.set()
+        await holder
+        assert c.active == 0 and not c._waiters
+    asyncio.run(scenario())
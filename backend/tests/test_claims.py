@@ -0,0 +1,37 @@
+from app import main, models
+from app.crud import claim_job, release_job
+
+
+def test_one_holder_at_a_time(db):
+    token = claim_job(db, "job", stale_after=60)
+    assert token is not None
+    assert claim_job(db, "job", stale_after=60) is None
+    release_job(db, "job", token)
+    assert claim_job(db, "job", stale_after=60) is not None
+
+
+def test_stale_claim_is_taken_over(db):
+    old = claim_job(db, "job", stale_after=60)
+    db.get(models.AppState, "job").value = f"0 {old}"
+    db.commit()
+    new = claim_job(db, "job", stale_after=60)
+    assert new is not None and new != old
+    # the worker that lost it finishing late doesn't free the new claim
+    release_job(db, "job", old)
+    assert claim_job(db, "job", stale_after=60) is None
+
+
+def test_startup_refresh_runs_in_one_worker(db, monkeypatch):
+    runs = []
+    monkeypatch.setattr(main, "recompute_if_changed", runs.append)
+    monkeypatch.setattr(main.get_index(), "exists", lambda: True)
+
+    held = claim_job(db, main.REFRESH_CLAIM_KEY, main.REFRESH_CLAIM_STALE_SECONDS)
+    main._refresh_derived_data()
+    assert runs == []
+
+    release_job(db, main.REFRESH_CLAIM_KEY, held)
+    main._refresh_derived_data()
+    assert len(runs) == 1
+    # and the claim is given back afterwards
+    assert db.get(models.AppState, main.REFRESH_CLAIM_KEY) is None
@@ -0,0 +1,49 @@
+from app.utils.course_ranking import rank_courses, tokenize
+
+
+def course(skill, level, title, url, description="", rating=4.5):
+    return {"skill": skill, "level": level, "title": title, "url": url,
+            "description": description, "rating": rating}
+
+
+def test_relevant_courses_rank_first_and_are_capped_per_level():
+    candidates = [
+        course("Docker", "beginner", "Cooking for beginners", "u/cook", "recipes and kitchens", rating=5.0),
+        course("Docker", "beginner", "Docker fundamentals", "u/d1", "containers with docker"),
+        course("Docker", "beginner", "Intro to Docker containers", "u/d2", "docker images"),
+        course("Docker", "beginner", "Docker for developers", "u/d3", "docker compose"),
+    ]
+    kept = rank_courses(candidates, ["Python"], "Software Development", per_level=2)
+    assert len(kept) == 2
+    assert "u/cook" not in {c["url"] for c in kept}
+    assert kept[0]["score"] >= kept[1]["score"]
+
+
+def test_url_recommended_once_per_cv():
+    candidates = [
+        course("Docker", "beginner", "Docker and Kubernetes", "u/shared", "docker kubernetes"),
+        course("Kubernetes", "beginner", "Docker and Kubernetes", "u/shared", "docker kubernetes"),
+        course("Kubernetes", "beginner", "Kubernetes basics", "u/k1", "kubernetes pods"),
+    ]
+    urls = [c["url"] for c in rank_courses(candidates)]
+    assert sorted(urls) == ["u/k1", "u/shared"]
+
+
+def test_output_grouped_by_skill_then_level():
+    candidates = [
+        course("SQL", "advanced", "Advanced SQL", "u/s2", "sql tuning"),
+        course("Git", "beginner", "Git basics", "u/g1", "git branches"),
+        course("SQL", "beginner", "SQL basics", "u/s1", "sql queries"),
+    ]
+    kept = rank_courses(candidates)
+    assert [(c["skill"], c["level"]) for c in kept] == [
+        ("SQL", "advanced"), ("SQL", "beginner"), ("Git", "beginner"),
+    ]
+
+
+def test_empty():
+    assert rank_courses([]) == []
+
+
+def test_tokenize_keeps_language_names():
+    assert {"c++", "c#"} <= set(tokenize("C++ and C# for beginners"))
@@ -0,0 +1,76 @@
+import json
+import os
+
+import pytest
+
+from app.utils.coursera_searcher import SEARCH_CANDIDATES, parse_search_results
+
+legacy = pytest.importorskip("benchmarks.bench_coursera_parse")
+
+FIXTURES = os.path.join(os.path.dirname(__file__), os.pardir, "benchmarks", "fixtures")
+
+
+def fixture(name):
+    with open(os.path.join(FIXTURES, name), "rb") as f:
+        return f.read()
+
+
+def urls(courses):
+    return [c["url"] for c in courses]
+
+
+def test_embedded_state_is_preferred():
+    courses = parse_search_results(fixture("search_with_state.html"), "Docker", "beginner", limit=50)
+    assert len(courses) == 12
+    # only the state carries durations; the cards don't
+    assert all(c["duration"] for c in courses)
+    assert all(c["url"].startswith("https://www.coursera.org/learn/") for c in courses)
+    assert courses[0]["skills"] == ["Docker"] and courses[0]["level"] == "beginner"
+
+
+@pytest.mark.parametrize("name", ["search_dom_only.html", "search_with_state.html"])
+def test_top_results_match_the_legacy_card_walk(name):
+    raw = fixture(name)
+    old = urls(legacy.legacy_parse(raw, "Docker", "beginner"))
+    assert old
+    assert urls(parse_search_results(raw, "Docker", "beginner"))[:len(old)] == old
+
+
+def test_cards_are_used_without_a_state():
+    courses = parse_search_results(fixture("search_dom_only.html"), "Docker", "beginner", limit=50)
+    assert len(courses) == 12
+    assert all(c["title"] and c["description"] for c in courses)
+    assert courses[0]["rating"] == 4.0
+
+
+def test_bare_links_when_there_are_no_cards():
+    raw = b"""<html><body>
+      <a href="/learn/docker-basics">Docker basics</a>
+      <a href="/about">About</a>
+      <a href="/learn/compose"></a>
+      <a href="/learn/k8s">Kubernetes</a>
+    </body></html>"""
+    courses = parse_search_results(raw, "Docker")
+    assert urls(courses) == ["https://www.coursera.org/learn/docker-basics",
+                             "https://www.coursera.org/learn/k8s"]
+    assert urls(courses) == urls(legacy.legacy_parse(raw, "Docker", None))
+    assert courses[0]["level"] == "Unknown"
+
+
+def test_state_duplicates_are_dropped():
+    course = {"name": "Docker basics", "url": "/learn/docker-basics"}
+    state = {"props": {"hits": [course, dict(course), {"name": "Kubernetes", "url": "/learn/k8s"}]}}
+    raw = ('<html><script id="__NEXT_DATA__" type="application/json">%s</script></html>'
+           % json.dumps(state)).encode()
+    assert urls(parse_search_results(raw, "Docker")) == [
+        "https://www.coursera.org/learn/docker-basics", "https://www.coursera.org/learn/k8s",
+    ]
+
+
+@pytest.mark.parametrize("name", ["search_dom_only.html", "search_with_state.html"])
+def test_limit(name):
+    raw = fixture(name)
+    assert len(parse_search_results(raw, "Docker", "beginner")) == SEARCH_CANDIDATES
+    assert len(parse_search_results(raw, "Docker", "beginner", limit=5)) == 5
+    assert urls(parse_search_results(raw, "Docker", "beginner", limit=1)) == \
+        urls(parse_search_results(raw, "Docker", "beginner"))[:1]
@@ -0,0 +1,66 @@
+from app.utils.cv_extract import find_name, find_phone, pre_extract, strip_contact_lines
+
+
+def test_name_on_first_line():
+    assert find_name("Jane Doe\njane@example.com") == "Jane Doe"
+
+
+def test_name_after_document_title():
+    assert find_name("Curriculum Vitae\nJane Marie Doe\nBerlin") == "Jane Marie Doe"
+
+
+def test_headings_and_job_titles_are_not_names():
+    assert find_name("Curriculum Vitae") is None
+    assert find_name("Software Engineer\nJane Doe") is None
+    assert find_name("Senior Data Analyst") is None
+    assert find_name("Professional Summary") is None
+
+
+def test_name_with_digits_or_punctuation_rejected():
+    assert find_name("Jane Doe, PhD 2020") is None
+
+
+def test_phone_in_header():
+    assert find_phone("Jane Doe\n+49 170 1234567 | jane@example.com") == "+49 170 1234567"
+
+
+def test_id_numbers_are_not_phones():
+    header = "Jane Doe\nStudent ID: 2020123456"
+    text = header + "\nEducation\nMatriculation number 123456789"
+    assert find_phone(header, text) is None
+
+
+def test_labelled_phone_outside_header():
+    text = "Jane Doe\nEducation\nBSc\nReferences\nPhone: (555) 123-4567"
+    assert find_phone("Jane Doe", text) == "(555) 123-4567"
+
+
+def test_unlabelled_number_outside_header_ignored():
+    text = "Jane Doe\nExperience\nTicket 4815162342 closed"
+    assert find_phone("Jane Doe", text) is None
+
+
+def test_year_range_is_not_a_phone():
+    assert find_phone("Jane Doe\n2016 - 2019") is None
+
+
+def test_pre_extract_only_returns_found_fields():
+    header = "Jane Doe\njane@example.com | linkedin.com/in/janedoe"
+    found = pre_extract(header + "\nSkills\nPython", header, ["https://github.com/janedoe"])
+    assert found == {
+        "name": "Jane Doe",
+        "email": "jane@example.com",
+        "linkedin": "https://linkedin.com/in/janedoe",
+        "github": "https://github.com/janedoe",
+    }
+
+
+def test_pre_extract_leaves_ambiguous_name_to_llm():
+    header = "Curriculum Vitae\nSoftware Engineer\njane@example.com"
+    assert "name" not in pre_extract(header, header, [])
+
+
+def test_strip_contact_lines():
+    found = {"email": "jane@example.com", "phone": "+49 170 1234567"}
+    text = "Jane Doe\nEmail: jane@example.com | +49 170 1234567\nBerlin"
+    assert strip_contact_lines(text, found) == "Jane Doe\nBerlin"
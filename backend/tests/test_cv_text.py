@@ -0,0 +1,58 @@
+from app.utils.cv_text import compact_text, split_sections, chunk_sections, estimate_tokens
+
+
+def test_page_labels_are_dropped():
+    pages = ["Jane Doe\nExperience\nAcme\nPage 1 of 2", "Skills\nPython\n2/2"]
+    text = compact_text(pages)
+    assert "Page 1 of 2" not in text
+    assert "2/2" not in text
+    assert "Python" in text
+
+
+def test_bare_number_dropped_only_at_page_edges():
+    pages = ["1\nJane Doe\nEducation\nBSc Computer Science\n2016 / 2019\n2019\nAcme\n2",
+             "Skills\nPython\n3"]
+    lines = compact_text(pages).splitlines()
+    assert "2016 / 2019" in lines
+    assert "2019" in lines
+    assert "1" not in lines and "2" not in lines and "3" not in lines
+
+
+def test_year_on_page_edge_is_kept():
+    assert compact_text(["Education\nBSc\n2019"]).splitlines()[-1] == "2019"
+
+
+def test_repeated_header_kept_once():
+    pages = ["Jane Doe\nExperience\nAcme", "Jane Doe\nSkills\nPython"]
+    assert compact_text(pages).splitlines().count("Jane Doe") == 1
+
+
+def test_whitespace_and_duplicate_lines_squeezed():
+    text = compact_text(["a   b\n\n\n\nc\nc"])
+    assert text == "a b\n\nc"
+
+
+def test_split_sections_uses_canonical_names():
+    text = "Jane Doe\njane@x.com\nWork Experience\nAcme\nTechnical Skills:\nPython"
+    assert [name for name, _ in split_sections(text)] == ["header", "experience", "skills"]
+
+
+def test_chunks_respect_budget():
+    sections = [("experience", "\n".join(f"line {i} " * 10 for i in range(200)))]
+    chunks = chunk_sections(sections, budget=200)
+    assert len(chunks) > 1
+    for chunk in chunks:
+        assert sum(estimate_tokens(body) for _, body in chunk) <= 200
+
+
+def test_spoken_languages_section_is_ignored():
+    text = "Experience\nAcme\nLanguages\nEnglish - native\nFrench (C1)\nGerman: basic"
+    assert [name for name, _ in split_sections(text)] == ["experience", "ignore"]
+
+
+def test_programming_languages_section_is_skills():
+    text = "Experience\nAcme\nLanguages\nPython, Java, C++\nEnglish (native)"
+    sections = split_sections(text)
+    assert [name for name, _ in sections] == ["experience", "skills"]
+    assert "Python" in sections[-1][1]
+    assert split_sections("Programming Languages\nGo, Rust")[0][0] == "skills"
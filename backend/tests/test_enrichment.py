@@ -0,0 +1,49 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.routers import cv as cv_router
+from app.utils.llm_scheduler import LLMCancelled, cancel_scope, check_cancelled
+
+
+def test_scope_is_cancelled_with_its_parent():
+    with cancel_scope() as outer:
+        with cancel_scope() as inner:
+            check_cancelled()
+            outer.set()
+            assert inner.is_set()
+            with pytest.raises(LLMCancelled):
+                check_cancelled()
+        inner.set()
+    check_cancelled()   # nothing set outside the scopes
+
+
+def test_timed_out_stage_stops_its_worker():
+    stopped = threading.Event()
+
+    def stage():
+        try:
+            while True:   # stands in for a sequence of LLM calls / searches
+                check_cancelled()
+                time.sleep(0.01)
+        except LLMCancelled:
+            stopped.set()
+            raise
+
+    def quick():
+        check_cancelled()
+        return "ok"
+
+    async def enrich():
+        return await asyncio.gather(
+            cv_router._enrich_stage("slow", 0.05, stage),
+            cv_router._enrich_stage("quick", 1, quick),
+            return_exceptions=True,
+        )
+
+    slow, fast = asyncio.run(enrich())
+    assert isinstance(slow, asyncio.TimeoutError)
+    assert fast == "ok"   # a sibling stage's timeout doesn't cancel it
+    assert stopped.wait(1)
@@ -0,0 +1,33 @@
+import gzip
+import json
+
+import pytest
+from fastapi import HTTPException
+
+from app.crud import create_cv
+from app.export import iter_cv_records, iter_ndjson
+from app.routers import admin
+
+
+def test_records_resume_after_cursor(db, user, make_parsed):
+    ids = [create_cv(db, user.id, f"v{i}.pdf", make_parsed(), images=[]).id for i in range(5)]
+    assert [r["id"] for r in iter_cv_records(db, batch_size=2)] == ids
+    assert [r["id"] for r in iter_cv_records(db, cursor=ids[2], batch_size=2)] == ids[3:]
+    record = next(iter_cv_records(db))
+    assert record["user_id"] == user.id
+
+
+def test_gzip_stream_is_one_valid_member():
+    records = [{"id": i, "name": "Jané"} for i in range(250)]
+    data = b"".join(iter_ndjson(iter(records), gzip=True, lines_per_chunk=100))
+    lines = gzip.decompress(data).decode("utf-8").splitlines()
+    assert [json.loads(l) for l in lines] == records
+
+
+def test_admin_token_check(monkeypatch):
+    monkeypatch.setattr(admin, "ADMIN_TOKEN", "s3cret")
+    admin._check_token("s3cret")
+    for bad in ("wrong", "sécret", None):
+        with pytest.raises(HTTPException) as e:
+            admin._check_token(bad)
+        assert e.value.status_code == 403
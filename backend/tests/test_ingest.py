@@ -0,0 +1,66 @@
+from app import models
+from app.ingest import Ingestor, load_checkpoint, main
+from app.retention import superseded_cv_ids
+from app.utils.similarity import get_index
+
+
+def add_users(db, *emails):
+    users = [models.User(email=email, hashed_password="x") for email in emails]
+    db.add_all(users)
+    db.commit()
+    return users
+
+
+def test_failed_cv_is_rolled_back_and_batch_continues(db, user, make_parsed, tmp_path):
+    add_users(db, "john@example.com")
+    checkpoint = tmp_path / "ingest.checkpoint"
+    ingestor = Ingestor(batch_size=10, checkpoint=str(checkpoint))
+    broken = make_parsed()
+    broken["experience"] = [{"title": "Developer"}]   # fails after the CV row is flushed
+
+    ingestor.add("/cvs/a.pdf", user.email, make_parsed())
+    ingestor.add("/cvs/broken.pdf", user.email, broken)
+    ingestor.add("/cvs/b.pdf", "john@example.com", make_parsed())
+    ingestor.close()
+
+    assert (ingestor.done, ingestor.failed) == (2, 1)
+    assert load_checkpoint(str(checkpoint)) == {"/cvs/a.pdf", "/cvs/b.pdf"}
+    assert db.query(models.CV).count() == 2
+    assert db.query(models.Education).count() == 2
+    assert {cv.filename for cv in db.query(models.CV)} == {"a.pdf", "b.pdf"}
+
+
+def test_unknown_owner_is_skipped(db, make_parsed, tmp_path):
+    ingestor = Ingestor(batch_size=10, checkpoint=str(tmp_path / "ingest.checkpoint"))
+    ingestor.add("/cvs/a.pdf", "nobody@example.com", make_parsed())
+    ingestor.close()
+    assert (ingestor.done, ingestor.failed) == (0, 1)
+    assert db.query(models.CV).count() == 0
+
+
+def test_cohort_is_one_cv_per_owner(db, make_parsed, tmp_path):
+    emails = [f"student{i}@uni.edu" for i in range(5)]
+    add_users(db, *emails)
+    ingestor = Ingestor(batch_size=2, checkpoint=str(tmp_path / "ingest.checkpoint"))
+    for i, email in enumerate(emails):
+        ingestor.add(f"/cvs/{i}.pdf", email, make_parsed())
+    ingestor.add("/cvs/again.pdf", emails[0], make_parsed())   # same owner twice
+    ingestor.close()
+
+    assert (ingestor.done, ingestor.failed) == (5, 1)
+    # nothing for retention to trim, and every CV is searchable
+    assert superseded_cv_ids(db, keep=1) == []
+    assert len(get_index()) == 5
+
+
+def test_owner_comes_from_the_cv_when_the_manifest_has_none(db, user, make_parsed, tmp_path):
+    ingestor = Ingestor(batch_size=10, checkpoint=str(tmp_path / "ingest.checkpoint"))
+    ingestor.add("/cvs/a.pdf", None, make_parsed(email=user.email))
+    ingestor.close()
+    assert db.query(models.CV).one().user_id == user.id
+
+
+def test_manifest_naming_an_email_twice_is_rejected(tmp_path):
+    manifest = tmp_path / "manifest.csv"
+    manifest.write_text("path,email\na.pdf,jane@example.com\nb.pdf,Jane@example.com\nc.pdf,\n")
+    assert main([str(manifest), "--checkpoint", str(tmp_path / "ingest.checkpoint")]) == 2
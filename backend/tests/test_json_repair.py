@@ -0,0 +1,43 @@
+import pytest
+
+from app.utils.json_repair import StreamingJSONScanner, loads_tolerant, repair_json
+
+
+def test_strict_json_passes_through():
+    assert loads_tolerant('{"a": [1, 2]}') == {"a": [1, 2]}
+
+
+def test_code_fences_and_chatter():
+    text = 'Sure! Here it is:\n```json\n{"name": "Jane", "skills": ["Python"]}\n```\nAnything else?'
+    assert loads_tolerant(text) == {"name": "Jane", "skills": ["Python"]}
+
+
+def test_trailing_commas():
+    assert repair_json('{"a": [1, 2,], "b": 3,}') == {"a": [1, 2], "b": 3}
+
+
+def test_truncated_string_and_containers_are_closed():
+    assert repair_json('{"skills": ["Python", "Dock') == {"skills": ["Python", "Dock"]}
+
+
+def test_dangling_key_is_cut_back():
+    assert repair_json('{"name": "Jane", "email":') == {"name": "Jane"}
+
+
+def test_brackets_inside_strings_are_ignored():
+    assert repair_json('{"bio": "likes {braces} and [brackets]", "x": 1') == {
+        "bio": "likes {braces} and [brackets]", "x": 1,
+    }
+
+
+def test_nothing_to_recover():
+    with pytest.raises(ValueError):
+        repair_json("no json here")
+
+
+def test_streaming_scanner_stops_at_end_of_value():
+    scanner = StreamingJSONScanner()
+    chunks = ['Here: {"a": "}"', ', "b": [1, {"c": 2}]', '} trailing chatter', ' more']
+    done_at = next(i for i, chunk in enumerate(chunks) if scanner.feed(chunk))
+    assert done_at == 2
+    assert scanner.text == '{"a": "}", "b": [1, {"c": 2}]}'
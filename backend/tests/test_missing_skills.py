@@ -0,0 +1,60 @@
+from app import models
+from app.crud import create_cv, recompute_missing_skills, replace_missing_skills
+from app.utils import cv_parser
+from app.utils.cv_parser import normalize_parsed
+
+
+def raw_parse(**overrides):
+    raw = {"name": "Jane Doe", "email": None, "phone": None, "bio": None, "linkedin": None,
+           "github": None, "education": [], "experience": [], "projects": []}
+    raw.update(overrides)
+    return raw
+
+
+def test_known_domain_gaps_come_from_the_engine():
+    parsed = normalize_parsed(raw_parse(domain="Software Development", skills=["Python"],
+                                        missing_skills=["Underwater Basket Weaving"]))
+    assert "Underwater Basket Weaving" not in parsed["missing_skills"]
+    assert "Git" in parsed["missing_skills"]
+
+
+def test_unknown_domain_keeps_the_llm_gaps():
+    parsed = normalize_parsed(raw_parse(domain="Accounting", skills=["Excel"],
+                                        missing_skills=["IFRS", "excel", "SAP"]))
+    assert parsed["meta"]["domain"] == "Accounting"
+    assert parsed["missing_skills"] == ["IFRS", "SAP"]
+    assert "Git" not in parsed["missing_skills"] and "Docker" not in parsed["missing_skills"]
+
+
+def test_llm_is_asked_for_gaps_only_outside_known_domains(monkeypatch):
+    prompts = []
+
+    def fake_llm(prompt, required=None):
+        prompts.append(prompt)
+        return {"missing_skills": ["IFRS"]}
+    monkeypatch.setattr(cv_parser, "call_mistral_json", fake_llm)
+
+    known = {"domain": "Software Development", "skills": ["Python"]}
+    cv_parser._ask_missing_skills(known)
+    assert prompts == [] and "missing_skills" not in known
+
+    unknown = {"domain": "Accounting", "skills": ["Excel"]}
+    cv_parser._ask_missing_skills(unknown)
+    assert len(prompts) == 1 and "Accounting" in prompts[0]
+    assert unknown["missing_skills"] == ["IFRS"]
+
+
+def test_recompute_keeps_stored_gaps_of_unknown_domains(db, user, make_parsed):
+    accounting = create_cv(db, user.id, "a.pdf", make_parsed(domain="Accounting", skills=["Excel"],
+                                                              missing_skills=["IFRS"]), images=[])
+    replace_missing_skills(db, accounting.id, ["IFRS"])
+    dev = create_cv(db, user.id, "b.pdf", make_parsed(), images=[])
+    replace_missing_skills(db, dev.id, ["Stale"])
+    db.commit()
+
+    recompute_missing_skills(db)
+
+    def gaps(cv_id):
+        return {n for (n,) in db.query(models.MissingSkill.name).filter(models.MissingSkill.cv_id == cv_id)}
+    assert gaps(accounting.id) == {"IFRS"}
+    assert "Stale" not in gaps(dev.id) and "Git" in gaps(dev.id)
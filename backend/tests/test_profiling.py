@@ -0,0 +1,18 @@
+from app.utils import profiling
+
+
+def test_token_ok(monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_TOKEN", "s3cret")
+    assert profiling.token_ok("s3cret")
+    assert not profiling.token_ok("wrong")
+    assert not profiling.token_ok(None)
+
+
+def test_non_ascii_token_is_rejected_not_an_error(monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_TOKEN", "s3cret")
+    assert not profiling.token_ok("sécret")
+
+
+def test_disabled_without_token(monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_TOKEN", None)
+    assert not profiling.token_ok("anything")
@@ -0,0 +1,59 @@
+import asyncio
+
+from app import models
+from app.crud import create_cv, create_courses_for_cv, carry_over_courses, plan_reanalysis
+from app.db import AsyncSessionLocal
+
+
+def course(skill, level, n, url=None):
+    return {"skill": skill, "level": level, "title": f"{skill} {level} {n}",
+            "url": url or f"https://www.coursera.org/learn/{skill.lower()}-{level}-{n}",
+            "description": "", "rating": 4.5, "duration": ""}
+
+
+def links(db, cv_id):
+    return [(l.skill, l.url) for l in
+            db.query(models.CVCourse).filter(models.CVCourse.cv_id == cv_id).order_by(models.CVCourse.id)]
+
+
+def test_carried_courses_are_not_linked_twice(db, user, make_parsed):
+    shared = "https://www.coursera.org/learn/fullstack"
+    old = create_cv(db, user.id, "a.pdf", make_parsed(), images=[])
+    create_courses_for_cv(db, old.id, [
+        course("JavaScript", "beginner", 0),
+        course("JavaScript", "beginner", 1, url=shared),
+    ])
+    new = create_cv(db, user.id, "b.pdf", make_parsed(), images=[])
+    # the fresh fetch for another skill already recommends the shared course
+    create_courses_for_cv(db, new.id, [course("Docker", "beginner", 0, url=shared)], commit=False)
+    carry_over_courses(db, old.id, new.id, ["JavaScript"])
+    db.commit()
+
+    urls = [url for _, url in links(db, new.id)]
+    assert len(urls) == len(set(urls)) == 2
+    assert ("Docker", shared) in links(db, new.id)
+
+
+def test_carry_matches_spelling_variants(db, user, make_parsed):
+    old = create_cv(db, user.id, "a.pdf", make_parsed(), images=[])
+    create_courses_for_cv(db, old.id, [course("JavaScript", "beginner", 0)])
+    new = create_cv(db, user.id, "b.pdf", make_parsed(), images=[])
+    carry_over_courses(db, old.id, new.id, ["JS"])
+    db.commit()
+    assert [skill for skill, _ in links(db, new.id)] == ["JavaScript"]
+
+
+def test_plan_carries_by_canonical_skill(db, user, make_parsed):
+    old = create_cv(db, user.id, "a.pdf", make_parsed(), images=[])
+    create_courses_for_cv(db, old.id, [course("JavaScript", "beginner", 0)])
+    new = create_cv(db, user.id, "b.pdf", make_parsed(), images=[])
+
+    async def plan():
+        async with AsyncSessionLocal() as session:
+            return await plan_reanalysis(session, user.id, new.id, "Software Development",
+                                         ["Python"], ["JS", "Kubernetes"])
+
+    result = asyncio.run(plan())
+    assert result["previous"] == old.id
+    assert result["carry_courses"] == ["JS"]
+    assert result["fetch_courses"] == ["Kubernetes"]
@@ -0,0 +1,38 @@
+import os
+
+from app import models
+from app.crud import create_cv
+from app.retention import collect_orphan_files, prune_cv_versions
+from app.utils.cv_parser import image_source
+
+
+def test_image_source():
+    assert image_source("jane_doe_page2_img1.png") == "jane_doe"
+    assert image_source("jane_doe.pdf") is None
+    assert image_source("page1_img1.png") is None
+
+
+def test_orphans_spare_a_cvs_pdf_and_images(db, user, make_parsed, tmp_path):
+    create_cv(db, user.id, "jane.pdf", make_parsed(), images=[])
+    for name in ("jane.pdf", "jane_page1_img1.png", "jane_page2_img3.jpeg",
+                 "old.pdf", "old_page1_img1.png"):
+        path = tmp_path / name
+        path.write_bytes(b"x" * 10)
+        os.utime(path, (0, 0))
+
+    removed, reclaimed = collect_orphan_files(db, str(tmp_path), grace=60)
+    assert (removed, reclaimed) == (2, 20)
+    assert sorted(os.listdir(tmp_path)) == ["jane.pdf", "jane_page1_img1.png", "jane_page2_img3.jpeg"]
+
+
+def test_recent_files_are_kept(db, tmp_path):
+    (tmp_path / "new.pdf").write_bytes(b"x")
+    assert collect_orphan_files(db, str(tmp_path), grace=60) == (0, 0)
+
+
+def test_prune_keeps_newest_versions(db, user, make_parsed):
+    ids = [create_cv(db, user.id, f"v{i}.pdf", make_parsed(), images=[]).id for i in range(4)]
+    counts = prune_cv_versions(db, keep=2)
+    assert counts["cvs"] == 2
+    assert [cv.id for cv in db.query(models.CV).order_by(models.CV.id)] == ids[2:]
+    assert db.query(models.Education).count() == 2
@@ -0,0 +1,93 @@
+import os
+import asyncio
+
+import numpy as np
+
+from app import models
+from app.crud import create_cv, find_similar_cvs, index_cvs, rebuild_similarity_index
+from app.db import AsyncSessionLocal
+from app.utils.similarity import SimilarityIndex, cv_vector, get_index
+
+
+def vectors(n, dim=8, seed=0):
+    m = np.random.default_rng(seed).random((n, dim), dtype=np.float32)
+    return m / np.linalg.norm(m, axis=1, keepdims=True)
+
+
+def test_snapshot_is_one_file_and_shared_between_processes(tmp_path):
+    writer = SimilarityIndex(str(tmp_path), dim=8)
+    m = vectors(5)
+    writer.replace_all(np.arange(1, 6), m)
+    assert sorted(os.listdir(tmp_path)) == [".lock", "journal.bin", "snapshot.npz"]
+
+    reader = SimilarityIndex(str(tmp_path), dim=8)
+    assert reader.search(m[2], k=1)[0][0] == 3
+    assert len(reader) == 5
+
+
+def test_journal_updates_then_new_snapshot_are_picked_up(tmp_path):
+    writer = SimilarityIndex(str(tmp_path), dim=8)
+    reader = SimilarityIndex(str(tmp_path), dim=8)
+    m = vectors(4)
+    writer.replace_all(np.arange(1, 4), m[:3])
+    writer.update([(9, m[3])], remove=[1])
+    assert reader.search(m[3], k=1)[0][0] == 9
+    assert {i for i, _ in reader.search(m[0], k=10)} == {2, 3, 9}
+
+    writer.replace_all(np.array([7]), m[:1])
+    assert [i for i, _ in reader.search(m[0], k=10)] == [7]
+
+
+def test_legacy_snapshot_files_are_replaced(tmp_path):
+    for name in ("ids.npy", "vectors.npy"):
+        np.save(tmp_path / name, np.zeros(1))
+    index = SimilarityIndex(str(tmp_path), dim=8)
+    assert not index.exists()
+    index.replace_all(np.array([1]), vectors(1))
+    assert index.exists()
+    assert not (tmp_path / "ids.npy").exists() and not (tmp_path / "vectors.npy").exists()
+
+
+def test_search_excludes_ids(tmp_path):
+    index = SimilarityIndex(str(tmp_path), dim=8)
+    m = vectors(3)
+    index.replace_all(np.arange(1, 4), m)
+    assert 1 not in {i for i, _ in index.search(m[0], k=3, exclude=[1])}
+
+
+def test_cv_vector_is_unit_and_order_independent():
+    a = cv_vector(["Python", "Docker"], ["FastAPI"], "Software Development")
+    b = cv_vector(["Docker", "python"], ["FastAPI"], "Software Development")
+    assert np.isclose(np.linalg.norm(a), 1.0)
+    assert np.allclose(a, b)
+
+
+def test_similar_candidates_are_anonymous(db, user, make_parsed):
+    cv = create_cv(db, user.id, "a.pdf", make_parsed(), images=[])
+    index_cvs(db, [cv.id])
+
+    async def search():
+        async with AsyncSessionLocal() as session:
+            return await find_similar_cvs(session, cv_vector(["Python", "Docker", "SQL"]), k=5)
+
+    [hit] = asyncio.run(search())
+    assert hit["cv_id"] == cv.id
+    assert hit["domain"] == "Software Development"
+    assert "name" not in hit
+
+
+def test_index_holds_each_owners_latest_cv(db, user, make_parsed):
+    other = models.User(email="john@example.com", hashed_password="x")
+    db.add(other)
+    db.commit()
+    first = create_cv(db, user.id, "a.pdf", make_parsed(), images=[])
+    index_cvs(db, [first.id])
+    second = create_cv(db, user.id, "b.pdf", make_parsed(), images=[])
+    third = create_cv(db, user.id, "c.pdf", make_parsed(), images=[])
+    johns = create_cv(db, other.id, "d.pdf", make_parsed(), images=[])
+    index_cvs(db, [second.id, third.id, johns.id])
+
+    assert len(get_index()) == 2
+    assert {i for i, _ in get_index().search(cv_vector(["Python", "Docker", "SQL"]), k=10)} == {third.id, johns.id}
+    # a rebuild agrees with the incremental updates
+    assert rebuild_similarity_index(db) == 2
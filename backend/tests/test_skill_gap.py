@@ -0,0 +1,56 @@
+import numpy as np
+
+from app.utils.skill_gap import SkillGapEngine
+
+REQUIREMENTS = {
+    "Software Development": {"aliases": ["Software Engineering"],
+                             "skills": ["Python", "Git", "SQL", "Docker"]},
+    "Data Science": {"aliases": ["ML"], "skills": ["Python", "Pandas", "SQL", "Statistics"]},
+}
+
+
+def engine():
+    return SkillGapEngine(REQUIREMENTS)
+
+
+def test_missing_for_named_domain():
+    domain, missing = engine().missing_for("Software Development", ["Python", "SQL"])
+    assert domain == "Software Development"
+    assert missing == ["Git", "Docker"]
+
+
+def test_domain_alias_and_skill_spelling_variants():
+    domain, missing = engine().missing_for("software engineering", ["python3", "git", "Postgres", "docker"])
+    assert domain == "Software Development"
+    assert missing == ["SQL"]
+
+
+def test_unknown_domain_is_not_measured_against_known_ones():
+    assert engine().missing_for("Accounting", ["Excel", "Python"]) == (None, None)
+
+
+def test_no_domain_resolves_to_best_coverage():
+    domain, missing = engine().missing_for(None, ["Pandas", "Statistics"])
+    assert domain == "Data Science"
+    assert missing == ["Python", "SQL"]
+
+
+def test_no_domain_and_no_coverage_is_unresolved():
+    assert engine().missing_for(None, ["Bookkeeping"]) == (None, None)
+
+
+def test_missing_many_matches_one_by_one():
+    e = engine()
+    cvs = [("ML", ["SQL"]), (None, ["Git"]), ("Accounting", ["SQL"]), ("Software Development", [])]
+    batch = e.missing_many([d for d, _ in cvs], [s for _, s in cvs])
+    assert batch == [e.missing_for(d, s) for d, s in cvs]
+
+
+def test_bitsets_are_packed():
+    e = engine()
+    assert e.required.dtype == np.uint8
+    assert e.encode(["Python", "Git"]).shape == (1,)
+
+
+def test_empty_requirements():
+    assert SkillGapEngine({}).missing_many(["Anything"], [["Python"]]) == [(None, None)]
@@ -0,0 +1,46 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app import models
+from app.crud import create_cv, create_courses_for_cv
+from app.main import app
+from app.utils.sql_stats import query_budget, statement_shape
+
+
+def test_statement_shape_ignores_parameters():
+    a = statement_shape("SELECT * FROM skills WHERE cv_id = 12 AND name = 'Python'")
+    b = statement_shape("SELECT *  FROM skills\nWHERE cv_id = 7 AND name = 'SQL'")
+    assert a == b == "SELECT * FROM skills WHERE cv_id = ? AND name = ?"
+    assert statement_shape("SELECT 1 WHERE id IN (?, ?, ?)") == statement_shape("SELECT 1 WHERE id IN (?)")
+
+
+def test_query_budget_flags_repeats(db):
+    with pytest.raises(AssertionError, match="Query budget exceeded"):
+        with query_budget(100, max_repeats=1):
+            for _ in range(3):
+                db.query(models.User).filter(models.User.id == 1).first()
+
+
+@pytest.fixture
+def client_with_cv(db, make_parsed):
+    client = TestClient(app)
+    client.post("/auth/signup", json={"email": "jane@example.com", "password": "pw"})
+    token = client.post("/auth/login", json={"email": "jane@example.com", "password": "pw"}).json()["access_token"]
+    user = db.query(models.User).filter(models.User.email == "jane@example.com").one()
+    for n in range(2):
+        cv = create_cv(db, user.id, f"v{n}.pdf", make_parsed(), images=[])
+        create_courses_for_cv(db, cv.id, [
+            {"skill": skill, "level": "beginner", "title": f"{skill} {i}",
+             "url": f"https://example.com/{skill}/{i}", "description": "", "rating": 4.0, "duration": ""}
+            for skill in ("Git", "Docker", "Kubernetes") for i in range(3)
+        ])
+    return client, {"Authorization": f"Bearer {token}"}
+
+
+def test_my_cv_loads_without_n_plus_one(client_with_cv):
+    client, auth = client_with_cv
+    # the user, the CV, then one SELECT per relationship whatever its size
+    with query_budget(12, max_repeats=1):
+        resp = client.get("/cv/me", headers=auth)
+    assert resp.status_code == 200
+    assert len(resp.json()["parsed"]["courses"]) == 9
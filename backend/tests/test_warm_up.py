@@ -0,0 +1,67 @@
+from app.utils import ollama
+from app.utils.readiness import readiness, failures
+
+
+class FakeRouter:
+    def __init__(self, available):
+        self.available = available
+        self.calls = []
+
+    def warm_up(self, model):
+        self.calls.append(model)
+        return model in self.available
+
+
+def test_missing_model_gives_up_and_is_reported(monkeypatch):
+    router = FakeRouter({"warm-a"})
+    monkeypatch.setattr(ollama, "get_router", lambda: router)
+
+    ollama.warm_up_models(["warm-a", "warm-missing"], attempts=3, delay=0)
+
+    assert router.calls.count("warm-a") == 1
+    assert router.calls.count("warm-missing") == 3
+    ok, checks = readiness()
+    assert not ok
+    assert checks["model:warm-a"] is True
+    assert checks["model:warm-missing"] is False
+    assert "model:warm-missing" in failures()
+
+
+def test_backoff_is_capped(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(ollama, "get_router", lambda: FakeRouter(set()))
+    monkeypatch.setattr(ollama.time, "sleep", sleeps.append)
+
+    ollama.warm_up_models(["backoff-missing"], attempts=6, delay=5, max_delay=20)
+
+    assert sleeps == [5, 10, 20, 20, 20]
+
+
+def test_models_are_expected_before_the_database_can_be_ready(monkeypatch):
+    import asyncio
+    import threading
+
+    from app import main
+    from app.utils.readiness import mark_ready
+
+    release = threading.Event()
+
+    async def database_ready_at_once():
+        mark_ready("database")
+
+    monkeypatch.setattr(main, "OLLAMA_WARM_MODELS", ["lifespan-model"])
+    monkeypatch.setattr(main, "warm_up_models", lambda models: release.wait(5))
+    monkeypatch.setattr(main, "_warm_database", database_ready_at_once)
+    monkeypatch.setattr(main, "start_background_retention", lambda: None)
+
+    async def start():
+        async with main.lifespan(main.app):
+            await asyncio.sleep(0)
+            return readiness()[1]
+
+    try:
+        checks = asyncio.run(start())
+    finally:
+        release.set()
+    assert checks["database"] is True
+    assert checks["model:lifespan-model"] is False